@@ -0,0 +1,287 @@
+# backend/account_stats.py
+"""
+Mantiene la tabla account_stats: los acumuladores de stats_engine.StatsAccumulator
+guardados por cuenta. Al sincronizar solo se suman los trades nuevos; si llega un
+trade más antiguo que el último contado, la cuenta se recalcula desde sus trades
+para que rachas y High Water Mark sigan el orden cronológico.
+
+Las rachas de varias cuentas juntas (dashboard global) se guardan por conjunto de
+cuentas en portfolio_runs. Al final de la sincronización de cada cuenta (justo antes
+del commit) se suma la diferencia que hacen sus trades nuevos, recontando solo la
+ventana de tiempo que ocupan, así da igual si se intercalan con los de otras cuentas.
+Solo se guarda el conjunto que lee el dashboard (cuentas activas con trades); se crea
+en los pasos de escritura (sync, rebuild, cambios de cuentas), nunca al leer.
+
+Reconstruir todo:
+    python account_stats.py rebuild [account_id ...]
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import case, func, or_, select
+from typing import Collection, Dict, Iterable, List, Optional
+import itertools
+import sys
+import models
+import database
+from stats_engine import StatsAccumulator
+
+# Columnas que se copian entre la fila y el acumulador
+FIELDS = (
+    "count", "wins", "losses", "gross_profit", "gross_loss", "best", "worst",
+    "mean", "m2", "runs", "last_sign", "total_profit", "peak_profit",
+)
+
+# Orden cronológico de los trades de una cuenta (igual al sumar y al recalcular)
+TRADE_ORDER = (models.Trade.close_time, models.Trade.ticket)
+# Entre cuentas: a igual cierre, desempata la cuenta
+PORTFOLIO_ORDER = (models.Trade.close_time, models.Trade.account_id, models.Trade.ticket)
+
+
+def _sign(profit) -> int:
+    # Igual que StatsAccumulator: un trade en 0 cuenta como positivo
+    return 1 if (profit or 0.0) >= 0 else -1
+
+
+def to_accumulator(row: models.AccountStats) -> StatsAccumulator:
+    stats = StatsAccumulator()
+    for field in FIELDS:
+        value = getattr(row, field)
+        if value is not None:
+            setattr(stats, field, value)
+    return stats
+
+
+def _save(row: models.AccountStats, stats: StatsAccumulator):
+    for field in FIELDS:
+        setattr(row, field, getattr(stats, field))
+
+
+def _recompute(db: Session, row: models.AccountStats):
+    """Recalcula una cuenta recorriendo sus trades en orden de cierre"""
+    stats = StatsAccumulator()
+    last_close_time = None
+    trades = db.query(models.Trade.close_time, models.Trade.profit)\
+               .filter(models.Trade.account_id == row.account_id)\
+               .order_by(*TRADE_ORDER)\
+               .yield_per(5000)
+    for close_time, profit in trades:
+        stats.add(profit or 0.0)
+        last_close_time = close_time
+    _save(row, stats)
+    row.last_close_time = last_close_time
+
+
+def apply_trades(db: Session, account_id: int, trades: Iterable):
+    """
+    Suma trades recién insertados (con close_time, ticket y profit) al acumulador de la cuenta.
+    No hace commit: va en la misma transacción que el INSERT de los trades.
+    Las rachas del portafolio van aparte, una vez por cuenta (apply_portfolio_trades).
+    """
+    trades = sorted(trades, key=lambda t: (t.close_time, t.ticket))
+    if not trades:
+        return
+    row = db.get(models.AccountStats, account_id)
+    if row is None:
+        row = models.AccountStats(account_id=account_id)
+        db.add(row)
+        # Primera vez: puede haber trades previos a esta tabla, mejor contar todo
+        db.flush()
+        _recompute(db, row)
+        return
+
+    # Con el mismo close_time el orden lo decide el ticket, que no guardamos: recalculamos
+    if row.last_close_time is not None and trades[0].close_time <= row.last_close_time:
+        # Llegó un trade más viejo que el último contado: rachas y HWM cambian de orden
+        _recompute(db, row)
+        return
+
+    stats = to_accumulator(row)
+    for t in trades:
+        stats.add(t.profit or 0.0)
+    _save(row, stats)
+    row.last_close_time = trades[-1].close_time
+
+
+# --- Rachas de varias cuentas (portfolio_runs) ---
+
+def _set_key(account_ids: Iterable[int]) -> str:
+    return ",".join(str(acc_id) for acc_id in sorted(set(account_ids)))
+
+
+def _portfolio_rows(db: Session, account_ids: Iterable[int], lock: bool = False) -> List[models.PortfolioRuns]:
+    """Conjuntos guardados que incluyen alguna de las cuentas; con lock, solo se bloquean esos"""
+    ids = {str(acc_id) for acc_id in account_ids}
+    keys = [key for (key,) in db.query(models.PortfolioRuns.account_set) if ids & set(key.split(","))]
+    if not keys:
+        return []
+    query = db.query(models.PortfolioRuns)\
+              .filter(models.PortfolioRuns.account_set.in_(keys))\
+              .order_by(models.PortfolioRuns.account_set) # Mismo orden en todas las sesiones: sin deadlocks
+    if lock:
+        # Dos sincronizaciones no pueden sumar sobre el mismo conjunto a la vez
+        query = query.with_for_update()
+    return query.all()
+
+
+def _runs_delta(rows, account_id: int, new_tickets: Collection[int]) -> int:
+    """Rachas de la ventana con los trades nuevos menos las rachas sin ellos"""
+    runs_with = runs_without = 0
+    last_with = last_without = 0
+    for acc_id, ticket, profit in rows:
+        sign = _sign(profit)
+        if sign != last_with:
+            runs_with += 1
+            last_with = sign
+        if acc_id == account_id and ticket in new_tickets:
+            continue
+        if sign != last_without:
+            runs_without += 1
+            last_without = sign
+    return runs_with - runs_without
+
+
+def apply_portfolio_trades(db: Session, account_id: int, oldest, newest, new_tickets: Collection[int]):
+    """
+    Suma a los conjuntos guardados que incluyen la cuenta la diferencia de rachas que hacen
+    sus trades nuevos (tickets), que van de oldest a newest (filas con close_time).
+    Se recorre solo esa ventana más el trade anterior y el siguiente del conjunto: las
+    rachas de fuera no cambian. Llamar una vez por cuenta, justo antes del commit del
+    sync: los trades de las otras cuentas ya confirmados están contados, y el bloqueo
+    de las filas dura solo hasta ese commit.
+    """
+    if not new_tickets:
+        return
+    for row in _portfolio_rows(db, [account_id], lock=True):
+        ids = [int(acc_id) for acc_id in row.account_set.split(",")]
+        in_set = models.Trade.account_id.in_(ids)
+        columns = (models.Trade.account_id, models.Trade.ticket, models.Trade.profit)
+
+        before = db.query(*columns).filter(in_set, models.Trade.close_time < oldest.close_time)\
+                   .order_by(*[column.desc() for column in PORTFOLIO_ORDER]).first()
+        after = db.query(*columns).filter(in_set, models.Trade.close_time > newest.close_time)\
+                  .order_by(*PORTFOLIO_ORDER).first()
+        window = db.query(*columns)\
+                   .filter(in_set, models.Trade.close_time.between(oldest.close_time, newest.close_time))\
+                   .order_by(*PORTFOLIO_ORDER)\
+                   .yield_per(5000)
+
+        rows = itertools.chain([before] if before else [], window, [after] if after else [])
+        row.runs = (row.runs or 0) + _runs_delta(rows, account_id, new_tickets)
+
+
+def _drop_portfolios(db: Session, account_ids: Iterable[int]):
+    for row in _portfolio_rows(db, account_ids):
+        db.delete(row)
+
+
+def _count_portfolio_runs(db: Session, account_ids: List[int]) -> int:
+    """Rachas contadas en SQL (LAG sobre el signo), sin traer los trades a Python. Recorre todos los trades"""
+    sign = case((func.coalesce(models.Trade.profit, 0.0) >= 0, 1), else_=-1)
+    signs = select(
+        sign.label("sign"),
+        func.lag(sign).over(order_by=PORTFOLIO_ORDER).label("prev_sign")
+    ).where(models.Trade.account_id.in_(account_ids)).subquery()
+
+    return db.execute(
+        select(func.count()).select_from(signs).where(
+            or_(signs.c.prev_sign.is_(None), signs.c.sign != signs.c.prev_sign)
+        )
+    ).scalar() or 0
+
+
+def _active_ids(db: Session) -> List[int]:
+    # Lo que combina el dashboard global: cuentas activas que tienen acumulador
+    return [acc_id for (acc_id,) in db.query(models.AccountStats.account_id)
+            .join(models.Account, models.Account.id == models.AccountStats.account_id)
+            .filter(models.Account.active == True)]
+
+
+def refresh_portfolios(db: Session):
+    """
+    Deja guardado el conjunto de las cuentas activas (lo cuenta si falta) y borra los
+    demás. Paso de escritura: al terminar un sync, al reconstruir y al cambiar las
+    cuentas (crear su primer acumulador, activar/desactivar, borrar). No hace commit.
+    """
+    ids = _active_ids(db)
+    key = _set_key(ids) if len(ids) > 1 else None
+    db.query(models.PortfolioRuns).filter(models.PortfolioRuns.account_set != (key or ""))\
+      .delete(synchronize_session=False)
+    if key and db.get(models.PortfolioRuns, key) is None:
+        db.add(models.PortfolioRuns(account_set=key, runs=_count_portfolio_runs(db, ids)))
+        db.flush()
+
+
+def portfolio_runs(db: Session, account_ids: List[int]) -> int:
+    """
+    Rachas del portafolio desde el conjunto guardado. Si todavía no está (ej: las cuentas
+    cambiaron en otra instancia) se cuentan sin guardar nada: la lectura no escribe.
+    """
+    row = db.get(models.PortfolioRuns, _set_key(account_ids))
+    if row is not None:
+        return row.runs
+    return _count_portfolio_runs(db, account_ids)
+
+
+def load(db: Session, account_ids: List[int]) -> Dict[int, StatsAccumulator]:
+    """Acumuladores de varias cuentas en una sola consulta"""
+    if not account_ids:
+        return {}
+    rows = db.query(models.AccountStats).filter(models.AccountStats.account_id.in_(account_ids)).all()
+    return {row.account_id: to_accumulator(row) for row in rows}
+
+
+def portfolio_stats(db: Session, account_ids: List[int]) -> StatsAccumulator:
+    """Combina los acumuladores por cuenta: O(cuentas) en lugar de O(trades)"""
+    per_account = load(db, account_ids)
+    stats = StatsAccumulator()
+    for acc_stats in per_account.values():
+        stats.merge(acc_stats)
+    if len(per_account) > 1:
+        # Las cuentas sin trades no cambian las rachas (ni la clave del conjunto)
+        stats.runs = portfolio_runs(db, list(per_account))
+    return stats
+
+
+def delete_account(db: Session, account_id: int):
+    """Borra el acumulador y los conjuntos con la cuenta (quien llama hace refresh_portfolios después)"""
+    db.query(models.AccountStats).filter(models.AccountStats.account_id == account_id).delete(synchronize_session=False)
+    _drop_portfolios(db, [account_id])
+
+
+def rebuild(db: Session, account_ids: Optional[List[int]] = None):
+    """Recalcula los acumuladores desde los trades"""
+    if account_ids is None:
+        account_ids = [acc_id for (acc_id,) in db.query(models.Trade.account_id).distinct()]
+        db.query(models.PortfolioRuns).delete(synchronize_session=False)
+    else:
+        _drop_portfolios(db, account_ids)
+    for acc_id in account_ids:
+        row = db.get(models.AccountStats, acc_id)
+        if row is None:
+            row = models.AccountStats(account_id=acc_id)
+            db.add(row)
+        _recompute(db, row)
+    db.flush()
+    refresh_portfolios(db)
+
+
+def rebuild_if_empty(db: Session):
+    """Primer arranque con la tabla nueva: la llenamos a partir de los trades existentes"""
+    if db.query(models.AccountStats).first() is None and db.query(models.Trade.id).first() is not None:
+        rebuild(db)
+        db.commit()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print(__doc__)
+        sys.exit(1)
+
+    ids = [int(a) for a in sys.argv[2:]] or None
+    models.Base.metadata.create_all(bind=database.engine)
+    session = database.SessionLocal()
+    try:
+        rebuild(session, ids)
+        session.commit()
+        print(f"account_stats reconstruida ({'todas las cuentas' if not ids else ids})")
+    finally:
+        session.close()
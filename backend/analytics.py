@@ -0,0 +1,232 @@
+# backend/analytics.py
+"""
+Desglose del rendimiento por dimensiones del journal: emoción, error, estrategia,
+símbolo, tipo, hora del día y día de la semana (una o dos a la vez).
+
+Todo se agrupa en SQL. En Postgres es una sola consulta con GROUPING SETS: con dos
+dimensiones devuelve el cruce (a, b), los subtotales de cada una y el total general.
+En SQLite (entorno local) se hace una consulta GROUP BY por cada conjunto.
+
+Las métricas usan el profit del trade, igual que el dashboard (win = profit > 0);
+net_profit incluye además comisión y swap.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import Integer, case, cast, extract, func, literal, tuple_
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+import models
+import trade_queries
+
+DIMENSIONS = ("emotion", "mistake", "strategy", "symbol", "type", "hour", "weekday")
+
+WEEKDAYS = ("Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo")
+
+# Dimensiones que son un id: nombre -> (columna del trade, modelo con el nombre)
+LOOKUPS = {
+    "emotion": (models.Trade.emotion_id, models.Emotion),
+    "mistake": (models.Trade.mistake_id, models.Mistake),
+    "strategy": (models.Trade.strategy_id, models.Strategy),
+}
+
+
+def parse_dimensions(by: str) -> List[str]:
+    """'emotion,hour' -> ['emotion', 'hour'] (400 si no son válidas)"""
+    dimensions = [name.strip().lower() for name in by.split(",") if name.strip()]
+    if not 1 <= len(dimensions) <= 2 or len(set(dimensions)) != len(dimensions):
+        raise HTTPException(status_code=400, detail="Indica una o dos dimensiones distintas en 'by'")
+    invalid = [name for name in dimensions if name not in DIMENSIONS]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Dimensión no válida: {', '.join(invalid)}. Opciones: {', '.join(DIMENSIONS)}"
+        )
+    return dimensions
+
+
+def _dimension_expression(name: str, dialect: str):
+    """
+    Expresión SQL de la dimensión. Hora y día se toman de la entrada (open_time, o
+    close_time si falta). El día sale crudo del motor y se normaliza en _normalize
+    (sin parámetros en la expresión, porque Postgres la repite en el GROUP BY).
+    """
+    if name in LOOKUPS:
+        return LOOKUPS[name][0]
+    if name == "symbol":
+        return models.Trade.symbol
+    if name == "type":
+        return models.Trade.type
+
+    entry_time = func.coalesce(models.Trade.open_time, models.Trade.close_time)
+    if dialect == "postgresql":
+        field = "hour" if name == "hour" else "isodow" # isodow: 1 = lunes ... 7 = domingo
+        return cast(extract(field, entry_time), Integer)
+    # SQLite: %w -> 0 = domingo ... 6 = sábado
+    return cast(func.strftime("%H" if name == "hour" else "%w", entry_time), Integer)
+
+
+def _normalize(name: str, value, dialect: str):
+    """Día de la semana como 0 = lunes ... 6 = domingo en ambos motores"""
+    if name == "weekday" and value is not None:
+        return value - 1 if dialect == "postgresql" else (value + 6) % 7
+    return value
+
+
+def _metric_columns():
+    profit = func.coalesce(models.Trade.profit, 0.0)
+    costs = func.coalesce(models.Trade.commission, 0.0) + func.coalesce(models.Trade.swap, 0.0)
+    return [
+        func.count(models.Trade.id).label("trades"),
+        func.sum(profit).label("profit"),
+        func.sum(profit + costs).label("net_profit"),
+        func.sum(case((profit > 0, 1), else_=0)).label("wins"),
+        func.sum(case((profit < 0, 1), else_=0)).label("losses"),
+        func.sum(case((profit > 0, profit), else_=0.0)).label("gross_profit"),
+        func.sum(case((profit < 0, profit), else_=0.0)).label("gross_loss"),
+    ]
+
+
+def _grouping_sets(count: int) -> List[Tuple[int, ...]]:
+    """Índices de las dimensiones de cada conjunto: cruce, subtotales y total"""
+    if count == 1:
+        return [(0,), ()]
+    return [(0, 1), (0,), (1,), ()]
+
+
+def _sets_by_grouping_id(sets: List[Tuple[int, ...]], count: int) -> Dict[int, Tuple[int, ...]]:
+    """
+    Valor de GROUPING(d0, d1, ...) de Postgres -> conjunto. La primera dimensión es el bit
+    más alto, y cada bit está a 1 si esa dimensión está agregada (fuera del conjunto)
+    """
+    by_grouping_id = {}
+    for s in sets:
+        bits = 0
+        for i in range(count):
+            bits = (bits << 1) | (0 if i in s else 1)
+        by_grouping_id[bits] = s
+    return by_grouping_id
+
+
+def _grouped_rows(db: Session, dimensions: List[str], filters: dict) -> List[Tuple[Tuple[int, ...], tuple, object]]:
+    """Filas agregadas como (conjunto, valores de las dimensiones, métricas)"""
+    dialect = db.bind.dialect.name
+    expressions = [_dimension_expression(name, dialect) for name in dimensions]
+    sets = _grouping_sets(len(dimensions))
+    rows = []
+
+    if dialect == "postgresql":
+        # GROUPING(a, b): un bit por dimensión, a 1 si esa dimensión está agregada en la fila
+        query = db.query(
+            *[expr.label(f"d{i}") for i, expr in enumerate(expressions)],
+            func.grouping(*expressions).label("grouping_id"),
+            *_metric_columns()
+        ).group_by(func.grouping_sets(*[tuple_(*[expressions[i] for i in s]) for s in sets]))
+        query = trade_queries.apply_trade_filters(query, filters)
+
+        by_grouping_id = _sets_by_grouping_id(sets, len(dimensions))
+        for row in query.all():
+            s = by_grouping_id[row.grouping_id]
+            values = tuple(getattr(row, f"d{i}") if i in s else None for i in range(len(dimensions)))
+            rows.append((s, values, row))
+    else:
+        for s in sets:
+            grouped = [expressions[i] for i in s]
+            query = db.query(
+                *[(expressions[i] if i in s else literal(None)).label(f"d{i}") for i in range(len(dimensions))],
+                *_metric_columns()
+            )
+            query = trade_queries.apply_trade_filters(query.select_from(models.Trade), filters)
+            if grouped:
+                query = query.group_by(*grouped)
+            for row in query.all():
+                values = tuple(getattr(row, f"d{i}") for i in range(len(dimensions)))
+                rows.append((s, values, row))
+
+    return [
+        (s, tuple(_normalize(name, value, dialect) for name, value in zip(dimensions, values)), metrics)
+        for s, values, metrics in rows
+    ]
+
+
+def _labels(db: Session, dimensions: List[str], rows) -> Dict[str, Dict[object, str]]:
+    """Nombre de cada emoción/error/estrategia que aparece (una consulta por catálogo)"""
+    labels = {}
+    for index, name in enumerate(dimensions):
+        if name not in LOOKUPS:
+            continue
+        ids = {values[index] for _, values, _ in rows if values[index] is not None}
+        model = LOOKUPS[name][1]
+        labels[name] = dict(db.query(model.id, model.name).filter(model.id.in_(ids)).all()) if ids else {}
+    return labels
+
+
+def _label(name: str, value, labels: Dict[str, Dict[object, str]]) -> Optional[str]:
+    if value is None:
+        return None
+    if name in labels:
+        return labels[name].get(value)
+    if name == "hour":
+        return f"{value:02d}:00"
+    if name == "weekday":
+        return WEEKDAYS[value]
+    return str(value)
+
+
+def _metrics(row) -> dict:
+    trades = row.trades or 0
+    wins, losses = row.wins or 0, row.losses or 0
+    gross_profit, gross_loss = row.gross_profit or 0.0, row.gross_loss or 0.0
+    profit = row.profit or 0.0
+    return {
+        "trades": trades,
+        "profit": round(profit, 2),
+        "net_profit": round(row.net_profit or 0.0, 2),
+        "wins": wins,
+        "losses": losses,
+        "win_rate": round(wins / trades * 100, 2) if trades else 0.0,
+        # Mismos criterios que StatsAccumulator
+        "profit_factor": round(gross_profit / abs(gross_loss), 2) if gross_loss < 0 else 0.0,
+        "expectancy": round(profit / trades, 2) if trades else 0.0,
+        "average_win": round(gross_profit / wins, 2) if wins else 0.0,
+        "average_loss": round(gross_loss / losses, 2) if losses else 0.0,
+    }
+
+
+def _sort_key(group: dict, dimensions: List[str]):
+    # Sin valor (ej: trades sin emoción) al final
+    return tuple((group["keys"][name] is None, group["keys"][name] if group["keys"][name] is not None else 0)
+                 for name in dimensions)
+
+
+def breakdown(db: Session, dimensions: List[str], filters: dict) -> dict:
+    """Métricas por grupo (cruce de las dimensiones), subtotales por dimensión y total"""
+    rows = _grouped_rows(db, dimensions, filters)
+    labels = _labels(db, dimensions, rows)
+
+    full_set = tuple(range(len(dimensions)))
+    total = None
+    groups = []
+    subtotals = {name: [] for name in dimensions} if len(dimensions) == 2 else {}
+
+    for s, values, row in rows:
+        group = {
+            "keys": {dimensions[i]: values[i] for i in s},
+            "labels": {dimensions[i]: _label(dimensions[i], values[i], labels) for i in s},
+            **_metrics(row),
+        }
+        if s == ():
+            total = group
+        elif s == full_set:
+            groups.append(group)
+        else:
+            subtotals[dimensions[s[0]]].append(group)
+
+    groups.sort(key=lambda g: _sort_key(g, dimensions))
+    for name, items in subtotals.items():
+        items.sort(key=lambda g: _sort_key(g, [name]))
+
+    return {
+        "dimensions": dimensions,
+        "total": total,
+        "groups": groups,
+        "subtotals": subtotals,
+    }
@@ -0,0 +1,185 @@
+# backend/balance_snapshots.py
+"""
+Serie temporal de balance/equidad por cuenta (tabla balance_snapshots).
+Cada sincronización agrega una fila, así el historial no depende de
+reconstruir el balance desde initial_balance sumando trades.
+
+Para que la tabla no crezca sin límite, las filas viejas se compactan:
+    - más antiguas que SNAPSHOT_HOURLY_AFTER_HOURS -> una por hora
+    - más antiguas que SNAPSHOT_DAILY_AFTER_DAYS   -> una por día
+La fila que queda de cada periodo es la última (balance de cierre) y guarda
+el máximo y el mínimo del periodo (balance_high / balance_low), así el High
+Water Mark y el drawdown no se pierden al compactar.
+
+Compactar a mano:
+    python balance_snapshots.py compact
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from datetime import timedelta
+from typing import Dict, List, Optional
+import datetime
+import os
+import sys
+import models
+import database
+
+SNAPSHOT_HOURLY_AFTER_HOURS = int(os.getenv("SNAPSHOT_HOURLY_AFTER_HOURS", "48"))
+SNAPSHOT_DAILY_AFTER_DAYS = int(os.getenv("SNAPSHOT_DAILY_AFTER_DAYS", "30"))
+
+# Resoluciones de menor a mayor (una fila solo se compacta hacia una resolución mayor)
+RESOLUTIONS = ("raw", "hour", "day")
+
+
+def record(db: Session, account_id: int, balance: float, equity: Optional[float] = None,
+           now: Optional[datetime.datetime] = None):
+    """Agrega el balance de una sincronización. No hace commit (va en la transacción del sync)"""
+    db.add(models.BalanceSnapshot(
+        account_id=account_id,
+        ts=now or datetime.datetime.utcnow(),
+        balance=balance,
+        equity=equity,
+        balance_high=balance,
+        balance_low=balance,
+        resolution="raw",
+    ))
+
+
+def delete_account(db: Session, account_id: int):
+    """Borra el historial de balances de una cuenta (al borrar la cuenta)"""
+    db.query(models.BalanceSnapshot).filter(models.BalanceSnapshot.account_id == account_id).delete(synchronize_session=False)
+
+
+def _bucket(ts: datetime.datetime, resolution: str) -> datetime.datetime:
+    if resolution == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _compact_to(db: Session, resolution: str, cutoff: datetime.datetime) -> int:
+    """Deja una fila por cuenta y periodo entre las anteriores a cutoff. Devuelve las filas borradas"""
+    lower = RESOLUTIONS[:RESOLUTIONS.index(resolution)]
+    # Solo periodos completos: si la hora/día del cutoff se compactara ahora, sus filas
+    # siguientes se compactarían después aparte y quedarían dos filas para el mismo periodo
+    cutoff = _bucket(cutoff, resolution)
+    rows = db.query(models.BalanceSnapshot)\
+             .filter(models.BalanceSnapshot.resolution.in_(lower),
+                     models.BalanceSnapshot.ts < cutoff)\
+             .order_by(models.BalanceSnapshot.account_id, models.BalanceSnapshot.ts, models.BalanceSnapshot.id)\
+             .all()
+    if not rows:
+        return 0
+
+    # Las filas vienen ordenadas: cada periodo es un tramo seguido
+    doomed = []
+    group = [rows[0]]
+    for row in rows[1:] + [None]:
+        if row is not None and row.account_id == group[0].account_id \
+                and _bucket(row.ts, resolution) == _bucket(group[0].ts, resolution):
+            group.append(row)
+            continue
+        keep = group[-1]
+        keep.balance_high = max(r.balance_high if r.balance_high is not None else r.balance for r in group)
+        keep.balance_low = min(r.balance_low if r.balance_low is not None else r.balance for r in group)
+        keep.resolution = resolution
+        doomed.extend(r.id for r in group[:-1])
+        group = [row]
+
+    db.flush() # Primero los cambios de las filas que quedan, después el DELETE en bloque
+    for i in range(0, len(doomed), 1000):
+        db.query(models.BalanceSnapshot)\
+          .filter(models.BalanceSnapshot.id.in_(doomed[i:i + 1000]))\
+          .delete(synchronize_session=False)
+    return len(doomed)
+
+
+def compact(db: Session, now: Optional[datetime.datetime] = None) -> int:
+    """
+    Compacta las filas viejas (primero a horas, luego a días). Cada fila se revisa
+    como mucho una vez por resolución, así que el costo depende de lo nuevo, no del historial.
+    No hace commit.
+    """
+    now = now or datetime.datetime.utcnow()
+    deleted = _compact_to(db, "hour", now - timedelta(hours=SNAPSHOT_HOURLY_AFTER_HOURS))
+    deleted += _compact_to(db, "day", now - timedelta(days=SNAPSHOT_DAILY_AFTER_DAYS))
+    return deleted
+
+
+def max_balances(db: Session, account_ids: List[int]) -> Dict[int, float]:
+    """Balance máximo registrado de cada cuenta (para el High Water Mark), en una consulta"""
+    if not account_ids:
+        return {}
+    rows = db.query(models.BalanceSnapshot.account_id, func.max(models.BalanceSnapshot.balance_high))\
+             .filter(models.BalanceSnapshot.account_id.in_(account_ids))\
+             .group_by(models.BalanceSnapshot.account_id)\
+             .all()
+    return {acc_id: value for acc_id, value in rows if value is not None}
+
+
+def history(
+    db: Session,
+    account_id: int,
+    date_from: Optional[datetime.datetime] = None,
+    date_to: Optional[datetime.datetime] = None
+) -> dict:
+    """
+    Curva de balance/equidad de una cuenta con su High Water Mark y drawdown en cada punto.
+    Un solo recorrido por rango sobre (account_id, ts). El HWM arranca con el máximo anterior a date_from.
+    """
+    query = db.query(
+        models.BalanceSnapshot.ts,
+        models.BalanceSnapshot.balance,
+        models.BalanceSnapshot.equity,
+        models.BalanceSnapshot.balance_high,
+        models.BalanceSnapshot.balance_low,
+    ).filter(models.BalanceSnapshot.account_id == account_id)
+
+    high_water_mark = None
+    if date_from:
+        high_water_mark = db.query(func.max(models.BalanceSnapshot.balance_high))\
+                            .filter(models.BalanceSnapshot.account_id == account_id,
+                                    models.BalanceSnapshot.ts < date_from)\
+                            .scalar()
+        query = query.filter(models.BalanceSnapshot.ts >= date_from)
+    if date_to:
+        query = query.filter(models.BalanceSnapshot.ts < date_to)
+
+    points = []
+    max_drawdown = 0.0
+    for ts, balance, equity, high, low in query.order_by(models.BalanceSnapshot.ts).yield_per(5000):
+        high = balance if high is None else high
+        low = balance if low is None else low
+        if high_water_mark is None or high > high_water_mark:
+            high_water_mark = high
+        # El mínimo del periodo es el peor punto frente al pico (aproximado si el mínimo fue antes del máximo)
+        drawdown = max(0.0, high_water_mark - low)
+        max_drawdown = max(max_drawdown, drawdown)
+        points.append({
+            "ts": ts,
+            "balance": balance,
+            "equity": equity,
+            "high_water_mark": high_water_mark,
+            "drawdown": round(drawdown, 2),
+        })
+
+    return {
+        "account_id": account_id,
+        "high_water_mark": high_water_mark,
+        "max_drawdown": round(max_drawdown, 2),
+        "points": points,
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "compact":
+        print(__doc__)
+        sys.exit(1)
+
+    models.Base.metadata.create_all(bind=database.engine)
+    session = database.SessionLocal()
+    try:
+        deleted = compact(session)
+        session.commit()
+        print(f"balance_snapshots compactada ({deleted} filas borradas)")
+    finally:
+        session.close()
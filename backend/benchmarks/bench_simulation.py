@@ -0,0 +1,81 @@
+# backend/benchmarks/bench_simulation.py
+"""
+Mide la simulación Monte Carlo de /accounts/{id}/simulate con un historial sintético
+y las reglas más caras (drawdown trailing + diario + consistencia):
+  - serie:    un proceso, bloque a bloque
+  - paralelo: el simulador global (pool de procesos si la simulación es grande)
+
+Objetivo: 50.000 caminos x 60 días en menos de 1 s.
+
+Uso (desde backend/):  python benchmarks/bench_simulation.py [caminos] [días]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+from simulation import MonteCarloSimulator, simulator
+
+TARGET_SECONDS = 1.0
+
+
+def make_history(days=120, initial_balance=100000):
+    rng = np.random.default_rng(42)
+    totals = rng.normal(150, 900, days)
+    # Mínimo y máximo intradía alrededor del cierre del día
+    lows = np.minimum(0.0, totals) - np.abs(rng.normal(0, 400, days))
+    highs = np.maximum(0.0, totals) + np.abs(rng.normal(0, 400, days))
+    cumulative = np.cumsum(totals)
+    return {
+        "totals": totals,
+        "lows": lows,
+        "highs": highs,
+        "trades": days * 4,
+        "high_water_mark": initial_balance + max(0.0, cumulative.max()),
+        "best_day": max(0.0, totals.max()),
+    }
+
+
+RULES = {
+    "initial_balance": 100000,
+    "max_drawdown_limit": 10,
+    "trailing_drawdown": True,
+    "daily_drawdown_limit": 5,
+    "target_percent": 8,
+    "consistency_rule": 40,
+}
+START = {"balance": 100000, "high_water_mark": 100000, "best_day": 0.0}
+
+
+def best_of(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == "__main__":
+    paths = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    horizon = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    history = make_history()
+    serial = MonteCarloSimulator(workers=1)
+
+    serial_time, serial_result = best_of(lambda: serial.run(history, RULES, START, paths, horizon, seed=7))
+    simulator.run(history, RULES, START, paths, horizon, seed=7) # Arranca el pool fuera de la medición
+    pool_time, pool_result = best_of(lambda: simulator.run(history, RULES, START, paths, horizon, seed=7))
+    simulator.shutdown()
+
+    # Misma semilla: mismo resultado en serie o en paralelo
+    assert serial_result == pool_result
+    print(f"{paths} caminos x {horizon} días ({simulator.workers} procesos, bloques de {simulator.chunk_paths})")
+    print(f"  serie:    {serial_time * 1000:8.1f} ms")
+    print(f"  paralelo: {pool_time * 1000:8.1f} ms  ({serial_time / pool_time:.1f}x)")
+    print(f"  aprueba {pool_result['pass_probability']}%  se quema {pool_result['fail_probability']}%")
+    best = min(serial_time, pool_time)
+    print(f"  objetivo < {TARGET_SECONDS:.0f} s: {'OK' if best < TARGET_SECONDS else 'NO'}")
+    sys.exit(0 if best < TARGET_SECONDS else 1)
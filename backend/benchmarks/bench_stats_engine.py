@@ -0,0 +1,118 @@
+# backend/benchmarks/bench_stats_engine.py
+"""
+Compara el cálculo anterior de /dashboard-stats (listas + statistics + varias pasadas)
+con stats_engine.StatsAccumulator (una sola pasada, lo que se guarda en account_stats),
+más el P&L por día que mantiene daily_pnl. No necesita base de datos.
+
+Uso (desde backend/):  python benchmarks/bench_stats_engine.py [n_trades]
+"""
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import stats_engine
+
+
+def legacy_stats(rows):
+    """Réplica del código anterior de get_dashboard_stats"""
+    profits = [p for _, p in rows]
+    daily_profit_map = {}
+    for close_time, profit in rows:
+        d_str = close_time.strftime("%Y-%m-%d")
+        daily_profit_map[d_str] = daily_profit_map.get(d_str, 0) + profit
+
+    total = len(profits)
+    winning = len([p for p in profits if p > 0])
+    win_rate = (winning / total) * 100 if total else 0.0
+    wins = [p for p in profits if p > 0]
+    losses = [p for p in profits if p < 0]
+    avg_win = statistics.mean(wins) if wins else 0.0
+    avg_loss = statistics.mean(losses) if losses else 0.0
+    gross_loss = abs(sum(losses))
+    daily_sums = {}
+    for close_time, profit in rows:
+        day = close_time.strftime("%Y-%m-%d")
+        daily_sums[day] = daily_sums.get(day, 0) + profit
+
+    sharpe = 0.0
+    if len(profits) > 1:
+        stdev = statistics.stdev(profits)
+        if stdev != 0:
+            sharpe = round(statistics.mean(profits) / stdev, 2)
+
+    z_score = 0.0
+    if len(profits) > 2:
+        runs = 1
+        for i in range(1, total):
+            if (1 if profits[i - 1] >= 0 else -1) != (1 if profits[i] >= 0 else -1):
+                runs += 1
+        if wins and losses:
+            expected = (2 * len(wins) * len(losses) / total) + 1
+            std_dev = ((expected - 1) * (expected - 2)) / (total - 1)
+            if std_dev > 0:
+                z_score = round((runs - expected) / (std_dev ** 0.5), 2)
+
+    return {
+        "win_rate": round(win_rate, 2),
+        "best_trade": round(max(profits) if profits else 0.0, 2),
+        "worst_trade": round(min(profits) if profits else 0.0, 2),
+        "average_win": round(avg_win, 2),
+        "average_loss": round(avg_loss, 2),
+        "highest_profitable_day": round(max(daily_sums.values()) if daily_sums else 0.0, 2),
+        "total_trades_count": total,
+        "profit_factor": round(sum(wins) / gross_loss, 2) if gross_loss > 0 else 0.0,
+        "average_rrr": round(avg_win / abs(avg_loss), 2) if avg_loss != 0 else 0.0,
+        "sharpe_ratio": sharpe,
+        "z_score": z_score,
+    }, daily_profit_map
+
+
+def accumulator_stats(rows):
+    """Camino actual: el acumulador trade por trade y el P&L diario (tabla daily_pnl)"""
+    stats = stats_engine.StatsAccumulator()
+    daily = {}
+    for close_time, profit in rows:
+        stats.add(profit)
+        day = close_time.date()
+        daily[day] = daily.get(day, 0.0) + profit
+    return stats, daily
+
+
+def make_rows(n):
+    random.seed(42)
+    t = datetime.datetime(2020, 1, 1)
+    rows = []
+    for _ in range(n):
+        t += datetime.timedelta(minutes=random.randint(1, 240))
+        rows.append((t, round(random.gauss(5, 80), 2)))
+    return rows
+
+
+def best_of(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rows = make_rows(n)
+
+    legacy_time, (legacy, legacy_daily) = best_of(lambda: legacy_stats(rows))
+    engine_time, (stats, daily) = best_of(lambda: accumulator_stats(rows))
+    summary = stats_engine.stats_summary(stats, max(daily.values()) if daily else 0.0)
+
+    assert summary == legacy, (summary, legacy)
+    assert [day.isoformat() for day in daily] == list(legacy_daily)
+
+    print(f"{n} trades")
+    print(f"  anterior:     {legacy_time * 1000:8.1f} ms")
+    print(f"  acumulador:   {engine_time * 1000:8.1f} ms  ({legacy_time / engine_time:.1f}x)")
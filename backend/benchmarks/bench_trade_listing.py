@@ -0,0 +1,103 @@
+# backend/benchmarks/bench_trade_listing.py
+"""
+Compara las dos formas de servir /trades/ con N trades (SQLite en memoria):
+  - full:    objetos del ORM (con el plan de carga) + TradeResponse por fila + JSON de pydantic
+  - summary: tuplas de columnas + dicts + fast_json (orjson si está instalado)
+
+Uso (desde backend/):  python benchmarks/bench_trade_listing.py [n_trades]
+"""
+import datetime
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pydantic import TypeAdapter
+from typing import List
+import database
+import models
+import schemas
+import trade_queries
+import fast_json
+
+
+def populate(db, n):
+    random.seed(42)
+    accounts = [models.Account(login_id=i, alias=f"Cuenta {i}", initial_balance=100000, balance=100000) for i in range(3)]
+    emotions = [models.Emotion(name=name) for name in ("Calma", "FOMO", "Miedo", "Venganza")]
+    mistakes = [models.Mistake(name=name) for name in ("Sin SL", "Sobreapalancado", "Entrada tardía")]
+    strategy = models.Strategy(name="Breakout")
+    db.add_all(accounts + emotions + mistakes + [strategy])
+    db.flush()
+
+    item = models.StrategyItem(strategy_id=strategy.id, condition="Rompe el máximo", weight_percent=100)
+    db.add(item)
+    db.flush()
+
+    ideas = []
+    for i in range(200):
+        idea = models.TradeIdea(asset="EURUSD", strategy_id=strategy.id, status="EXECUTED")
+        idea.checklist = [models.TradeIdeaItem(strategy_item_id=item.id, is_active=True, direction="BUY") for _ in range(3)]
+        idea.evidences = [models.TimeframeEvidence(timeframe=tf, note="Nota", image_url="/uploads/x.png") for tf in ("1H", "15M")]
+        ideas.append(idea)
+    db.add_all(ideas)
+    db.flush()
+
+    t = datetime.datetime(2022, 1, 1)
+    rows = []
+    for k in range(n):
+        t += datetime.timedelta(minutes=random.randint(1, 120))
+        rows.append({
+            "account_id": random.choice(accounts).id, "ticket": k, "symbol": random.choice(["EURUSD", "XAUUSD", "NAS100"]),
+            "type": random.choice(["BUY", "SELL"]), "open_time": t - datetime.timedelta(minutes=15), "close_time": t,
+            "profit": round(random.gauss(5, 80), 2), "commission": -3.5, "swap": 0.0, "comment": "tp",
+            "emotion_id": random.choice(emotions).id, "mistake_id": random.choice(mistakes).id if random.random() < 0.6 else None,
+            "strategy_id": strategy.id, "trade_idea_id": random.choice(ideas).id if random.random() < 0.5 else None,
+            "notes": "Entrada en la ruptura",
+        })
+    db.execute(models.Trade.__table__.insert(), rows)
+    db.commit()
+
+
+def full_path(db, n):
+    trades = trade_queries.with_response_relations(trade_queries.apply_cursor(db.query(models.Trade), None)).limit(n).all()
+    result = []
+    for t in trades:
+        t_resp = schemas.TradeResponse.model_validate(t)
+        t_resp.account_alias = t.account.alias
+        result.append(t_resp)
+    body = TypeAdapter(List[schemas.TradeResponse]).dump_json(result) # Lo que hace FastAPI con response_model
+    db.expunge_all() # Sin identity map caliente entre repeticiones
+    return body
+
+
+def summary_path(db, n):
+    rows = trade_queries.apply_cursor(trade_queries.summary_query(db), None).limit(n).all()
+    keys = trade_queries.SUMMARY_KEYS
+    return fast_json.dumps([dict(zip(keys, row)) for row in rows])
+
+
+def best_of(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    populate(db, n)
+
+    full_time, full_body = best_of(lambda: full_path(db, n))
+    summary_time, summary_body = best_of(lambda: summary_path(db, n))
+
+    print(f"{n} trades ({'orjson' if fast_json.orjson else 'json'})")
+    print(f"  full:    {full_time * 1000:8.1f} ms  {len(full_body) / 1024:8.0f} KB")
+    print(f"  summary: {summary_time * 1000:8.1f} ms  {len(summary_body) / 1024:8.0f} KB  ({full_time / summary_time:.1f}x)")
@@ -0,0 +1,81 @@
+# backend/daily_drawdown.py
+"""
+Drawdown diario de las cuentas de fondeo (Account.daily_drawdown_limit).
+En cada sincronización se guarda el balance al inicio del día del broker
+(tabla account_day_start), así el dashboard evalúa la pérdida del día con
+una lectura por cuenta, sin recorrer trades.
+
+El día del broker cambia a medianoche de la hora del servidor MT5. Esa hora sale de
+BROKER_TIMEZONE (zona de zoneinfo, ej: "Europe/Athens" = UTC+2, UTC+3 en verano), o si
+no está configurada de un desplazamiento fijo BROKER_UTC_OFFSET_HOURS, que no sigue el
+horario de verano (durante medio año el día cambia una hora antes o después).
+
+La regla se evalúa sobre el balance (P&L cerrado), no sobre la equidad: la VPS solo
+informa la equidad en el momento de cada sync, y con eso no se puede saber la equidad
+que había a medianoche. Las pérdidas flotantes de posiciones abiertas no cuentan hasta
+que se cierran.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from datetime import timedelta
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+import datetime
+import os
+import models
+
+# Zona horaria del servidor del broker; sin ella, desplazamiento fijo respecto a UTC (horas)
+BROKER_TIMEZONE = os.getenv("BROKER_TIMEZONE")
+BROKER_UTC_OFFSET_HOURS = float(os.getenv("BROKER_UTC_OFFSET_HOURS", "2"))
+
+BROKER_TZ = ZoneInfo(BROKER_TIMEZONE) if BROKER_TIMEZONE else datetime.timezone(timedelta(hours=BROKER_UTC_OFFSET_HOURS))
+
+
+def broker_day(now: Optional[datetime.datetime] = None) -> datetime.date:
+    """Día actual en la hora del servidor del broker (now en UTC)"""
+    now = now or datetime.datetime.utcnow()
+    return now.replace(tzinfo=datetime.timezone.utc).astimezone(BROKER_TZ).date()
+
+
+def update_day_start(db: Session, acc: models.Account, now: Optional[datetime.datetime] = None):
+    """
+    Guarda el balance de inicio del día si es la primera sincronización del día.
+    Llamar después de actualizar el balance y de insertar los trades (misma transacción):
+    inicio del día = balance actual - lo cerrado hoy según daily_pnl (profit + comisión + swap).
+    No hace commit.
+    """
+    now = now or datetime.datetime.utcnow()
+    day = broker_day(now)
+    state = acc.day_start
+    if state is not None and state.day == day:
+        state.updated_at = now
+        return state
+
+    closed_today = db.query(
+        func.sum(models.DailyPnL.profit + models.DailyPnL.commission + models.DailyPnL.swap)
+    ).filter(
+        models.DailyPnL.account_id == acc.id,
+        models.DailyPnL.day == day
+    ).scalar() or 0.0
+
+    if state is None:
+        state = acc.day_start = models.AccountDayStart(account_id=acc.id)
+    state.day = day
+    state.start_balance = (acc.balance or 0.0) - closed_today
+    state.updated_at = now
+    return state
+
+
+def load_day_starts(db: Session, account_ids: List[int], day: Optional[datetime.date] = None) -> Dict[int, float]:
+    """
+    Balance de inicio del día de varias cuentas en una consulta. Las cuentas sin
+    sincronización hoy no aparecen (no se registró ninguna pérdida del día).
+    """
+    if not account_ids:
+        return {}
+    day = day or broker_day()
+    rows = db.query(models.AccountDayStart.account_id, models.AccountDayStart.start_balance)\
+             .filter(models.AccountDayStart.account_id.in_(account_ids),
+                     models.AccountDayStart.day == day)\
+             .all()
+    return dict(rows)
@@ -0,0 +1,121 @@
+# backend/daily_pnl.py
+"""
+Mantiene la tabla daily_pnl (P&L por cuenta y día) para que el calendario y la
+curva de equidad no tengan que recorrer los trades en cada petición.
+
+Reconstruir desde los trades (ej: después de cargar datos a mano):
+    python daily_pnl.py rebuild            # todas las cuentas
+    python daily_pnl.py rebuild 3 7        # solo las cuentas 3 y 7
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case, select
+from typing import Dict, Iterable, List, Optional
+import datetime
+import sys
+import models
+import database
+
+
+def _aggregate(account_id: int, trades: Iterable) -> List[dict]:
+    """Agrupa por día filas con close_time, profit, commission y swap"""
+    days: Dict[datetime.date, dict] = {}
+    for t in trades:
+        day = t.close_time.date()
+        row = days.get(day)
+        if row is None:
+            row = days[day] = {
+                "account_id": account_id, "day": day, "profit": 0.0, "commission": 0.0,
+                "swap": 0.0, "trade_count": 0, "wins": 0, "losses": 0
+            }
+        profit = t.profit or 0.0
+        row["profit"] += profit
+        row["commission"] += t.commission or 0.0
+        row["swap"] += t.swap or 0.0
+        row["trade_count"] += 1
+        if profit > 0:
+            row["wins"] += 1
+        elif profit < 0:
+            row["losses"] += 1
+    return list(days.values())
+
+
+def apply_trades(db: Session, account_id: int, trades: Iterable):
+    """
+    Suma trades recién insertados a daily_pnl con un UPSERT (una fila por día).
+    No hace commit: va en la misma transacción que el INSERT de los trades.
+    """
+    rows = _aggregate(account_id, trades)
+    if not rows:
+        return
+
+    table = models.DailyPnL.__table__
+    stmt = database.dialect_insert(db, models.DailyPnL)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["account_id", "day"],
+        set_={
+            "profit": table.c.profit + stmt.excluded.profit,
+            "commission": table.c.commission + stmt.excluded.commission,
+            "swap": table.c.swap + stmt.excluded.swap,
+            "trade_count": table.c.trade_count + stmt.excluded.trade_count,
+            "wins": table.c.wins + stmt.excluded.wins,
+            "losses": table.c.losses + stmt.excluded.losses,
+        }
+    )
+    db.execute(stmt, rows)
+
+
+def delete_account(db: Session, account_id: int):
+    """Borra el P&L diario de una cuenta (al borrar la cuenta o sus trades)"""
+    db.query(models.DailyPnL).filter(models.DailyPnL.account_id == account_id).delete(synchronize_session=False)
+
+
+def rebuild(db: Session, account_ids: Optional[List[int]] = None):
+    """Recalcula daily_pnl desde los trades con un solo INSERT ... SELECT ... GROUP BY"""
+    clear = db.query(models.DailyPnL)
+    if account_ids:
+        clear = clear.filter(models.DailyPnL.account_id.in_(account_ids))
+    clear.delete(synchronize_session=False)
+
+    day = func.date(models.Trade.close_time)
+    source = select(
+        models.Trade.account_id,
+        day,
+        func.sum(func.coalesce(models.Trade.profit, 0.0)),
+        func.sum(func.coalesce(models.Trade.commission, 0.0)),
+        func.sum(func.coalesce(models.Trade.swap, 0.0)),
+        func.count(),
+        func.sum(case((models.Trade.profit > 0, 1), else_=0)),
+        func.sum(case((models.Trade.profit < 0, 1), else_=0)),
+    ).group_by(models.Trade.account_id, day)
+    if account_ids:
+        source = source.where(models.Trade.account_id.in_(account_ids))
+
+    db.execute(
+        models.DailyPnL.__table__.insert().from_select(
+            ["account_id", "day", "profit", "commission", "swap", "trade_count", "wins", "losses"],
+            source
+        )
+    )
+
+
+def rebuild_if_empty(db: Session):
+    """Primer arranque con la tabla nueva: la llenamos a partir de los trades existentes"""
+    if db.query(models.DailyPnL).first() is None and db.query(models.Trade.id).first() is not None:
+        rebuild(db)
+        db.commit()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print(__doc__)
+        sys.exit(1)
+
+    ids = [int(a) for a in sys.argv[2:]] or None
+    models.Base.metadata.create_all(bind=database.engine)
+    session = database.SessionLocal()
+    try:
+        rebuild(session, ids)
+        session.commit()
+        print(f"daily_pnl reconstruida ({'todas las cuentas' if not ids else ids})")
+    finally:
+        session.close()
@@ -1,6 +1,7 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects import postgresql, sqlite
 import os
 
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -14,4 +15,13 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def dialect_insert(db, model):
+    """
+    INSERT con soporte de ON CONFLICT según el motor (Postgres en producción,
+    SQLite en local). Ambos exponen on_conflict_do_nothing / on_conflict_do_update.
+    """
+    if db.bind.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
@@ -0,0 +1,133 @@
+# backend/export.py
+"""
+Exportación en streaming (CSV o Parquet) de consultas grandes: las filas se leen
+con un cursor del lado del servidor (yield_per) y se envían por lotes, así la
+memoria no depende del número de filas exportadas.
+"""
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from sqlalchemy import Date, DateTime, Float, Integer
+from typing import Callable, Iterator, Sequence, Tuple
+import csv
+import datetime
+import io
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+import database
+
+# Filas por lote (lectura de la BD y row group de Parquet)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _rows(make_query: Callable[[Session], object], batch_size: int) -> Iterator[list]:
+    """Lotes de filas de la consulta, con su propia sesión (el streaming sigue después del endpoint)"""
+    db = database.SessionLocal()
+    try:
+        # yield_per: en Postgres usa un cursor del servidor (stream_results)
+        batch = []
+        for row in make_query(db).yield_per(batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        db.close()
+
+
+def stream_csv(make_query: Callable[[Session], object], keys: Sequence[str],
+               batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(keys)
+    for batch in _rows(make_query, batch_size):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # Sin filas: al menos la cabecera
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink:
+    """Archivo de solo escritura para ParquetWriter: guarda lo escrito hasta que lo enviamos"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_type(column):
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column.type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def stream_parquet(make_query: Callable[[Session], object], columns: Sequence[Tuple[str, object]],
+                   batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """Un row group por lote; cada lote se envía en cuanto se escribe"""
+    schema = pa.schema([(key, _arrow_type(column)) for key, column in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in _rows(make_query, batch_size):
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    finally:
+        writer.close() # Escribe el footer
+    yield sink.take()
+
+
+def streaming_response(name: str, fmt: str, make_query: Callable[[Session], object],
+                       columns: Sequence[Tuple[str, object]]) -> StreamingResponse:
+    """
+    Respuesta de descarga (CSV o Parquet) de make_query(db). columns son las
+    (nombre, columna) que selecciona la consulta, en el mismo orden.
+    """
+    if fmt == "parquet":
+        body = stream_parquet(make_query, columns)
+    else:
+        body = stream_csv(make_query, [key for key, _ in columns])
+
+    filename = f"{name}_{datetime.date.today():%Y%m%d}.{fmt}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,33 @@
+# backend/fast_json.py
+"""
+Respuesta JSON rápida para listados grandes que ya vienen como dicts/tuplas
+(sin modelos de pydantic por fila). Usa orjson si está instalado; si no, json estándar.
+"""
+from fastapi import Response
+from typing import Any
+import datetime
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él funciona igual, solo más lento
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} no es serializable a JSON")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,152 @@
+# backend/ingest.py
+from sqlalchemy.orm import Session
+from typing import Iterable, List, Optional
+import datetime
+import os
+import models
+import database
+import daily_pnl
+import account_stats
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Trades por INSERT al ingerir (la memoria queda acotada a un lote)
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+
+
+def parse_vps_trade(t: dict, account_id: int) -> Optional[dict]:
+    """Convierte un trade del JSON de la VPS en una fila lista para insertar (None si es inválido)"""
+    try:
+        close_dt = datetime.datetime.strptime(f"{t['trade_date']} {t['exit_time']}", DATETIME_FORMAT)
+    except (KeyError, ValueError):
+        return None
+
+    open_dt = None
+    if t.get('entry_time'):
+        try:
+            open_dt = datetime.datetime.strptime(f"{t['trade_date']} {t['entry_time']}", DATETIME_FORMAT)
+        except ValueError:
+            pass
+
+    return {
+        "account_id": account_id,
+        "ticket": t["ticket"],
+        "position_id": t.get("position_id"),
+        "symbol": t["symbol"],
+        "type": t["type"],
+        "open_time": open_dt,
+        "close_time": close_dt,
+        "profit": t["profit"],
+        "commission": t["commission"],
+        "swap": t["swap"],
+        "comment": t.get("comment"),
+    }
+
+
+def _insert_ignore_duplicates(db: Session):
+    """INSERT ... ON CONFLICT DO NOTHING sobre la restricción unique_trade_per_account"""
+    stmt = database.dialect_insert(db, models.Trade)
+    if db.bind.dialect.name == "postgresql":
+        return stmt.on_conflict_do_nothing(constraint="unique_trade_per_account")
+    # SQLite (entorno local) no soporta ON CONFLICT ON CONSTRAINT, usamos las columnas
+    return stmt.on_conflict_do_nothing(index_elements=["ticket", "account_id"])
+
+
+def insert_trades(db: Session, rows: List[dict]) -> list:
+    """
+    Inserta un lote de trades en bloque. Los duplicados (mismo ticket y cuenta)
+    se ignoran en la base de datos. Devuelve las filas realmente insertadas
+    (ticket, close_time, profit, commission, swap) para actualizar los agregados.
+    No hace commit: eso lo decide quien llama.
+    """
+    if not rows:
+        return []
+    stmt = _insert_ignore_duplicates(db).returning(
+        models.Trade.ticket,
+        models.Trade.close_time,
+        models.Trade.profit,
+        models.Trade.commission,
+        models.Trade.swap,
+    )
+    return db.execute(stmt, rows).all()
+
+
+class TradeIngestor:
+    """
+    Recibe trades de la VPS uno a uno y los inserta en lotes de tamaño fijo,
+    así la memoria no crece con el tamaño del historial (solo se guardan los tickets
+    insertados, para las rachas del portafolio). Lleva el conteo exacto y el trade
+    más reciente insertado (para la marca de agua).
+    """
+
+    def __init__(self, db: Session, account_id: int, batch_size: int = INGEST_BATCH_SIZE):
+        self.db = db
+        self.account_id = account_id
+        self.batch_size = batch_size
+        self.pending: List[dict] = []
+        self.received = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.newest = None # Fila insertada con el close_time más alto
+        self.oldest = None # Y con el más bajo
+        self.new_tickets = set()
+
+    def add(self, raw_trade: dict):
+        self.received += 1
+        row = parse_vps_trade(raw_trade, self.account_id)
+        if row is None:
+            self.invalid += 1
+            return
+        self.pending.append(row)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def add_invalid(self):
+        """Algo que llegó y no se pudo leer como trade (ej: una línea NDJSON rota)"""
+        self.received += 1
+        self.invalid += 1
+
+    def flush(self):
+        if not self.pending:
+            return
+        inserted_rows = insert_trades(self.db, self.pending)
+        # El P&L diario y los acumuladores se actualizan en la misma transacción que los trades
+        daily_pnl.apply_trades(self.db, self.account_id, inserted_rows)
+        account_stats.apply_trades(self.db, self.account_id, inserted_rows)
+        self.inserted += len(inserted_rows)
+        self.skipped += len(self.pending) - len(inserted_rows) # Ya existían en la base de datos
+        for r in inserted_rows:
+            if self.newest is None or (r.close_time, r.ticket) > (self.newest.close_time, self.newest.ticket):
+                self.newest = r
+            if self.oldest is None or (r.close_time, r.ticket) < (self.oldest.close_time, self.oldest.ticket):
+                self.oldest = r
+            self.new_tickets.add(r.ticket)
+        self.pending = []
+
+    def finish(self) -> dict:
+        """Inserta lo que quede pendiente y devuelve el conteo"""
+        self.flush()
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "skipped": self.skipped,
+            "invalid": self.invalid,
+        }
+
+    def apply_portfolios(self):
+        """
+        Suma los trades insertados a las rachas de los portafolios. Una vez por cuenta,
+        después de finish() y justo antes del commit (bloquea esas filas hasta el commit)
+        """
+        account_stats.apply_portfolio_trades(self.db, self.account_id, self.oldest, self.newest, self.new_tickets)
+
+
+def ingest_account_trades(db: Session, account_id: int, raw_trades: Iterable[dict]) -> dict:
+    """Parsea e inserta (en lotes) los trades de una cuenta y devuelve el conteo exacto"""
+    ingestor = TradeIngestor(db, account_id)
+    for t in raw_trades:
+        ingestor.add(t)
+    result = ingestor.finish()
+    ingestor.apply_portfolios()
+    return result
@@ -1,26 +1,42 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Query
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
-from typing import List, Optional
+from typing import List, Optional, Union
 import models, database, schemas
 from pydantic import BaseModel
-import requests
 import os
 import datetime
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import date, timedelta
-from sqlalchemy import func, desc
-from sqlalchemy import extract
+from sqlalchemy import func, desc, update
 from security import security
+from sync_jobs import sync_jobs
+import vps_client
 from routers import servers
-import statistics
+import stats_engine
+import daily_pnl
+import account_stats
+import daily_drawdown
+import balance_snapshots
+import trade_queries
+from fast_json import FastJSONResponse
+import search
+import export
+import statement_import
+import analytics
+from simulation import simulator, simulate_account, SIMULATION_MAX_PATHS, MIN_HISTORY_DAYS
+from response_cache import response_cache
 from contextlib import asynccontextmanager
 import shutil
 import uuid
 from fastapi.staticfiles import StaticFiles
 
-# Crear tablas al iniciar
+# Crear tablas al iniciar. Los índices nuevos de tablas existentes en Postgres se crean
+# aparte, sin frenar el arranque (python models.py create-indexes)
 models.Base.metadata.create_all(bind=database.engine)
+if database.engine.dialect.name != "postgresql":
+    models.create_missing_indexes(database.engine)
+search.setup(database.engine) # Índices de texto (solo Postgres)
 
 # 1. Función para inyectar datos iniciales (Seeding)
 def seed_initial_data(db: Session):
@@ -45,10 +61,16 @@ async def lifespan(app: FastAPI):
     db = database.SessionLocal()
     try:
         seed_initial_data(db)
+        daily_pnl.rebuild_if_empty(db)
+        account_stats.rebuild_if_empty(db)
     finally:
         db.close()
+    # Cliente HTTP compartido (pool keep-alive) para las llamadas a la VPS
+    vps_client.init_client()
     yield
-    # Lógica de apagado (si la hay)
+    # Lógica de apagado
+    vps_client.close_client()
+    simulator.shutdown()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -65,29 +87,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],         # Permitir todos los métodos (GET, POST, etc)
     allow_headers=["*"],         # Permitir todos los headers
+    expose_headers=["X-Next-Cursor", "X-Total-Count"], # Paginación de /trades/
 )
 
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
-# --- CONFIGURACIÓN VPS ---
-VPS_URL = os.getenv("VPS_MT5_URL")
-VPS_KEY = os.getenv("VPS_API_KEY")
-
-# --- SCHEMAS (Pydantic) ---
-class AccountCreate(BaseModel):
-    login_id: int
-    password: str
-    server: str
-    alias: str
-    prop_firm: str
-
-class AccountResponse(AccountCreate):
-    id: int
-    balance: float
-    last_sync: datetime.datetime = None # Calculado
-    class Config:
-        orm_mode = True
-
 # --- ENDPOINTS ---
 
 # 1. Registrar Cuenta
@@ -126,12 +130,14 @@ def create_account(account: schemas.AccountCreate, db: Session = Depends(databas
     db.add(db_acc)
     db.commit()
     db.refresh(db_acc)
+    response_cache.invalidate([db_acc.id])
     return db_acc
 
 # 2. Obtener Cuentas
 @app.get("/accounts/", response_model=List[schemas.AccountResponse])
 def get_accounts(db: Session = Depends(database.get_db)):
-    return db.query(models.Account).all()
+    # Cargamos el estado de sincronización en la misma consulta (para last_sync)
+    return db.query(models.Account).options(joinedload(models.Account.sync_state)).all()
 
 # 2. Endpoint DELETE
 @app.delete("/accounts/{account_id}")
@@ -140,11 +146,17 @@ def delete_account(account_id: int, db: Session = Depends(database.get_db)):
     if not account:
         raise HTTPException(status_code=404, detail="Cuenta no encontrada")
     
-    # Opcional: Borrar también los trades asociados
+    # Opcional: Borrar también los trades asociados (y su P&L diario)
     db.query(models.Trade).filter(models.Trade.account_id == account_id).delete()
+    daily_pnl.delete_account(db, account_id)
+    account_stats.delete_account(db, account_id)
+    balance_snapshots.delete_account(db, account_id)
     
     db.delete(account)
+    db.flush()
+    account_stats.refresh_portfolios(db) # El conjunto de cuentas activas cambió
     db.commit()
+    response_cache.invalidate([account_id])
     return {"message": "Cuenta eliminada correctamente"}
 
 @app.patch("/accounts/{account_id}", response_model=schemas.AccountResponse)
@@ -165,145 +177,95 @@ def update_account(account_id: int, account_data: schemas.AccountUpdate, db: Ses
         
     if account_data.outcome is not None:
         db_account.outcome = account_data.outcome
+
+    if account_data.active is not None:
+        db.flush()
+        account_stats.refresh_portfolios(db) # El conjunto de cuentas activas puede cambiar
         
     db.commit()
     db.refresh(db_account)
+    response_cache.invalidate([account_id])
     return db_account
 
-# 3. LÓGICA DE SINCRONIZACIÓN (El botón mágico)
-@app.post("/sync-all")
-def sync_all_accounts(db: Session = Depends(database.get_db)):
-    # 1. Obtener todas las cuentas activas locales
-    local_accounts = db.query(models.Account).filter(models.Account.active == True).all()
-    
-    if not local_accounts:
-        return {"message": "No hay cuentas activas para sincronizar"}
-
-    # 2. Preparar el payload INTELIGENTE (Fecha por cuenta)
-    accounts_payload = []
-    
-    for acc in local_accounts:
-        # Buscamos la fecha del último trade cerrado registrado en NUESTRA base de datos para ESTA cuenta
-        last_trade_date = db.query(func.max(models.Trade.close_time))\
-                            .filter(models.Trade.account_id == acc.id)\
-                            .scalar()
-        
-        # Si hay fecha, usamos esa. Si es cuenta nueva, usamos fecha antigua.
-        # Le damos un margen de 1 minuto atrás para evitar perder trades por segundos
-        if last_trade_date:
-            sync_date_str = (last_trade_date - timedelta(days=1)).strftime("%Y-%m-%d 00:00:00")
-        else:
-            sync_date_str = f"{acc.start_date} 00:00:00"
-
-        real_password = security.decrypt(acc.password)
-
-        accounts_payload.append({
-            "login": acc.login_id,
-            "password": real_password,
-            "server": acc.server,
-            "last_sync_date": sync_date_str  # <--- AQUÍ ESTÁ LA MAGIA
-        })
-
-    # Payload final (Ya no enviamos last_sync_date global)
-    payload = {
-        "accounts": accounts_payload
-    }
-
-    print(payload)
-
-    # 3. LLAMAR A LA VPS
-    try:
-        response = requests.post(
-            VPS_URL, 
-            json=payload, 
-            headers={"X-API-KEY": VPS_KEY}, 
-            timeout=120 # Aumentamos timeout porque si hay muchas cuentas puede tardar
-        )
-        
-        if response.status_code != 200:
-            print(f"Error VPS: {response.text}")
-            raise HTTPException(status_code=500, detail=f"Error VPS: {response.text}")
-            
-        vps_response = response.json()
-        vps_data_list = vps_response.get("data", [])
-
-    except Exception as e:
-        print(f"🔥 Error conectando a VPS: {e}")
-        raise HTTPException(status_code=500, detail="Error de conexión con VPS")
-
-    total_new_trades = 0
+@app.post("/accounts/{account_id}/import", response_model=schemas.StatementImportResult)
+def import_statement(account_id: int, file: UploadFile = File(...), db: Session = Depends(database.get_db)):
+    """Importa el historial desde un reporte de MT5 (HTML o CSV). Los trades repetidos se ignoran"""
+    account = db.query(models.Account).filter(models.Account.id == account_id).first()
+    if not account:
+        raise HTTPException(status_code=404, detail="Cuenta no encontrada")
 
-    # 4. PROCESAR RESPUESTA
-    for acc_json in vps_data_list:
-        # Buscamos la cuenta local correspondiente
-        current_db_acc = next((a for a in local_accounts if a.login_id == acc_json.get("account")), None)
-        
-        if not current_db_acc:
-            continue
+    filename = file.filename or ""
+    if not filename.lower().endswith((".htm", ".html", ".csv")):
+        raise HTTPException(status_code=400, detail="Formato no soportado: sube el reporte de MT5 en HTML o CSV")
 
-        # A. Actualizar Balance si viene correcto
-        if acc_json.get("status") == "success" and "balance" in acc_json:
-            current_db_acc.balance = acc_json["balance"]
-        
-        # B. Procesar Trades Nuevos
-        new_trades_list = acc_json.get("new_trades", [])
-        
-        for t in new_trades_list:
-            # Parseo de fechas (igual que antes)
-            try:
-                close_dt_str = f"{t['trade_date']} {t['exit_time']}"
-                close_dt = datetime.datetime.strptime(close_dt_str, "%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                continue
-
-            open_dt = None
-            if t.get('entry_time'):
-                try:
-                    open_dt_str = f"{t['trade_date']} {t['entry_time']}"
-                    open_dt = datetime.datetime.strptime(open_dt_str, "%Y-%m-%d %H:%M:%S")
-                except ValueError:
-                    pass
-
-            # Evitar duplicados (Doble verificación)
-            existing = db.query(models.Trade).filter(
-                models.Trade.ticket == t["ticket"],
-                models.Trade.account_id == current_db_acc.id
-            ).first()
-
-            if not existing:
-                new_trade_db = models.Trade(
-                    account_id=current_db_acc.id,
-                    ticket=t["ticket"],
-                    position_id=t.get("position_id"),
-                    symbol=t["symbol"],
-                    type=t["type"],
-                    open_time=open_dt,
-                    close_time=close_dt,
-                    profit=t["profit"],
-                    commission=t["commission"],
-                    swap=t["swap"],
-                    comment=t.get("comment")
-                )
-                db.add(new_trade_db)
-                total_new_trades += 1
-        
-        db.commit()
-    print(f"Trades nuevos: {len(new_trades_list)}")
-    return {"status": "success", "new_trades_added": len(new_trades_list)}
+    result = statement_import.import_statement(db, account_id, file.file, filename)
+    db.commit()
+    if result["inserted"]:
+        response_cache.invalidate([account_id])
+    return result
 
-@app.get("/trades/", response_model=List[schemas.TradeResponse])
+# 3. LÓGICA DE SINCRONIZACIÓN (El botón mágico)
+# La sincronización corre en segundo plano: el POST devuelve el id del trabajo al instante
+@app.post("/sync-all", response_model=schemas.SyncJobResponse)
+def sync_all_accounts():
+    job, joined = sync_jobs.start_or_join()
+    job["joined"] = joined
+    return job
+
+@app.get("/vps-metrics")
+def get_vps_metrics():
+    # Latencia y bytes transferidos con la VPS desde que arrancó el backend
+    return vps_client.get_client().metrics()
+
+@app.get("/sync-jobs/{job_id}", response_model=schemas.SyncJobResponse)
+def get_sync_job(job_id: str):
+    job = sync_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo de sincronización no encontrado")
+    return job
+
+# Tamaño de página del listado de trades (al paginar: con limit o cursor; sin ninguno se devuelve todo)
+TRADES_PAGE_SIZE = int(os.getenv("TRADES_PAGE_SIZE", "500"))
+TRADES_PAGE_MAX = 1000
+
+# view=full -> List[TradeResponse]; view=summary -> List[TradeSummary]
+@app.get("/trades/", response_model=Union[List[schemas.TradeResponse], List[schemas.TradeSummary]])
 def get_trades_by_date(
-    trade_date: Optional[date] = None, 
+    response: Response,
+    filters: dict = Depends(trade_queries.trade_filter_params),
+    cursor: Optional[str] = None,                           # X-Next-Cursor de la página anterior
+    limit: Optional[int] = Query(None, ge=1, le=TRADES_PAGE_MAX), # Sin limit ni cursor: todos, como antes
+    include_total: bool = False,                            # Devuelve X-Total-Count (una consulta más)
+    view: str = Query("full", pattern="^(full|summary)$"),  # summary: solo columnas, sin trade idea
     db: Session = Depends(database.get_db)
 ):
-    query = db.query(models.Trade).join(models.Account)
-    
-    if trade_date:
-        # Filtramos por close_time (convertimos a fecha)
-        # Nota: En Postgres cast(models.Trade.close_time, Date)
-        query = query.filter(func.date(models.Trade.close_time) == trade_date)
-    
-    trades = query.all()
+    # La respuesta sigue siendo una lista; la paginación va en cabeceras
+    headers = {}
+    if limit is None and cursor is not None:
+        limit = TRADES_PAGE_SIZE
+    if include_total:
+        count_query = trade_queries.apply_trade_filters(db.query(models.Trade), filters)
+        headers["X-Total-Count"] = str(count_query.count())
+
+    if view == "summary":
+        # Tuplas de columnas -> dicts -> JSON (sin objetos del ORM ni modelos de pydantic)
+        query = trade_queries.apply_trade_filters(trade_queries.summary_query(db), filters)
+        query = trade_queries.apply_cursor(query, cursor)
+        rows = (query.limit(limit + 1) if limit else query).all()
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = trade_queries.encode_cursor(rows[-1].close_time, rows[-1].id)
+        keys = trade_queries.SUMMARY_KEYS
+        return FastJSONResponse([dict(zip(keys, row)) for row in rows], headers=headers)
+
+    # Pedimos uno de más para saber si hay otra página
+    query = trade_queries.apply_trade_filters(db.query(models.Trade), filters)
+    query = trade_queries.with_response_relations(trade_queries.apply_cursor(query, cursor))
+    trades = (query.limit(limit + 1) if limit else query).all()
+    if limit and len(trades) > limit:
+        trades = trades[:limit]
+        headers["X-Next-Cursor"] = trade_queries.encode_cursor(trades[-1].close_time, trades[-1].id)
+    response.headers.update(headers)
     
     # Inyectamos el alias de la cuenta manualmente en la respuesta
     result = []
@@ -314,6 +276,49 @@ def get_trades_by_date(
         
     return result
 
+# Debe ir antes de /trades/{trade_id} para que "bulk" no se tome como un id
+@app.patch("/trades/bulk", response_model=schemas.TradeBulkUpdateResponse)
+def bulk_update_trades(data: schemas.TradeBulkUpdate, db: Session = Depends(database.get_db)):
+    values = {
+        field: getattr(data, field)
+        for field in ("emotion_id", "mistake_id", "strategy_id", "trade_idea_id")
+        if field in data.model_fields_set
+    }
+    if not values:
+        raise HTTPException(status_code=400, detail="No hay campos para actualizar")
+    if (data.trade_ids is None) == (data.filter is None):
+        raise HTTPException(status_code=400, detail="Envía trade_ids o filter (solo uno)")
+
+    # Las etiquetas se validan antes del UPDATE (si no, la FK falla en el commit con un 500)
+    for field, model, detail in (
+        ("emotion_id", models.Emotion, "Emoción no encontrada"),
+        ("mistake_id", models.Mistake, "Error no encontrado"),
+        ("strategy_id", models.Strategy, "Estrategia no encontrada"),
+        ("trade_idea_id", models.TradeIdea, "Trade Idea no encontrada"),
+    ):
+        if values.get(field) is not None and db.get(model, values[field]) is None:
+            raise HTTPException(status_code=404, detail=detail)
+
+    stmt = update(models.Trade)
+    if data.trade_ids is not None:
+        if not data.trade_ids:
+            return {"updated": 0}
+        stmt = stmt.where(models.Trade.id.in_(data.trade_ids))
+    else:
+        filters = data.filter.model_dump()
+        if not any(value is not None for value in filters.values()):
+            raise HTTPException(status_code=400, detail="El filtro no puede estar vacío")
+        if filters.pop("trade_date"):
+            filters["date_from"] = filters["date_to"] = data.filter.trade_date
+        stmt = trade_queries.apply_trade_filters(stmt, filters)
+
+    # Un solo UPDATE en una transacción; RETURNING nos dice qué cuentas cambiaron
+    rows = db.execute(stmt.values(**values).returning(models.Trade.account_id)).all()
+    db.commit()
+
+    response_cache.invalidate({account_id for (account_id,) in rows})
+    return {"updated": len(rows)}
+
 @app.patch("/trades/{trade_id}", response_model=schemas.TradeResponse)
 def update_trade(trade_id: int, trade_data: schemas.TradeUpdate, db: Session = Depends(database.get_db)):
     db_trade = db.query(models.Trade).filter(models.Trade.id == trade_id).first()
@@ -329,12 +334,35 @@ def update_trade(trade_id: int, trade_data: schemas.TradeUpdate, db: Session = D
         
     db.commit()
     db.refresh(db_trade)
+    response_cache.invalidate([db_trade.account_id])
     return db_trade
 
 @app.get("/dashboard-stats", response_model=schemas.DashboardStats)
 def get_dashboard_stats(
+    request: Request,
     account_id: Optional[int] = None, 
+    date_from: Optional[date] = Query(None, alias="from"),  # Rango de la curva de equidad
+    date_to: Optional[date] = Query(None, alias="to"),
+    max_points: Optional[int] = Query(None, ge=3),           # Reducir la curva a N puntos (LTTB)
     db: Session = Depends(database.get_db)
+):
+    # Se recalcula solo si una sincronización o una edición tocó estas cuentas
+    # El día del broker va en la clave: el drawdown diario cambia al cambiar de día aunque nada se sincronice
+    params = {"account_id": account_id, "from": date_from, "to": date_to, "max_points": max_points,
+              "day": daily_drawdown.broker_day()}
+    return response_cache.respond(
+        request, "dashboard-stats", params, account_id,
+        lambda: schemas.DashboardStats.model_validate(
+            build_dashboard_stats(db, account_id, date_from, date_to, max_points)
+        ).model_dump_json()
+    )
+
+def build_dashboard_stats(
+    db: Session,
+    account_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    max_points: Optional[int] = None
 ):
     # 1. Obtener cuentas activas (o la seleccionada)
     query_accounts = db.query(models.Account).filter(models.Account.active == True)
@@ -348,45 +376,62 @@ def get_dashboard_stats(
     count_active = len(active_accounts)
     
     # 2. Win Rate y Trades
-    query_trades = db.query(models.Trade)
+    query_daily = db.query(models.DailyPnL)
     if account_id:
-        query_trades = query_trades.filter(models.Trade.account_id == account_id)
+        stats_ids = [account_id]
     else:
         # Si es global, filtramos solo trades de cuentas activas para no ensuciar el gráfico con cuentas borradas
-        active_ids = [acc.id for acc in active_accounts]
-        query_trades = query_trades.filter(models.Trade.account_id.in_(active_ids))
+        stats_ids = [acc.id for acc in active_accounts]
+    query_daily = query_daily.filter(models.DailyPnL.account_id.in_(stats_ids))
+
+    # --- MÉTRICAS DESDE LOS ACUMULADORES POR CUENTA (tabla account_stats) ---
+    # O(cuentas): no se recorren los trades
+    stats_by_account = account_stats.load(db, [acc.id for acc in active_accounts])
+    stats = account_stats.portfolio_stats(db, stats_ids)
+
+    # --- P&L DIARIO (tabla daily_pnl) ---
+    # Mejor día del portafolio (sobre todo el historial)
+    highest_profitable_day = query_daily.with_entities(func.sum(models.DailyPnL.profit).label("day_profit"))\
+                                        .group_by(models.DailyPnL.day)\
+                                        .order_by(desc("day_profit"))\
+                                        .limit(1)\
+                                        .scalar() or 0.0
+
+    # Días de la curva: el rango from/to se aplica en SQL
+    query_curve = query_daily
+    if date_from:
+        query_curve = query_curve.filter(models.DailyPnL.day >= date_from)
+    if date_to:
+        query_curve = query_curve.filter(models.DailyPnL.day <= date_to)
+    daily_rows = query_curve.with_entities(models.DailyPnL.day, func.sum(models.DailyPnL.profit))\
+                            .group_by(models.DailyPnL.day)\
+                            .order_by(models.DailyPnL.day)\
+                            .all()
+    daily_profit_map = {day.isoformat(): profit for day, profit in daily_rows}
+
+    # Mejor día de cada cuenta (regla de consistencia)
+    best_day_by_account = dict(
+        query_daily.with_entities(models.DailyPnL.account_id, func.max(models.DailyPnL.profit))
+                   .group_by(models.DailyPnL.account_id)
+                   .all()
+    )
 
     # --- LÓGICA DE LA CURVA DE EQUIDAD ---
     # a. Obtenemos el Balance Inicial Total
     global_initial_balance = sum(acc.initial_balance for acc in active_accounts)
 
-    # b. Traemos TODOS los trades ordenados por fecha (ascendente) para ir sumando
-    all_trades = query_trades.order_by(models.Trade.close_time).all()
-    profits = [t.profit for t in all_trades]
+    # Si la curva empieza en "from", arranca con lo ganado/perdido antes de esa fecha
+    if date_from:
+        global_initial_balance += query_daily.with_entities(func.sum(models.DailyPnL.profit))\
+                                             .filter(models.DailyPnL.day < date_from)\
+                                             .scalar() or 0.0
 
-    # c. Agrupamos profit por día
-    daily_profit_map = {}
-    if all_trades:
-        # Encontramos el rango de fechas
-        start_date = all_trades[0].close_time.date()
-        end_date = datetime.datetime.now().date()
-        
-        # Llenamos el mapa con los trades
-        for t in all_trades:
-            d_str = t.close_time.strftime("%Y-%m-%d")
-            daily_profit_map[d_str] = daily_profit_map.get(d_str, 0) + t.profit
-
-    # d. Construimos la curva acumulativa
+    # b. Construimos la curva acumulativa (el mapa diario ya viene en orden cronológico)
     balance_curve = []
-    
-    # Punto de partida (Día 0 o primer trade)
     current_running_balance = global_initial_balance
     
-    # Si hay trades, generamos la línea de tiempo
-    if all_trades:
-        # Iteramos trade por trade o día por día.
-        # Para que el gráfico se vea bonito (continuo), iteramos sobre las claves ordenadas
-        sorted_dates = sorted(daily_profit_map.keys())
+    if daily_profit_map:
+        sorted_dates = list(daily_profit_map.keys())
         
         # Agregamos un punto inicial (un día antes del primer trade) con el balance inicial
         first_date_dt = datetime.datetime.strptime(sorted_dates[0], "%Y-%m-%d")
@@ -411,17 +456,17 @@ def get_dashboard_stats(
             "balance": round(global_initial_balance, 2)
         })
 
-    # --- FIN LÓGICA CURVA ---
+    # c. Curvas largas: reducimos los puntos conservando picos y valles
+    if max_points:
+        balance_curve = stats_engine.downsample_lttb(balance_curve, max_points)
 
-    # (El resto del código de win_rate y recent_trades sigue igual...)
-    total_trades_count = query_trades.count()
-    winning_trades_count = query_trades.filter(models.Trade.profit > 0).count()
-    
-    win_rate = 0.0
-    if total_trades_count > 0:
-        win_rate = (winning_trades_count / total_trades_count) * 100
+    # --- FIN LÓGICA CURVA ---
 
-    recent_trades_db = query_trades.join(models.Account).order_by(desc(models.Trade.close_time)).limit(5).all()
+    recent_trades_db = trade_queries.with_response_relations(db.query(models.Trade))\
+                                    .filter(models.Trade.account_id.in_(stats_ids))\
+                                    .order_by(desc(models.Trade.close_time))\
+                                    .limit(5)\
+                                    .all()
     
     recent_trades_mapped = []
     for t in recent_trades_db:
@@ -429,233 +474,84 @@ def get_dashboard_stats(
         t_resp.account_alias = t.account.alias 
         recent_trades_mapped.append(t_resp)
 
-    # 1. Básicos
-    total_trades_count = len(profits)
-    best_trade = max(profits) if profits else 0.0
-    worst_trade = min(profits) if profits else 0.0
-    
-    wins = [p for p in profits if p > 0]
-    losses = [p for p in profits if p < 0]
-    
-    avg_win = statistics.mean(wins) if wins else 0.0
-    avg_loss = statistics.mean(losses) if losses else 0.0
-
-    # 2. Profit Factor (Gross Profit / Gross Loss)
-    gross_profit = sum(wins)
-    gross_loss = abs(sum(losses))
-    profit_factor = round(gross_profit / gross_loss, 2) if gross_loss > 0 else 0.0
-
-    # 3. Average RRR (Payoff Ratio: Avg Win / Avg Loss)
-    # Nota: El RRR real requiere saber el SL inicial. Usamos Payoff Ratio como aproximación.
-    average_rrr = round(avg_win / abs(avg_loss), 2) if avg_loss != 0 else 0.0
-
-    # 4. Highest Profitable Day
-    daily_sums = {}
-    for t in all_trades:
-        day = t.close_time.strftime("%Y-%m-%d")
-        daily_sums[day] = daily_sums.get(day, 0) + t.profit
-    
-    highest_profitable_day = max(daily_sums.values()) if daily_sums else 0.0
-
-    # 5. Sharpe Ratio (Simplificado por Trade)
-    # Sharpe = Promedio Retorno / Desviación Estándar
-    sharpe_ratio = 0.0
-    if len(profits) > 1:
-        stdev = statistics.stdev(profits)
-        if stdev != 0:
-            sharpe_ratio = round(statistics.mean(profits) / stdev, 2)
-
-    # 6. Z-Score (Probabilidad de rachas)
-    z_score = 0.0
-    if len(profits) > 2:
-        # Contamos "Runs" (Rachas: W W L L W = 3 rachas)
-        runs = 0
-        if total_trades_count > 0:
-            runs = 1
-            for i in range(1, total_trades_count):
-                # Si el signo cambia, es una nueva racha
-                prev_sign = 1 if profits[i-1] >= 0 else -1
-                curr_sign = 1 if profits[i] >= 0 else -1
-                if prev_sign != curr_sign:
-                    runs += 1
-        
-        total_wins = len(wins)
-        total_losses = len(losses)
-        N = total_trades_count
-
-        if total_wins > 0 and total_losses > 0:
-            # Fórmula Z-Score de Trading
-            x = 2 * total_wins * total_losses
-            expected_runs = (x / N) + 1
-            std_deviation = ((expected_runs - 1) * (expected_runs - 2)) / (N - 1)
-            
-            if std_deviation > 0:
-                z_score = round((runs - expected_runs) / (std_deviation ** 0.5), 2)
+    # Balance de inicio del día de cada cuenta (drawdown diario)
+    day_starts = daily_drawdown.load_day_starts(db, [acc.id for acc in active_accounts])
+    # Balance máximo registrado en las sincronizaciones (tabla balance_snapshots)
+    snapshot_highs = balance_snapshots.max_balances(db, [acc.id for acc in active_accounts])
 
-    
     risk_metrics_list = []
-
     for acc in active_accounts:
-        # 1. Obtener trades de ESTA cuenta para calcular su High Water Mark
-        acc_trades = db.query(models.Trade).filter(models.Trade.account_id == acc.id).order_by(models.Trade.close_time).all()
-        
-        # Calcular curva de balance para hallar el High Water Mark (Pico más alto)
-        temp_balance = acc.initial_balance
-        high_water_mark = acc.initial_balance
-        highest_daily_profit = 0.0
-        
-        # Mapa para consistencia (suma por días)
-        daily_profits = {}
-
-        for t in acc_trades:
-            temp_balance += t.profit
-            if temp_balance > high_water_mark:
-                high_water_mark = temp_balance
-            
-            day_str = t.close_time.strftime("%Y-%m-%d")
-            daily_profits[day_str] = daily_profits.get(day_str, 0) + t.profit
-
-        if daily_profits:
-            highest_daily_profit = max(daily_profits.values())
-
-        # --- CÁLCULO DRAWDOWN ---
-        # Límite máximo de pérdida
-        if acc.trailing_drawdown:
-            # Trailing: El límite sube con el High Water Mark
-            # Límite = Pico Máximo - (Pico Máximo * %MaxDD)
-            limit_price = high_water_mark - (high_water_mark * (acc.max_drawdown_limit / 100))
-        else:
-            # Estático: Basado en balance inicial
-            limit_price = acc.initial_balance - (acc.initial_balance * (acc.max_drawdown_limit / 100))
-        
-        # Distancia actual al límite
-        # Total espacio permitido = HWM - Límite (Trailing) o Inicial - Límite (Estático)
-        if acc.trailing_drawdown:
-            total_allowable_loss = high_water_mark * (acc.max_drawdown_limit / 100)
-            current_loss_from_peak = high_water_mark - acc.balance
-        else:
-            total_allowable_loss = acc.initial_balance * (acc.max_drawdown_limit / 100)
-            current_loss_from_peak = acc.initial_balance - acc.balance
-
-        # Porcentaje de la barra roja (0% = a salvo, 100% = cuenta quemada)
-        dd_progress = 0.0
-        if total_allowable_loss > 0:
-            dd_progress = (current_loss_from_peak / total_allowable_loss) * 100
-        
-        dd_progress = max(0.0, min(dd_progress, 100.0)) # Clampear entre 0 y 100
-
-        # --- CÁLCULO CONSISTENCIA ---
-        consistency_progress = 0.0
-        target_profit = 0.0
-        is_in_dd = acc.balance < acc.initial_balance
-
-        if acc.consistency_rule > 0 and highest_daily_profit > 0 and not is_in_dd:
-            # Regla: Mejor Día / % = Objetivo Total
-            # Ej: 200 / 0.25 = 800 Objetivo
-            target_profit = highest_daily_profit / (acc.consistency_rule / 100)
-            
-            current_profit = acc.balance - acc.initial_balance
-            if target_profit > 0:
-                consistency_progress = (current_profit / target_profit) * 100
-            
-            consistency_progress = max(0.0, min(consistency_progress, 100.0))
-        
-        risk_metrics_list.append({
-            "account_alias": acc.alias,
-            "current_balance": acc.balance,
-            "initial_balance": acc.initial_balance,
-            "is_trailing": acc.trailing_drawdown,
-            "max_drawdown_percent": acc.max_drawdown_limit,
-            "high_water_mark": high_water_mark,
-            "drawdown_limit_price": limit_price,
-            "current_drawdown_amount": current_loss_from_peak,
-            "drawdown_progress": dd_progress,
-            "consistency_rule_percent": acc.consistency_rule,
-            "highest_daily_profit": highest_daily_profit,
-            "profit_target_for_consistency": target_profit,
-            "consistency_progress": consistency_progress,
-            "is_in_drawdown": is_in_dd
-        })
+        # High Water Mark = balance inicial + mayor ganancia acumulada de la cuenta,
+        # o el balance más alto visto al sincronizar si es mayor
+        acc_stats = stats_by_account.get(acc.id)
+        high_water_mark = acc.initial_balance + (acc_stats.peak_profit if acc_stats else 0.0)
+        high_water_mark = max(high_water_mark, snapshot_highs.get(acc.id, high_water_mark))
+        risk_metrics_list.append(stats_engine.account_risk_metrics(
+            acc, high_water_mark, best_day_by_account.get(acc.id, 0.0), day_starts.get(acc.id)
+        ))
 
     return {
-        # ... Tus campos existentes ...
         "total_balance": round(total_balance, 2),
         "total_pl": round(total_pl, 2),
         "active_accounts": count_active,
-        "win_rate": round(win_rate, 2),
         "recent_trades": recent_trades_mapped,
         "balance_curve": balance_curve,
-
-        # --- NUEVOS CAMPOS ---
-        "best_trade": round(best_trade, 2),
-        "worst_trade": round(worst_trade, 2),
-        "average_win": round(avg_win, 2),
-        "average_loss": round(avg_loss, 2),
-        "highest_profitable_day": round(highest_profitable_day, 2),
-        "total_trades_count": total_trades_count,
-        "profit_factor": profit_factor,
-        "average_rrr": average_rrr,
-        "sharpe_ratio": sharpe_ratio,
-        "z_score": z_score,
+        # win_rate, best/worst, promedios, profit factor, RRR, Sharpe, Z-Score...
+        **stats_engine.stats_summary(stats, highest_profitable_day),
         "risk_metrics": risk_metrics_list
     }
 
 @app.get("/calendar-stats", response_model=schemas.CalendarResponse)
 def get_calendar_stats(
+    request: Request,
     year: int, 
     month: int, 
     account_id: Optional[int] = None, 
     db: Session = Depends(database.get_db)
 ):
-    # 1. Consulta base: Trades cerrados en el año y mes solicitados
-    query = db.query(models.Trade).filter(
-        extract('year', models.Trade.close_time) == year,
-        extract('month', models.Trade.close_time) == month
+    return response_cache.respond(
+        request, "calendar-stats", {"year": year, "month": month, "account_id": account_id}, account_id,
+        lambda: schemas.CalendarResponse.model_validate(build_calendar_stats(db, year, month, account_id)).model_dump_json()
+    )
+
+def build_calendar_stats(db: Session, year: int, month: int, account_id: Optional[int] = None):
+    # 1. Leemos el P&L diario ya agregado (tabla daily_pnl) del mes solicitado
+    month_start = date(year, month, 1)
+    next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+
+    query = db.query(
+        models.DailyPnL.day,
+        func.sum(models.DailyPnL.profit),
+        func.sum(models.DailyPnL.trade_count),
+        func.sum(models.DailyPnL.losses)
+    ).filter(
+        models.DailyPnL.day >= month_start,
+        models.DailyPnL.day < next_month
     )
     
     # 2. Filtro opcional por cuenta
     if account_id:
-        query = query.filter(models.Trade.account_id == account_id)
-    
-    trades = query.all()
-    
-    # 3. Agrupación en Python (Más flexible que SQL puro para diccionarios)
-    daily_map = {}
+        query = query.filter(models.DailyPnL.account_id == account_id)
     
+    rows = query.group_by(models.DailyPnL.day).order_by(models.DailyPnL.day).all()
+
+    # 3. Formatear respuesta (en el calendario un trade en 0 cuenta como ganador)
+    days_list = []
     total_profit = 0.0
     total_wins = 0
-    total_count = len(trades)
-    
-    for t in trades:
-        # Extraer fecha en string YYYY-MM-DD
-        day_str = t.close_time.strftime("%Y-%m-%d")
-        
-        if day_str not in daily_map:
-            daily_map[day_str] = {"profit": 0.0, "count": 0, "wins": 0, "losses": 0}
-        
-        # Acumular métricas del día
-        daily_map[day_str]["profit"] += t.profit
-        daily_map[day_str]["count"] += 1
-        
-        if t.profit >= 0:
-            daily_map[day_str]["wins"] += 1
-            total_wins += 1
-        else:
-            daily_map[day_str]["losses"] += 1
-            
-        # Acumular métricas del mes
-        total_profit += t.profit
+    total_count = 0
 
-    # 4. Formatear respuesta
-    days_list = []
-    for date_key, data in daily_map.items():
+    for day, profit, count, losses in rows:
         days_list.append(schemas.DailyStat(
-            date=date_key,
-            profit=round(data["profit"], 2),
-            trades_count=data["count"],
-            wins=data["wins"],
-            losses=data["losses"]
+            date=day.isoformat(),
+            profit=round(profit, 2),
+            trades_count=count,
+            wins=count - losses,
+            losses=losses
         ))
+        total_profit += profit
+        total_wins += count - losses
+        total_count += count
         
     # Calcular Win Rate Mensual
     win_rate = 0.0
@@ -669,6 +565,188 @@ def get_calendar_stats(
         "days": days_list
     }
 
+# Límite del rango del heatmap (unos 5 años de días)
+CALENDAR_RANGE_MAX_DAYS = int(os.getenv("CALENDAR_RANGE_MAX_DAYS", "1830"))
+
+@app.get("/calendar-stats/range", response_model=schemas.CalendarRangeResponse)
+def get_calendar_range_stats(
+    request: Request,
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    account_id: Optional[int] = None,
+    db: Session = Depends(database.get_db)
+):
+    # Heatmap de varios meses (ej: un año) en una sola petición
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="'to' debe ser posterior o igual a 'from'")
+    if (date_to - date_from).days > CALENDAR_RANGE_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"El rango no puede superar {CALENDAR_RANGE_MAX_DAYS} días")
+
+    params = {"from": date_from, "to": date_to, "account_id": account_id}
+    return response_cache.respond(
+        request, "calendar-stats-range", params, account_id,
+        lambda: schemas.CalendarRangeResponse.model_validate(
+            build_calendar_range_stats(db, date_from, date_to, account_id)
+        ).model_dump_json()
+    )
+
+def build_calendar_range_stats(db: Session, date_from: date, date_to: date, account_id: Optional[int] = None):
+    # 1. Una sola consulta agrupada por día sobre daily_pnl (rango cerrado [from, to])
+    query = db.query(
+        models.DailyPnL.day,
+        func.sum(models.DailyPnL.profit),
+        func.sum(models.DailyPnL.trade_count),
+        func.sum(models.DailyPnL.losses)
+    ).filter(
+        models.DailyPnL.day >= date_from,
+        models.DailyPnL.day <= date_to
+    )
+    if account_id:
+        query = query.filter(models.DailyPnL.account_id == account_id)
+
+    rows = query.group_by(models.DailyPnL.day).order_by(models.DailyPnL.day).all()
+
+    # 2. Días en columnas; los subtotales por mes y semana salen de las mismas filas
+    def new_series():
+        return {"period": [], "profit": [], "trades_count": [], "wins": [], "losses": []}
+
+    def add(series, period, profit, count, losses):
+        # Las filas vienen ordenadas, así que el periodo nuevo siempre va al final
+        if not series["period"] or series["period"][-1] != period:
+            for key, value in (("period", period), ("profit", 0.0), ("trades_count", 0), ("wins", 0), ("losses", 0)):
+                series[key].append(value)
+        series["profit"][-1] += profit
+        series["trades_count"][-1] += count
+        series["wins"][-1] += count - losses # Un trade en 0 cuenta como ganador, igual que en el calendario
+        series["losses"][-1] += losses
+
+    days, months, weeks = new_series(), new_series(), new_series()
+    for day, profit, count, losses in rows:
+        iso_year, iso_week, _ = day.isocalendar()
+        add(days, day.isoformat(), profit, count, losses)
+        add(months, day.strftime("%Y-%m"), profit, count, losses)
+        add(weeks, f"{iso_year}-W{iso_week:02d}", profit, count, losses)
+
+    for series in (days, months, weeks):
+        series["profit"] = [round(p, 2) for p in series["profit"]]
+
+    total_count = sum(days["trades_count"])
+    total_wins = sum(days["wins"])
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "total_profit": round(sum(p for _, p, _, _ in rows), 2),
+        "win_rate": round((total_wins / total_count) * 100, 2) if total_count else 0.0,
+        "total_trades": total_count,
+        "days": days,
+        "months": months,
+        "weeks": weeks
+    }
+
+@app.get("/analytics/breakdown", response_model=schemas.BreakdownResponse)
+def get_analytics_breakdown(
+    request: Request,
+    by: str = Query(..., description="Una o dos dimensiones separadas por coma: emotion, mistake, strategy, symbol, type, hour, weekday"),
+    filters: dict = Depends(trade_queries.trade_filter_params),
+    db: Session = Depends(database.get_db)
+):
+    # Ej: /analytics/breakdown?by=emotion,hour&account_id=1&from=2024-01-01
+    dimensions = analytics.parse_dimensions(by)
+    params = {"by": ",".join(dimensions), **filters}
+    return response_cache.respond(
+        request, "analytics-breakdown", params, filters["account_id"],
+        lambda: schemas.BreakdownResponse.model_validate(analytics.breakdown(db, dimensions, filters)).model_dump_json()
+    )
+
+@app.get("/accounts/{account_id}/simulate", response_model=schemas.SimulationResult)
+def simulate_account_rules(
+    account_id: int,
+    paths: int = Query(10000, ge=100, le=SIMULATION_MAX_PATHS),
+    days: int = Query(60, ge=1, le=500), # Días operados a simular
+    from_start: bool = False, # True: un intento nuevo desde el balance inicial
+    seed: Optional[int] = None, # Para repetir la misma simulación
+    db: Session = Depends(database.get_db)
+):
+    account = db.query(models.Account).filter(models.Account.id == account_id).first()
+    if not account:
+        raise HTTPException(status_code=404, detail="Cuenta no encontrada")
+
+    result = simulate_account(db, account, paths, days, from_start, seed)
+    if result is None:
+        raise HTTPException(status_code=400, detail=f"La cuenta no tiene historial suficiente para simular (mínimo {MIN_HISTORY_DAYS} días operados)")
+    return result
+
+@app.get("/accounts/{account_id}/balance-history", response_model=schemas.BalanceHistoryResponse)
+def get_balance_history(
+    account_id: int,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(database.get_db)
+):
+    # Curva de balance/equidad guardada en cada sincronización, con HWM y drawdown por punto
+    if not db.get(models.Account, account_id):
+        raise HTTPException(status_code=404, detail="Cuenta no encontrada")
+
+    ts_from = datetime.datetime.combine(date_from, datetime.time.min) if date_from else None
+    ts_to = datetime.datetime.combine(date_to + timedelta(days=1), datetime.time.min) if date_to else None
+    return balance_snapshots.history(db, account_id, ts_from, ts_to)
+
+@app.get("/search", response_model=schemas.SearchResponse)
+def search_journal(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: str = Query("trades", pattern="^(trades|ideas)$"),
+    account_id: Optional[int] = None, # Solo para trades
+    cursor: Optional[str] = None,     # next_cursor de la página anterior
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(database.get_db)
+):
+    # Busca en símbolo, notas y comentario de los trades, o en activo y notas de las trade ideas
+    return search.search(db, q.strip(), kind, account_id, cursor, limit)
+
+# --- EXPORTACIÓN (CSV / PARQUET) ---
+@app.get("/export/trades")
+def export_trades(
+    filters: dict = Depends(trade_queries.trade_filter_params), # Los mismos filtros que /trades/
+    format: str = Query("csv", pattern="^(csv|parquet)$")
+):
+    def make_query(db: Session):
+        query = trade_queries.apply_trade_filters(trade_queries.summary_query(db), filters)
+        return query.order_by(models.Trade.close_time, models.Trade.id)
+
+    return export.streaming_response("trades", format, make_query, trade_queries.SUMMARY_COLUMNS)
+
+DAILY_PNL_EXPORT_COLUMNS = (
+    ("account_id", models.DailyPnL.account_id),
+    ("account_alias", models.Account.alias),
+    ("day", models.DailyPnL.day),
+    ("profit", models.DailyPnL.profit),
+    ("commission", models.DailyPnL.commission),
+    ("swap", models.DailyPnL.swap),
+    ("trade_count", models.DailyPnL.trade_count),
+    ("wins", models.DailyPnL.wins),
+    ("losses", models.DailyPnL.losses),
+)
+
+@app.get("/export/daily-pnl")
+def export_daily_pnl(
+    account_id: Optional[int] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    format: str = Query("csv", pattern="^(csv|parquet)$")
+):
+    def make_query(db: Session):
+        query = db.query(*(column.label(key) for key, column in DAILY_PNL_EXPORT_COLUMNS))\
+                  .join(models.Account, models.Account.id == models.DailyPnL.account_id)
+        if account_id:
+            query = query.filter(models.DailyPnL.account_id == account_id)
+        if date_from:
+            query = query.filter(models.DailyPnL.day >= date_from)
+        if date_to:
+            query = query.filter(models.DailyPnL.day <= date_to)
+        return query.order_by(models.DailyPnL.day, models.DailyPnL.account_id)
+
+    return export.streaming_response("daily_pnl", format, make_query, DAILY_PNL_EXPORT_COLUMNS)
+
 # --- ENDPOINTS BÁSICOS PARA LEER DATOS ---
 @app.get("/emotions/")
 def get_emotions(db: Session = Depends(database.get_db)):
@@ -733,6 +811,7 @@ def update_trade_analysis(trade_id: int, analysis: TradeAnalysisUpdate, db: Sess
     db_trade.trade_idea_id = analysis.trade_idea_id
     
     db.commit()
+    response_cache.invalidate([db_trade.account_id])
     return {"message": "Trade actualizado"}
 
 # --- ENDPOINTS DE TRADE IDEAS ---
@@ -1,5 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, BigInteger, UniqueConstraint, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, BigInteger, UniqueConstraint, Boolean, Index
 from sqlalchemy.orm import relationship
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy import text
 from database import Base
 import datetime
 
@@ -37,6 +39,8 @@ class Account(Base):
     outcome = Column(String, nullable=True)
     
     trades = relationship("Trade", back_populates="account")
+    sync_state = relationship("AccountSyncState", back_populates="account", uselist=False, cascade="all, delete-orphan")
+    day_start = relationship("AccountDayStart", back_populates="account", uselist=False, cascade="all, delete-orphan")
 
     # --- LÓGICA DE NEGOCIO (Calculados al vuelo) ---
     @property
@@ -52,6 +56,56 @@ class Account(Base):
         pl = self.balance - self.initial_balance
         return round((pl / self.initial_balance) * 100, 2)
 
+    @property
+    def last_sync(self):
+        """Fecha de la última sincronización exitosa (None si nunca se sincronizó)"""
+        return self.sync_state.last_sync_at if self.sync_state else None
+
+class AccountSyncState(Base):
+    """Marca de agua de sincronización: hasta dónde tenemos los trades de cada cuenta"""
+    __tablename__ = "account_sync_state"
+    
+    account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True)
+    
+    last_ticket = Column(BigInteger, nullable=True)       # Ticket del último trade cerrado guardado
+    last_close_time = Column(DateTime, nullable=True)     # close_time de ese trade
+    last_balance = Column(Float, nullable=True)           # Balance reportado por la VPS
+    last_sync_at = Column(DateTime, nullable=True)
+    last_sync_duration = Column(Float, nullable=True)     # Segundos (llamada VPS + guardado)
+    
+    account = relationship("Account", back_populates="sync_state")
+
+class AccountDayStart(Base):
+    """Balance al inicio del día del broker (drawdown diario, ver daily_drawdown.py)"""
+    __tablename__ = "account_day_start"
+    
+    account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True)
+    
+    day = Column(Date, nullable=False)              # Día del broker (hora del servidor MT5)
+    start_balance = Column(Float, nullable=False)   # Balance al abrir ese día
+    updated_at = Column(DateTime, nullable=True)    # Última sincronización que lo revisó
+    
+    account = relationship("Account", back_populates="day_start")
+
+class BalanceSnapshot(Base):
+    """Balance/equidad en cada sincronización, compactado a horas y días (ver balance_snapshots.py)"""
+    __tablename__ = "balance_snapshots"
+    
+    id = Column(Integer, primary_key=True)
+    account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), nullable=False)
+    ts = Column(DateTime, nullable=False)       # UTC
+    
+    balance = Column(Float, nullable=False)     # Último balance del periodo
+    equity = Column(Float, nullable=True)       # Si la VPS la reporta
+    balance_high = Column(Float, nullable=True) # Máximo del periodo (HWM)
+    balance_low = Column(Float, nullable=True)  # Mínimo del periodo (drawdown)
+    resolution = Column(String, default="raw")  # raw, hour, day
+
+    __table_args__ = (
+        # Curvas e historial por cuenta: recorridos por rango de ts
+        Index('ix_balance_snapshots_account_ts', 'account_id', 'ts'),
+    )
+
 class Trade(Base):
     __tablename__ = "trades"
     
@@ -86,8 +140,72 @@ class Trade(Base):
 
     __table_args__ = (
         UniqueConstraint('ticket', 'account_id', name='unique_trade_per_account'),
+        # Rangos de fechas por cuenta (calendario, listados, recálculos en orden de cierre)
+        Index('ix_trades_account_close_time', 'account_id', 'close_time'),
+        # Listado de todas las cuentas paginado por (close_time, id)
+        Index('ix_trades_close_time_id', 'close_time', 'id'),
+    )
+
+class DailyPnL(Base):
+    """P&L agregado por cuenta y día (se mantiene al sincronizar, ver daily_pnl.py)"""
+    __tablename__ = "daily_pnl"
+    
+    account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True) # Fecha de close_time
+    
+    profit = Column(Float, default=0.0)
+    commission = Column(Float, default=0.0)
+    swap = Column(Float, default=0.0)
+    trade_count = Column(Integer, default=0)
+    wins = Column(Integer, default=0)    # profit > 0
+    losses = Column(Integer, default=0)  # profit < 0
+
+    __table_args__ = (
+        # Calendario / curva de todas las cuentas: rango de días sin filtrar por cuenta
+        Index('ix_daily_pnl_day', 'day'),
     )
 
+class AccountStats(Base):
+    """
+    Acumuladores de rendimiento por cuenta (ver account_stats.py). Se actualizan
+    solo con los trades nuevos, así el dashboard no recorre todo el historial.
+    """
+    __tablename__ = "account_stats"
+    
+    account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True)
+    
+    count = Column(Integer, default=0)
+    wins = Column(Integer, default=0)          # profit > 0
+    losses = Column(Integer, default=0)        # profit < 0
+    gross_profit = Column(Float, default=0.0)
+    gross_loss = Column(Float, default=0.0)    # Suma de pérdidas (negativa)
+    best = Column(Float, nullable=True)
+    worst = Column(Float, nullable=True)
+    
+    # Welford (media y M2 para la desviación estándar)
+    mean = Column(Float, default=0.0)
+    m2 = Column(Float, default=0.0)
+    
+    # Rachas (Z-Score)
+    runs = Column(Integer, default=0)
+    last_sign = Column(Integer, default=0)
+    
+    # Curva acumulada (High Water Mark = inicial + peak_profit)
+    total_profit = Column(Float, default=0.0)
+    peak_profit = Column(Float, default=0.0)
+    
+    last_close_time = Column(DateTime, nullable=True) # Para detectar trades que llegan fuera de orden
+
+class PortfolioRuns(Base):
+    """
+    Rachas (Z-Score) de un conjunto de cuentas, ej: el dashboard global. Dependen de cómo
+    se intercalan los trades de las cuentas, así que no salen de sumar account_stats.
+    """
+    __tablename__ = "portfolio_runs"
+
+    account_set = Column(String, primary_key=True) # ids ordenados: "1,2,5"
+    runs = Column(Integer, default=0)
+
 class Server(Base):
     __tablename__ = "servers"
     
@@ -170,4 +288,49 @@ class TimeframeEvidence(Base):
     note = Column(String)      # Nota del análisis
     image_url = Column(String) # Ruta de la imagen en tu VPS (ej: /uploads/ideas/idea_5_15M.png)
 
-    trade_idea = relationship("TradeIdea", back_populates="evidences")
\ No newline at end of file
+    trade_idea = relationship("TradeIdea", back_populates="evidences")
+
+
+def create_missing_indexes(engine):
+    """
+    create_all no agrega índices nuevos a tablas que ya existen: los creamos aquí.
+    En Postgres con CREATE INDEX CONCURRENTLY: en una tabla grande (trades) un CREATE INDEX
+    normal bloquea las escrituras (sincronización) hasta terminar de construir el índice.
+    Aun así tarda lo que tarde construirlo, por eso en Postgres no corre al arrancar la app
+    sino como paso de despliegue:
+        python models.py create-indexes
+    """
+    if engine.dialect.name != "postgresql":
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
+        return
+
+    # CONCURRENTLY no se puede ejecutar dentro de una transacción
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                valid = conn.execute(
+                    text("SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"),
+                    {"name": index.name}
+                ).scalar()
+                if valid:
+                    continue
+                if valid is False:
+                    # Quedó a medias (ej: se cortó el arranque mientras se construía): se rehace
+                    conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+                ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+                conn.execute(text(ddl.replace("INDEX", "INDEX CONCURRENTLY", 1)))
+
+
+if __name__ == "__main__":
+    import sys
+    import database
+
+    if len(sys.argv) < 2 or sys.argv[1] != "create-indexes":
+        print(create_missing_indexes.__doc__)
+        sys.exit(1)
+
+    Base.metadata.create_all(bind=database.engine)
+    create_missing_indexes(database.engine)
+    print("Índices creados")
@@ -0,0 +1,91 @@
+# backend/response_cache.py
+from collections import OrderedDict
+from fastapi import Request, Response
+from typing import Callable, Iterable, Optional, Tuple
+import hashlib
+import os
+import threading
+
+# Máximo de respuestas guardadas (se descartan las menos usadas)
+MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+
+
+class ResponseCache:
+    """
+    Caché en memoria de respuestas JSON ya serializadas (dashboard, calendario...).
+    La clave es endpoint + parámetros. No caduca por tiempo: se invalida cuando
+    algo modifica las cuentas involucradas (sync, PATCH de trades, altas/bajas de cuentas).
+    Cada entrada lleva su ETag para responder 304 si el navegador ya la tiene.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (account_id del que depende o None si es global, body, etag)
+        self._entries: "OrderedDict[Tuple, Tuple[Optional[int], bytes, str]]" = OrderedDict()
+        # Sube en cada invalidación: si cambia mientras se calcula una respuesta, no se guarda
+        self._generation = 0
+
+    def get(self, key: Tuple) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def set(self, key: Tuple, account_id: Optional[int], body: bytes, generation: int) -> str:
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        with self._lock:
+            if generation != self._generation:
+                return etag # Los datos cambiaron mientras se calculaba
+            self._entries[key] = (account_id, body, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+    def invalidate(self, account_ids: Optional[Iterable[int]] = None):
+        """
+        Borra las respuestas de esas cuentas y las globales (que las incluyen).
+        Sin cuentas, borra todo.
+        """
+        with self._lock:
+            self._generation += 1
+            if account_ids is None:
+                self._entries.clear()
+                return
+            ids = set(account_ids)
+            for key in [k for k, (acc_id, _, _) in self._entries.items() if acc_id is None or acc_id in ids]:
+                del self._entries[key]
+
+    def respond(
+        self,
+        request: Request,
+        endpoint: str,
+        params: dict,
+        account_id: Optional[int],
+        build: Callable[[], str],
+    ) -> Response:
+        """
+        Devuelve la respuesta cacheada (o 304 si el ETag coincide). Si no está,
+        llama a build() -> JSON en texto, la guarda y la devuelve.
+        """
+        key = (endpoint,) + tuple(sorted(params.items()))
+        cached = self.get(key)
+        if cached:
+            body, etag = cached
+        else:
+            generation = self._generation
+            body = build().encode()
+            etag = self.set(key, account_id, body, generation)
+
+        # no-cache: el navegador guarda la respuesta pero revalida siempre con If-None-Match
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Instancia global
+response_cache = ResponseCache()
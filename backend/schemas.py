@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
-from datetime import datetime
+from typing import Dict, List, Optional, Union
+from datetime import date, datetime
 
 # --- TRADES ---
 
@@ -96,6 +96,17 @@ class TradeResponse(TradeBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+# Fila de GET /trades/?view=summary: sin trade idea; emoción, error y estrategia por nombre
+# (mismas claves que trade_queries.SUMMARY_COLUMNS)
+class TradeSummary(TradeBase):
+    id: int
+    account_id: int
+    account_alias: Optional[str] = None
+    emotion_id: Optional[int] = None
+    mistake_id: Optional[int] = None
+    strategy_id: Optional[int] = None
+    trade_idea_id: Optional[int] = None
+
 class TradeUpdate(BaseModel):
     emotion: Optional[str] = None
     mistake: Optional[str] = None
@@ -107,6 +118,32 @@ class TradeAnalysisUpdate(BaseModel):
     strategy_id: Optional[int] = None
     trade_idea_id: Optional[int] = None
 
+# Edición masiva: los mismos filtros que el listado de trades
+class TradeBulkFilter(BaseModel):
+    account_id: Optional[int] = None
+    symbol: Optional[str] = None
+    type: Optional[str] = None
+    strategy_id: Optional[int] = None
+    emotion_id: Optional[int] = None
+    mistake_id: Optional[int] = None
+    trade_date: Optional[date] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None # Incluido
+
+class TradeBulkUpdate(BaseModel):
+    # Qué trades: una lista de ids O un filtro
+    trade_ids: Optional[List[int]] = None
+    filter: Optional[TradeBulkFilter] = None
+
+    # Qué cambiar: solo los campos enviados (null explícito = quitar la etiqueta)
+    emotion_id: Optional[int] = None
+    mistake_id: Optional[int] = None
+    strategy_id: Optional[int] = None
+    trade_idea_id: Optional[int] = None
+
+class TradeBulkUpdateResponse(BaseModel):
+    updated: int
+
 # --- CUENTAS ---
 
 class AccountCreate(BaseModel):
@@ -154,6 +191,7 @@ class AccountResponse(BaseModel):
     current_percent: float
 
     outcome: Optional[str] = None
+    last_sync: Optional[datetime] = None # Viene de AccountSyncState
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -171,6 +209,24 @@ class CalendarResponse(BaseModel):
     total_trades: int
     days: List[DailyStat]
 
+# Rango de varios meses (heatmap): arrays paralelos en vez de un objeto por día
+class CalendarSeries(BaseModel):
+    period: List[str]   # "YYYY-MM-DD" (días), "YYYY-MM" (meses) o "YYYY-Www" (semanas ISO)
+    profit: List[float]
+    trades_count: List[int]
+    wins: List[int]
+    losses: List[int]
+
+class CalendarRangeResponse(BaseModel):
+    date_from: date
+    date_to: date
+    total_profit: float
+    win_rate: float
+    total_trades: int
+    days: CalendarSeries
+    months: CalendarSeries
+    weeks: CalendarSeries
+
 # --- SERVERS SCHEMAS ---
 class ServerBase(BaseModel):
     name: str
@@ -188,6 +244,19 @@ class ChartDataPoint(BaseModel):
     date: str
     balance: float
 
+class BalanceSnapshotPoint(BaseModel):
+    ts: datetime
+    balance: float
+    equity: Optional[float] = None
+    high_water_mark: float
+    drawdown: float # Distancia al HWM en ese momento
+
+class BalanceHistoryResponse(BaseModel):
+    account_id: int
+    high_water_mark: Optional[float] = None
+    max_drawdown: float
+    points: List[BalanceSnapshotPoint]
+
 class RiskMetrics(BaseModel):
     account_alias: str
     current_balance: float
@@ -201,6 +270,15 @@ class RiskMetrics(BaseModel):
     current_drawdown_amount: float # Dinero perdido desde el pico
     drawdown_progress: float # % de la barra roja (0 a 100)
 
+    # Drawdown diario (se reinicia con el día del broker)
+    daily_drawdown_percent: float
+    day_start_balance: float # Balance al inicio del día
+    daily_drawdown_limit_price: float # Balance donde se rompe la regla diaria
+    daily_loss_amount: float # Perdido hoy
+    daily_loss_remaining: float # Lo que queda por perder hoy
+    daily_drawdown_progress: float # % de la pérdida diaria permitida (0 a 100)
+    daily_drawdown_breached: bool
+
     # Consistencia
     consistency_rule_percent: float
     highest_daily_profit: float
@@ -229,9 +307,109 @@ class DashboardStats(BaseModel):
     z_score: float
     risk_metrics: List[RiskMetrics]
 
+# --- SINCRONIZACIÓN EN SEGUNDO PLANO ---
+class SyncAccountProgress(BaseModel):
+    account: int
+    alias: Optional[str] = None
+    state: str # pending, running, done, failed
+    inserted: int = 0
+    skipped: int = 0
+    invalid: int = 0
+    duration_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+class SyncJobResponse(BaseModel):
+    id: str
+    status: str # running, done, partial, failed
+    joined: bool = False # True si el POST se unió a una sincronización que ya estaba corriendo
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
+    new_trades_added: int
+    skipped_trades: int
+    error: Optional[str] = None
+    accounts: List[SyncAccountProgress]
+
 class AccountUpdate(BaseModel):
     alias: Optional[str] = None
     active: Optional[bool] = None
     loss_reason: Optional[str] = None
     outcome: Optional[str] = None
 
+# --- BÚSQUEDA ---
+class SearchHit(BaseModel):
+    id: int
+    rank: float
+    snippet: Optional[str] = None # Notas escapadas como HTML; el único marcado son las coincidencias entre <mark></mark>
+    # Trades
+    account_id: Optional[int] = None
+    symbol: Optional[str] = None
+    type: Optional[str] = None
+    close_time: Optional[datetime] = None
+    profit: Optional[float] = None
+    # Trade ideas
+    asset: Optional[str] = None
+    status: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+class SearchResponse(BaseModel):
+    query: str
+    kind: str # trades o ideas
+    results: List[SearchHit]
+    next_cursor: Optional[str] = None
+
+
+# --- IMPORTACIÓN DE REPORTES MT5 ---
+class StatementImportResult(BaseModel):
+    format: str # html o csv
+    received: int # Trades (deals de salida) leídos del reporte
+    inserted: int
+    skipped: int # Ya existían en la cuenta
+    invalid: int # Filas de deals que no se pudieron leer
+
+
+# --- ANALÍTICA ---
+class BreakdownGroup(BaseModel):
+    keys: Dict[str, Union[int, str, None]] # Valor de cada dimensión (id, símbolo, hora 0-23, día 0 = lunes)
+    labels: Dict[str, Optional[str]] # Nombre legible (ej: "FOMO", "09:00", "Lunes")
+    trades: int
+    profit: float
+    net_profit: float # Con comisión y swap
+    wins: int
+    losses: int
+    win_rate: float
+    profit_factor: float
+    expectancy: float # Profit medio por trade
+    average_win: float
+    average_loss: float
+
+class BreakdownResponse(BaseModel):
+    dimensions: List[str]
+    total: BreakdownGroup
+    groups: List[BreakdownGroup] # Una fila por combinación de las dimensiones
+    subtotals: Dict[str, List[BreakdownGroup]] = {} # Con dos dimensiones: cada una por separado
+
+
+# --- SIMULACIÓN MONTE CARLO ---
+class SimulationDays(BaseModel):
+    # Días operados desde el inicio de la simulación
+    mean: float
+    p10: float
+    p50: float
+    p90: float
+
+class SimulationResult(BaseModel):
+    account_id: int
+    paths: int
+    horizon_days: int # Días operados simulados por camino
+    history_days: int # Días operados del historial usados en el bootstrap
+    history_trades: int
+    start_balance: float
+    target_balance: Optional[float] = None
+    pass_probability: float # %
+    fail_probability: float # %
+    open_probability: float # % Ni aprobada ni quemada al final del horizonte
+    fail_max_drawdown_probability: float
+    fail_daily_drawdown_probability: float
+    time_to_target: Optional[SimulationDays] = None # Solo caminos aprobados
+    time_to_fail: Optional[SimulationDays] = None
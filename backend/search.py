@@ -0,0 +1,224 @@
+# backend/search.py
+"""
+Búsqueda de texto en trades (símbolo, notas, comentario) y trade ideas (activo, notas de las evidencias).
+
+En Postgres:
+    - Columnas search_vector (tsvector) GENERADAS por la base de datos, así se mantienen
+      al día en cada INSERT/UPDATE sin código extra, con índice GIN.
+    - Índices de trigramas (pg_trgm) sobre símbolo y activo para búsquedas parciales ("xau").
+    - Resultados ordenados por relevancia, con fragmentos resaltados (<mark>) y paginación
+      por cursor sobre (relevancia, id). El texto del fragmento va escapado como HTML.
+Los índices se crean al arrancar (setup). Si no se pueden crear (ej: sin permiso para la
+extensión pg_trgm) queda registrado en el log y la búsqueda usa el LIKE, sin ranking, en
+lugar de fallar en cada consulta. El idioma del análisis es SEARCH_TS_CONFIG
+("simple" por defecto, porque las notas mezclan español, inglés y tickers); si se cambia
+hay que borrar las columnas search_vector para que se regeneren.
+
+En SQLite (entorno local) se hace un LIKE sin índice: mismo formato de respuesta, sin ranking.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import List, Optional, Tuple
+import base64
+import logging
+import os
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TS_CONFIG = os.getenv("SEARCH_TS_CONFIG", "simple")
+
+HIGHLIGHT_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5"
+
+# Columnas search_vector e índices listos (lo decide setup al arrancar)
+_fulltext_ready = False
+
+
+def _escape_html(expr: str) -> str:
+    """
+    Escapa el texto del usuario en SQL antes de resaltar, así en el fragmento el único HTML
+    son los <mark> (el fragmento se muestra como HTML). El parser de Postgres toma "&lt;"
+    como una entidad, no como palabra, y nunca la resalta ni la corta.
+    """
+    # La comilla simple va duplicada porque es un literal de SQL
+    for char, entity in (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"), ("''", "&#39;")):
+        expr = f"replace({expr}, '{char}', '{entity}')"
+    return expr
+
+
+def _postgres_ddl() -> List[str]:
+    cfg = SEARCH_TS_CONFIG.replace("'", "")
+    return [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        # Trades: el símbolo pesa más que las notas, y las notas más que el comentario del broker
+        f"""ALTER TABLE trades ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('{cfg}', coalesce(symbol, '')), 'A') ||
+                setweight(to_tsvector('{cfg}', coalesce(notes, '')), 'B') ||
+                setweight(to_tsvector('{cfg}', coalesce(comment, '')), 'C')
+            ) STORED""",
+        "CREATE INDEX IF NOT EXISTS ix_trades_search_vector ON trades USING GIN (search_vector)",
+        "CREATE INDEX IF NOT EXISTS ix_trades_symbol_trgm ON trades USING GIN (symbol gin_trgm_ops)",
+        # Trade ideas: notas de cada evidencia y el activo
+        f"""ALTER TABLE timeframe_evidences ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+                to_tsvector('{cfg}', coalesce(note, ''))
+            ) STORED""",
+        "CREATE INDEX IF NOT EXISTS ix_timeframe_evidences_search_vector ON timeframe_evidences USING GIN (search_vector)",
+        "CREATE INDEX IF NOT EXISTS ix_trade_ideas_asset_trgm ON trade_ideas USING GIN (asset gin_trgm_ops)",
+    ]
+
+
+def setup(engine) -> bool:
+    """
+    Crea columnas e índices de búsqueda si faltan (solo Postgres; es idempotente).
+    Devuelve si la búsqueda por relevancia quedó disponible.
+    """
+    global _fulltext_ready
+    if engine.dialect.name != "postgresql":
+        return False
+    try:
+        with engine.begin() as conn:
+            for statement in _postgres_ddl():
+                conn.execute(text(statement))
+        _fulltext_ready = True
+    except Exception:
+        # Ej: el usuario de la BD no puede crear la extensión pg_trgm
+        logger.exception("No se pudieron crear los índices de búsqueda: /search usa LIKE, sin ranking")
+        _fulltext_ready = False
+    return _fulltext_ready
+
+
+# --- Cursor sobre (relevancia, id) ---
+
+def _encode_cursor(rank: float, item_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{rank!r}|{item_id}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        rank, item_id = raw.split("|")
+        return float(rank), int(item_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _like_pattern(q: str, prefix_only: bool = False) -> str:
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%" if prefix_only else f"%{escaped}%"
+
+
+# --- Consultas ---
+
+TRADES_PG = f"""
+WITH q AS (SELECT websearch_to_tsquery(CAST(:cfg AS regconfig), :q) AS query),
+hits AS (
+    SELECT t.id, t.account_id, t.symbol, t.type, t.close_time, t.profit, t.notes, t.comment,
+           CAST(ts_rank_cd(t.search_vector, q.query) + similarity(t.symbol, :q) AS float8) AS rank
+    FROM trades t, q
+    WHERE (t.search_vector @@ q.query OR t.symbol ILIKE :prefix ESCAPE '\\')
+      AND (CAST(:account_id AS integer) IS NULL OR t.account_id = :account_id)
+)
+SELECT h.id, h.account_id, h.symbol, h.type, h.close_time, h.profit, h.rank,
+       ts_headline(CAST(:cfg AS regconfig), {_escape_html("concat_ws(' · ', h.notes, h.comment)")}, q.query, :highlight) AS snippet
+FROM hits h, q
+WHERE CAST(:cursor_rank AS float8) IS NULL
+   OR h.rank < :cursor_rank OR (h.rank = :cursor_rank AND h.id < :cursor_id)
+ORDER BY h.rank DESC, h.id DESC
+LIMIT :limit
+"""
+
+IDEAS_PG = f"""
+WITH q AS (SELECT websearch_to_tsquery(CAST(:cfg AS regconfig), :q) AS query),
+hits AS (
+    SELECT i.id, i.asset, i.status, i.created_at,
+           CAST(coalesce(max(ts_rank_cd(e.search_vector, q.query)), 0) + similarity(i.asset, :q) AS float8) AS rank,
+           string_agg(e.note, ' · ') AS notes
+    FROM trade_ideas i
+    CROSS JOIN q
+    LEFT JOIN timeframe_evidences e ON e.trade_idea_id = i.id AND e.search_vector @@ q.query
+    WHERE e.id IS NOT NULL OR i.asset ILIKE :prefix ESCAPE '\\'
+    GROUP BY i.id, i.asset, i.status, i.created_at, q.query
+)
+SELECT h.id, h.asset, h.status, h.created_at, h.rank,
+       ts_headline(CAST(:cfg AS regconfig), {_escape_html("coalesce(h.notes, '')")}, q.query, :highlight) AS snippet
+FROM hits h, q
+WHERE CAST(:cursor_rank AS float8) IS NULL
+   OR h.rank < :cursor_rank OR (h.rank = :cursor_rank AND h.id < :cursor_id)
+ORDER BY h.rank DESC, h.id DESC
+LIMIT :limit
+"""
+
+# LIKE sin índice ni ranking (rank = 0): SQLite en desarrollo local, o Postgres sin los índices
+TRADES_LIKE = f"""
+SELECT t.id, t.account_id, t.symbol, t.type, t.close_time, t.profit, 0.0 AS rank,
+       {_escape_html("trim(coalesce(t.notes, '') || ' · ' || coalesce(t.comment, ''), ' ·')")} AS snippet
+FROM trades t
+WHERE (lower(t.symbol) LIKE lower(:pattern) ESCAPE '\\' OR lower(t.notes) LIKE lower(:pattern) ESCAPE '\\'
+       OR lower(t.comment) LIKE lower(:pattern) ESCAPE '\\')
+  AND (:account_id IS NULL OR t.account_id = :account_id)
+  AND (:cursor_rank IS NULL OR 0.0 < :cursor_rank OR (0.0 = :cursor_rank AND t.id < :cursor_id))
+ORDER BY t.id DESC
+LIMIT :limit
+"""
+
+
+def _ideas_like(note_agg: str) -> str:
+    return f"""
+SELECT i.id, i.asset, i.status, i.created_at, 0.0 AS rank,
+       {_escape_html(f"coalesce({note_agg}, '')")} AS snippet
+FROM trade_ideas i
+LEFT JOIN timeframe_evidences e ON e.trade_idea_id = i.id AND lower(e.note) LIKE lower(:pattern) ESCAPE '\\'
+WHERE (e.id IS NOT NULL OR lower(i.asset) LIKE lower(:pattern) ESCAPE '\\')
+  AND (:cursor_rank IS NULL OR 0.0 < :cursor_rank OR (0.0 = :cursor_rank AND i.id < :cursor_id))
+GROUP BY i.id, i.asset, i.status, i.created_at
+ORDER BY i.id DESC
+LIMIT :limit
+"""
+
+
+IDEAS_LIKE = _ideas_like("group_concat(e.note, ' · ')")
+# Postgres sin los índices de búsqueda (ver setup): la misma consulta con string_agg
+IDEAS_LIKE_PG = _ideas_like("string_agg(e.note, ' · ')")
+
+
+def _query_for(dialect: str, kind: str) -> Tuple[str, bool]:
+    """SQL de la búsqueda y si es la de relevancia (Postgres con los índices creados)"""
+    if dialect == "postgresql" and _fulltext_ready:
+        return (TRADES_PG if kind == "trades" else IDEAS_PG), True
+    if kind == "trades":
+        return TRADES_LIKE, False
+    return (IDEAS_LIKE_PG if dialect == "postgresql" else IDEAS_LIKE), False
+
+
+def search(
+    db: Session,
+    q: str,
+    kind: str = "trades",
+    account_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20
+) -> dict:
+    """Resultados de trades o de trade ideas ordenados por relevancia, con cursor para la página siguiente"""
+    cursor_rank, cursor_id = _decode_cursor(cursor) if cursor else (None, None)
+    params = {
+        "q": q,
+        "cursor_rank": cursor_rank,
+        "cursor_id": cursor_id,
+        "limit": limit + 1, # Uno de más para saber si hay otra página
+    }
+
+    sql, ranked = _query_for(db.bind.dialect.name, kind)
+    if ranked:
+        params.update({"cfg": SEARCH_TS_CONFIG, "prefix": _like_pattern(q, prefix_only=True), "highlight": HIGHLIGHT_OPTIONS})
+    else:
+        params["pattern"] = _like_pattern(q)
+    if kind == "trades":
+        params["account_id"] = account_id
+
+    rows = [dict(row) for row in db.execute(text(sql), params).mappings()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]["rank"], rows[-1]["id"])
+
+    return {"query": q, "kind": kind, "results": rows, "next_cursor": next_cursor}
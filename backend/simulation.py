@@ -0,0 +1,271 @@
+# backend/simulation.py
+"""
+Simulación Monte Carlo de una cuenta de fondeo: ¿qué probabilidad hay de aprobar
+(llegar al objetivo cumpliendo la consistencia) o de quemarla (drawdown máximo o
+diario) si sigue operando como hasta ahora?
+
+Bootstrap por días: cada camino encadena días operados elegidos al azar del historial
+de la cuenta. De cada día se guarda el P&L neto (profit + comisión + swap) y el mínimo
+y el máximo del P&L acumulado dentro del día, así el drawdown diario y el máximo se
+comprueban con el peor momento del día y no solo con el cierre. Como no se conoce el
+orden de pico y valle dentro de un día simulado, el HWM del trailing solo sube con los
+días anteriores.
+
+Todos los caminos de un bloque se calculan a la vez con NumPy (matrices caminos x días).
+Las simulaciones grandes se reparten por bloques entre procesos (ProcessPoolExecutor).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy.orm import Session
+from typing import Optional
+import multiprocessing
+import os
+import threading
+import numpy as np
+import models
+
+SIMULATION_MAX_PATHS = int(os.getenv("SIMULATION_MAX_PATHS", "200000"))
+# Caminos por bloque (memoria: ~8 matrices de float64 de bloque x días)
+SIMULATION_CHUNK_PATHS = int(os.getenv("SIMULATION_CHUNK_PATHS", "10000"))
+SIMULATION_WORKERS = int(os.getenv("SIMULATION_WORKERS", str(os.cpu_count() or 1)))
+# Por debajo de este tamaño (caminos x días) arrancar procesos cuesta más de lo que ahorra
+SIMULATION_PARALLEL_MIN_CELLS = int(os.getenv("SIMULATION_PARALLEL_MIN_CELLS", "5000000"))
+
+# Mínimo de días operados para que el bootstrap tenga sentido
+MIN_HISTORY_DAYS = 5
+
+FAIL_MAX_DRAWDOWN = 1
+FAIL_DAILY_DRAWDOWN = 2
+
+
+def load_history(db: Session, account_id: int, initial_balance: float) -> Optional[dict]:
+    """P&L de cada día operado (total, mínimo y máximo intradía) en arrays de NumPy"""
+    rows = db.query(
+        models.Trade.close_time,
+        models.Trade.profit,
+        models.Trade.commission,
+        models.Trade.swap
+    ).filter(
+        models.Trade.account_id == account_id,
+        models.Trade.close_time.isnot(None)
+    ).order_by(models.Trade.close_time, models.Trade.id).all()
+
+    totals, lows, highs = [], [], []
+    current_day = None
+    running = low = high = 0.0
+    cumulative = peak = 0.0 # Para el HWM histórico
+    for close_time, profit, commission, swap in rows:
+        day = close_time.date()
+        if day != current_day:
+            if current_day is not None:
+                totals.append(running)
+                lows.append(low)
+                highs.append(high)
+            current_day = day
+            running = low = high = 0.0
+        net = (profit or 0.0) + (commission or 0.0) + (swap or 0.0)
+        running += net
+        low = min(low, running)
+        high = max(high, running)
+        cumulative += net
+        peak = max(peak, cumulative)
+    if current_day is not None:
+        totals.append(running)
+        lows.append(low)
+        highs.append(high)
+
+    if not totals:
+        return None
+    return {
+        "totals": np.array(totals),
+        "lows": np.array(lows),
+        "highs": np.array(highs),
+        "trades": len(rows),
+        "high_water_mark": initial_balance + peak,
+        "best_day": max(0.0, max(totals)),
+    }
+
+
+def _first_true(mask: np.ndarray) -> np.ndarray:
+    """Índice del primer día True de cada camino (-1 si no hay)"""
+    return np.where(mask.any(axis=1), mask.argmax(axis=1), -1)
+
+
+def simulate_chunk(history: dict, rules: dict, start: dict, paths: int, horizon: int, seed) -> dict:
+    """
+    Simula 'paths' caminos de 'horizon' días operados. Devuelve, por camino, el día
+    en que aprueba y el día y el motivo por el que se quema (-1 / 0 si no pasa).
+    Función de módulo para poder ejecutarla en otro proceso.
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(history["totals"]), size=(paths, horizon))
+    totals = history["totals"][picks]
+    lows = history["lows"][picks]
+    highs = history["highs"][picks]
+
+    initial = rules["initial_balance"]
+    ends = start["balance"] + np.cumsum(totals, axis=1)
+    starts = np.empty_like(ends)
+    starts[:, 0] = start["balance"]
+    starts[:, 1:] = ends[:, :-1]
+
+    # --- Quemada: drawdown máximo (estático o trailing) ---
+    breach_max = np.zeros(ends.shape, dtype=bool)
+    if rules["max_drawdown_limit"] > 0:
+        max_dd = rules["max_drawdown_limit"] / 100
+        if rules["trailing_drawdown"]:
+            # HWM al empezar cada día = mayor balance alcanzado en los días anteriores
+            peaks = np.maximum.accumulate(starts + highs, axis=1)
+            hwm = np.empty_like(peaks)
+            hwm[:, 0] = start["high_water_mark"]
+            hwm[:, 1:] = np.maximum(start["high_water_mark"], peaks[:, :-1])
+            limit = hwm * (1 - max_dd)
+        else:
+            limit = initial * (1 - max_dd)
+        breach_max = starts + lows <= limit
+
+    # --- Quemada: drawdown diario (% del inicial desde el balance de inicio del día) ---
+    breach_daily = np.zeros(ends.shape, dtype=bool)
+    if rules["daily_drawdown_limit"] > 0:
+        breach_daily = lows <= -initial * (rules["daily_drawdown_limit"] / 100)
+
+    fail_day = _first_true(breach_max | breach_daily)
+    rows = np.arange(paths)
+    failed = fail_day >= 0
+    fail_reason = np.zeros(paths, dtype=np.int8)
+    fail_reason[failed] = np.where(breach_max[rows[failed], fail_day[failed]], FAIL_MAX_DRAWDOWN, FAIL_DAILY_DRAWDOWN)
+
+    # --- Aprobada: objetivo alcanzado al cierre de un día, con la consistencia cumplida ---
+    pass_day = np.full(paths, -1)
+    if rules["target_percent"] > 0:
+        reached = ends >= initial * (1 + rules["target_percent"] / 100)
+        if rules["consistency_rule"] > 0:
+            # Mejor día <= consistencia% del profit total (misma regla que en RiskMetrics)
+            best_day = np.maximum(start["best_day"], np.maximum.accumulate(totals, axis=1))
+            reached &= (ends - initial) * (rules["consistency_rule"] / 100) >= best_day
+        pass_day = _first_true(reached)
+
+    # Si se quema ese mismo día (o antes), no llega a aprobar
+    passed = (pass_day >= 0) & ((fail_day < 0) | (pass_day < fail_day))
+    pass_day[~passed] = -1
+    fail_day[passed] = -1
+    fail_reason[passed] = 0
+
+    return {
+        "pass_day": pass_day.astype(np.int32),
+        "fail_day": fail_day.astype(np.int32),
+        "fail_reason": fail_reason,
+    }
+
+
+def _percentiles(days: np.ndarray) -> Optional[dict]:
+    # Días operados (1 = el primer día simulado)
+    if not len(days):
+        return None
+    days = days + 1
+    p10, p50, p90 = np.percentile(days, [10, 50, 90])
+    return {"mean": round(float(days.mean()), 1), "p10": float(p10), "p50": float(p50), "p90": float(p90)}
+
+
+class MonteCarloSimulator:
+    """
+    Ejecuta las simulaciones por bloques; si son grandes, en un pool de procesos
+    que se crea la primera vez que hace falta y se reutiliza.
+    """
+
+    def __init__(self, workers: int = SIMULATION_WORKERS, chunk_paths: int = SIMULATION_CHUNK_PATHS):
+        self.workers = workers
+        self.chunk_paths = chunk_paths
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: hacer fork de un servidor con hilos (y NumPy) puede bloquear a los hijos
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def run(self, history: dict, rules: dict, start: dict, paths: int, horizon: int,
+            seed: Optional[int] = None) -> dict:
+        chunks = [min(self.chunk_paths, paths - offset) for offset in range(0, paths, self.chunk_paths)]
+        # Una semilla independiente por bloque: mismo resultado en serie o en paralelo
+        seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+
+        if self.workers > 1 and len(chunks) > 1 and paths * horizon >= SIMULATION_PARALLEL_MIN_CELLS:
+            results = list(self._pool().map(
+                simulate_chunk,
+                *zip(*[(history, rules, start, size, horizon, s) for size, s in zip(chunks, seeds)])
+            ))
+        else:
+            results = [simulate_chunk(history, rules, start, size, horizon, s) for size, s in zip(chunks, seeds)]
+
+        pass_day = np.concatenate([r["pass_day"] for r in results])
+        fail_day = np.concatenate([r["fail_day"] for r in results])
+        fail_reason = np.concatenate([r["fail_reason"] for r in results])
+
+        passed = int((pass_day >= 0).sum())
+        failed = int((fail_day >= 0).sum())
+        return {
+            "paths": paths,
+            "horizon_days": horizon,
+            "pass_probability": round(passed / paths * 100, 2),
+            "fail_probability": round(failed / paths * 100, 2),
+            "open_probability": round((paths - passed - failed) / paths * 100, 2),
+            "fail_max_drawdown_probability": round(int((fail_reason == FAIL_MAX_DRAWDOWN).sum()) / paths * 100, 2),
+            "fail_daily_drawdown_probability": round(int((fail_reason == FAIL_DAILY_DRAWDOWN).sum()) / paths * 100, 2),
+            "time_to_target": _percentiles(pass_day[pass_day >= 0]),
+            "time_to_fail": _percentiles(fail_day[fail_day >= 0]),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def simulate_account(db: Session, acc, paths: int, horizon: int, from_start: bool = False,
+                     seed: Optional[int] = None) -> Optional[dict]:
+    """
+    Simula la cuenta con sus reglas. Por defecto parte del estado actual (balance,
+    HWM y mejor día); from_start=True simula un intento nuevo desde el balance inicial.
+    None si no hay historial suficiente.
+    """
+    history = load_history(db, acc.id, acc.initial_balance or 0.0)
+    if history is None or len(history["totals"]) < MIN_HISTORY_DAYS:
+        return None
+
+    rules = {
+        "initial_balance": acc.initial_balance or 0.0,
+        "max_drawdown_limit": acc.max_drawdown_limit or 0.0,
+        "trailing_drawdown": bool(acc.trailing_drawdown),
+        "daily_drawdown_limit": acc.daily_drawdown_limit or 0.0,
+        "target_percent": acc.target_percent or 0.0,
+        "consistency_rule": acc.consistency_rule or 0.0,
+    }
+    if from_start:
+        start = {"balance": rules["initial_balance"], "high_water_mark": rules["initial_balance"], "best_day": 0.0}
+    else:
+        balance = acc.balance or 0.0
+        start = {
+            "balance": balance,
+            "high_water_mark": max(history["high_water_mark"], balance),
+            "best_day": history["best_day"],
+        }
+
+    result = simulator.run(history, rules, start, paths, horizon, seed)
+    result.update({
+        "account_id": acc.id,
+        "history_days": len(history["totals"]),
+        "history_trades": history["trades"],
+        "start_balance": start["balance"],
+        "target_balance": rules["initial_balance"] * (1 + rules["target_percent"] / 100) if rules["target_percent"] > 0 else None,
+    })
+    return result
+
+
+# Instancia global
+simulator = MonteCarloSimulator()
@@ -0,0 +1,378 @@
+# backend/statement_import.py
+"""
+Importación del historial desde los reportes de MT5 ("Historial -> Informe"), en HTML o CSV.
+
+Se lee la sección "Deals" (Time, Deal, Symbol, Type, Direction, Volume, Price, Order,
+Commission, Fee, Swap, Profit, Balance, Comment) a medida que llega el archivo, sin
+cargarlo entero. Cada deal de salida ("out", "in/out", "out by") es un trade:
+    - ticket = número del deal de salida (igual que en la sincronización con la VPS)
+    - open_time = deal de entrada del mismo símbolo, emparejado en orden FIFO
+    - position_id = columna Position del reporte si la trae (y solo se empareja con las
+      entradas de esa posición); si no, la orden de la entrada, que en MT5 es el id de la posición
+    - commission = comisión + fee de la salida + la parte proporcional de la entrada
+Los trades repetidos (mismo ticket y cuenta) se ignoran, igual que al sincronizar. Si el
+reporte llega más allá de la marca de agua de sincronización, esta avanza hasta su último
+trade: la siguiente sincronización pide a la VPS solo lo posterior.
+
+En Postgres los trades se cargan con COPY a una tabla temporal y se pasan a trades con
+un solo INSERT ... SELECT ... ON CONFLICT DO NOTHING. En otros motores, INSERT por lotes.
+"""
+from collections import defaultdict, deque
+from html.parser import HTMLParser
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, Iterator, List, Optional
+import codecs
+import csv
+import datetime
+import io
+import ingest
+import models
+import daily_pnl
+import account_stats
+
+READ_CHUNK_BYTES = 64 * 1024
+
+TIME_FORMATS = ("%Y.%m.%d %H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y.%m.%d %H:%M", "%Y-%m-%d %H:%M")
+
+# Columnas de la tabla temporal (mismo orden en el COPY y en el INSERT ... SELECT)
+STAGING_COLUMNS = ("ticket", "position_id", "symbol", "type", "open_time", "close_time",
+                   "profit", "commission", "swap", "comment")
+
+
+# --- Lectura del archivo ---
+
+def _iter_text(fileobj) -> Iterator[str]:
+    """Texto del archivo por trozos. Los reportes HTML de MT5 suelen venir en UTF-16"""
+    first = fileobj.read(READ_CHUNK_BYTES)
+    if first.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        encoding = "utf-16"
+    elif first.startswith(codecs.BOM_UTF8):
+        encoding = "utf-8-sig"
+    else:
+        encoding = "utf-8"
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    chunk = first
+    while chunk:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+        chunk = fileobj.read(READ_CHUNK_BYTES)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        lines = pending.splitlines(keepends=True)
+        # La última línea puede estar incompleta: esperamos al siguiente trozo
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        yield from lines
+    if pending:
+        yield pending
+
+
+class _TableRowParser(HTMLParser):
+    """Junta las celdas de cada <tr> a medida que se alimenta el HTML"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows: List[List[str]] = []
+        self._row: Optional[List[str]] = None
+        self._cell: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self._row = []
+        elif tag in ("td", "th") and self._row is not None:
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th") and self._cell is not None:
+            self._row.append("".join(self._cell).strip())
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def _iter_html_rows(chunks: Iterable[str]) -> Iterator[List[str]]:
+    parser = _TableRowParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.rows
+        parser.rows = []
+    parser.close()
+    yield from parser.rows
+
+
+def _iter_csv_rows(chunks: Iterable[str]) -> Iterator[List[str]]:
+    lines = _iter_lines(chunks)
+    first = next(lines, None)
+    if first is None:
+        return
+    delimiter = max((";", ",", "\t"), key=first.count)
+    reader = csv.reader(_prepend(first, lines), delimiter=delimiter)
+    for row in reader:
+        yield [cell.strip() for cell in row]
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+# --- Deals -> trades ---
+
+def _parse_time(value: str) -> Optional[datetime.datetime]:
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_number(value: str) -> float:
+    # MT5 separa los miles con espacios: "1 234.56"
+    value = value.replace(" ", "").replace("\xa0", "")
+    return float(value) if value else 0.0
+
+
+class _DealMatcher:
+    """Empareja deals de entrada y salida por símbolo (FIFO) para armar cada trade"""
+
+    def __init__(self):
+        # symbol -> cola de entradas abiertas: [volumen restante, hora, posición, comisión restante, tipo]
+        self.open_lots: Dict[str, deque] = defaultdict(deque)
+
+    def _open(self, symbol, volume, time, position, commission, side):
+        self.open_lots[symbol].append([volume, time, position, commission, side])
+
+    def _close(self, symbol, volume, side, position=None):
+        """
+        Consume las entradas del lado 'side' (y de la posición, si se conoce); devuelve
+        hora, posición y comisión de entrada y el volumen cerrado
+        """
+        lots = self.open_lots[symbol]
+        open_time = position_id = None
+        entry_commission = 0.0
+        closed = 0.0
+        for lot in list(lots):
+            if volume - closed <= 1e-9:
+                break
+            if lot[4] != side or (position is not None and lot[2] != position):
+                continue
+            take = min(lot[0], volume - closed)
+            if open_time is None:
+                open_time, position_id = lot[1], lot[2]
+            share = take / lot[0] if lot[0] else 1.0
+            entry_commission += lot[3] * share
+            lot[3] -= lot[3] * share
+            lot[0] -= take
+            closed += take
+            if lot[0] <= 1e-9:
+                lots.remove(lot)
+        return open_time, position_id, entry_commission, closed
+
+    def process(self, deal: dict) -> Optional[dict]:
+        deal_type = deal["type"].lower()
+        if deal_type not in ("buy", "sell"):
+            return None # balance, credit, correcciones...
+        direction = deal["direction"].lower()
+        side = "BUY" if deal_type == "buy" else "SELL"
+        commission = deal["commission"] + deal["fee"]
+        position = deal["position"]
+
+        if direction == "in":
+            self._open(deal["symbol"], deal["volume"], deal["time"], position or deal["order"], commission, side)
+            return None
+        if not direction.startswith("out") and direction != "in/out":
+            return None
+
+        # Un deal de salida "sell" cierra una posición BUY y viceversa
+        position_side = "SELL" if side == "BUY" else "BUY"
+        open_time, position_id, entry_commission, closed = self._close(
+            deal["symbol"], deal["volume"], position_side, position)
+        if direction == "in/out" and deal["volume"] - closed > 1e-9:
+            # Reversa: lo que sobra abre una posición nueva en sentido contrario
+            self._open(deal["symbol"], deal["volume"] - closed, deal["time"], position or deal["order"], 0.0, side)
+
+        return {
+            "ticket": deal["deal"],
+            "position_id": position or position_id,
+            "symbol": deal["symbol"],
+            "type": position_side,
+            "open_time": open_time,
+            "close_time": deal["time"],
+            "profit": deal["profit"],
+            "commission": round(commission + entry_commission, 2),
+            "swap": deal["swap"],
+            "comment": deal["comment"] or None,
+        }
+
+
+class StatementParser:
+    """Recorre las filas del reporte, encuentra la tabla de Deals y devuelve los trades"""
+
+    REQUIRED = ("time", "deal", "symbol", "type", "direction", "profit")
+
+    def __init__(self):
+        self.matcher = _DealMatcher()
+        self.received = 0 # Deals de salida leídos
+        self.invalid = 0
+
+    def _find_header(self, row: List[str]) -> Optional[Dict[str, int]]:
+        names = [cell.strip().lower() for cell in row]
+        if not all(name in names for name in self.REQUIRED):
+            return None
+        return {name: index for index, name in reversed(list(enumerate(names)))}
+
+    def trades(self, rows: Iterable[List[str]]) -> Iterator[dict]:
+        columns = None
+        for row in rows:
+            if columns is None:
+                columns = self._find_header(row)
+                continue
+
+            # Título de la siguiente sección del reporte (ej: "Open Positions"): terminamos
+            if len([cell for cell in row if cell]) == 1 and _parse_time(row[0]) is None:
+                break
+
+            cells = {name: row[index] if index < len(row) else "" for name, index in columns.items()}
+            time = _parse_time(cells["time"])
+            if time is None:
+                continue # Filas de totales o separadores
+
+            try:
+                deal = {
+                    "time": time,
+                    "deal": int(cells["deal"]),
+                    "symbol": cells["symbol"],
+                    "type": cells["type"],
+                    "direction": cells["direction"],
+                    "volume": _parse_number(cells.get("volume", "")),
+                    "order": int(cells["order"]) if cells.get("order") else None,
+                    "position": int(cells["position"]) if cells.get("position") else None,
+                    "commission": _parse_number(cells.get("commission", "")),
+                    "fee": _parse_number(cells.get("fee", "")),
+                    "swap": _parse_number(cells.get("swap", "")),
+                    "profit": _parse_number(cells["profit"]),
+                    "comment": cells.get("comment", ""),
+                }
+            except ValueError:
+                self.invalid += 1
+                continue
+
+            trade = self.matcher.process(deal)
+            if trade is not None:
+                self.received += 1
+                yield trade
+
+
+# --- Carga en la base de datos ---
+
+def _batches(items: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _load_with_copy(db: Session, account_id: int, trades: Iterable[dict], batch_size: int) -> int:
+    """COPY a una tabla temporal + un INSERT ... SELECT con los duplicados descartados"""
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.execute(
+            "CREATE TEMP TABLE trade_import ("
+            " ticket bigint, position_id bigint, symbol varchar, type varchar,"
+            " open_time timestamp, close_time timestamp,"
+            " profit double precision, commission double precision, swap double precision, comment varchar"
+            ") ON COMMIT DROP"
+        )
+        copy_sql = f"COPY trade_import ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+        for batch in _batches(trades, batch_size):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            # Vacío sin comillas = NULL en el COPY
+            writer.writerows([trade[column] for column in STAGING_COLUMNS] for trade in batch)
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+
+        columns = ", ".join(STAGING_COLUMNS)
+        cursor.execute(
+            f"INSERT INTO trades (account_id, {columns}) "
+            f"SELECT %s, {columns} FROM trade_import ORDER BY close_time, ticket "
+            "ON CONFLICT ON CONSTRAINT unique_trade_per_account DO NOTHING",
+            (account_id,)
+        )
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def _load_with_inserts(db: Session, account_id: int, trades: Iterable[dict], batch_size: int) -> int:
+    inserted = 0
+    for batch in _batches(trades, batch_size):
+        inserted += len(ingest.insert_trades(db, [dict(trade, account_id=account_id) for trade in batch]))
+    return inserted
+
+
+def _advance_watermark(db: Session, account_id: int):
+    """Lleva la marca de agua de sincronización hasta el trade más reciente de la cuenta, si es más nuevo"""
+    newest = db.query(models.Trade.close_time, models.Trade.ticket)\
+               .filter(models.Trade.account_id == account_id)\
+               .order_by(models.Trade.close_time.desc(), models.Trade.ticket.desc())\
+               .first()
+    state = db.get(models.AccountSyncState, account_id)
+    if newest is None or state is None:
+        return # Sin estado todavía: el primer sync lo arma desde los trades (ya incluye los importados)
+    if state.last_close_time is None or newest.close_time > state.last_close_time:
+        state.last_close_time = newest.close_time
+        state.last_ticket = newest.ticket
+
+
+def import_statement(db: Session, account_id: int, fileobj, filename: str = "",
+                     batch_size: int = ingest.INGEST_BATCH_SIZE) -> dict:
+    """
+    Importa un reporte de MT5 a la cuenta, recalcula su P&L diario y sus stats y avanza
+    la marca de agua de sincronización. Todo en una transacción; no hace commit.
+    """
+    chunks = _iter_text(fileobj)
+    first = next(chunks, "")
+    chunks = _prepend(first, chunks)
+
+    is_html = filename.lower().endswith((".htm", ".html")) or first.lstrip()[:1] == "<"
+    rows = _iter_html_rows(chunks) if is_html else _iter_csv_rows(chunks)
+
+    parser = StatementParser()
+    trades = parser.trades(rows)
+    if db.bind.dialect.name == "postgresql":
+        inserted = _load_with_copy(db, account_id, trades, batch_size)
+    else:
+        inserted = _load_with_inserts(db, account_id, trades, batch_size)
+
+    # El historial importado suele ser anterior a lo sincronizado: recalculamos la cuenta entera
+    if inserted:
+        daily_pnl.rebuild(db, [account_id])
+        account_stats.rebuild(db, [account_id])
+        _advance_watermark(db, account_id)
+
+    return {
+        "format": "html" if is_html else "csv",
+        "received": parser.received,
+        "inserted": inserted,
+        "skipped": parser.received - inserted, # Ya existían
+        "invalid": parser.invalid,
+    }
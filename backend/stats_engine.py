@@ -0,0 +1,276 @@
+# backend/stats_engine.py
+from typing import List, Optional
+import datetime
+import math
+
+
+class StatsAccumulator:
+    """
+    Acumula las métricas de rendimiento trade por trade (en orden de cierre),
+    sin guardar la lista de profits. Usa el algoritmo de Welford para la
+    media y la varianza, así el Sharpe sale en la misma pasada.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.wins = 0            # profit > 0
+        self.losses = 0          # profit < 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0    # Suma de pérdidas (negativa)
+        self.best: Optional[float] = None
+        self.worst: Optional[float] = None
+        # Welford
+        self.mean = 0.0
+        self.m2 = 0.0
+        # Rachas (Z-Score): un trade en 0 cuenta como positivo, igual que antes
+        self.runs = 0
+        self.last_sign = 0
+        # Curva acumulada (para el High Water Mark: inicial + mayor ganancia acumulada)
+        self.total_profit = 0.0
+        self.peak_profit = 0.0
+
+    def add(self, profit: float):
+        self.count += 1
+
+        if profit > 0:
+            self.wins += 1
+            self.gross_profit += profit
+        elif profit < 0:
+            self.losses += 1
+            self.gross_loss += profit
+
+        if self.best is None or profit > self.best:
+            self.best = profit
+        if self.worst is None or profit < self.worst:
+            self.worst = profit
+
+        delta = profit - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (profit - self.mean)
+
+        sign = 1 if profit >= 0 else -1
+        if sign != self.last_sign:
+            self.runs += 1
+            self.last_sign = sign
+
+        self.total_profit += profit
+        if self.total_profit > self.peak_profit:
+            self.peak_profit = self.total_profit
+
+    def merge(self, other: "StatsAccumulator"):
+        """
+        Combina otro acumulador (ej: de otra cuenta). Media y varianza con la fórmula
+        de Chan et al. Las rachas y la curva acumulada dependen del orden cronológico
+        entre cuentas, así que el llamador debe poner runs si le hacen falta.
+        """
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return
+
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / n
+        self.mean += delta * other.count / n
+        self.count = n
+
+        self.wins += other.wins
+        self.losses += other.losses
+        self.gross_profit += other.gross_profit
+        self.gross_loss += other.gross_loss
+        self.best = max(self.best, other.best)
+        self.worst = min(self.worst, other.worst)
+        self.runs += other.runs
+        self.total_profit += other.total_profit
+
+    # --- Métricas derivadas ---
+
+    def win_rate(self) -> float:
+        return (self.wins / self.count) * 100 if self.count else 0.0
+
+    def average_win(self) -> float:
+        return self.gross_profit / self.wins if self.wins else 0.0
+
+    def average_loss(self) -> float:
+        return self.gross_loss / self.losses if self.losses else 0.0
+
+    def profit_factor(self) -> float:
+        # Gross Profit / Gross Loss
+        gross_loss = abs(self.gross_loss)
+        return round(self.gross_profit / gross_loss, 2) if gross_loss > 0 else 0.0
+
+    def payoff_ratio(self) -> float:
+        # Avg Win / Avg Loss (aproximación del RRR, el real requiere el SL inicial)
+        avg_loss = self.average_loss()
+        return round(self.average_win() / abs(avg_loss), 2) if avg_loss != 0 else 0.0
+
+    def sharpe_ratio(self) -> float:
+        # Sharpe simplificado por trade: media / desviación estándar muestral
+        if self.count < 2:
+            return 0.0
+        stdev = math.sqrt(self.m2 / (self.count - 1))
+        return round(self.mean / stdev, 2) if stdev != 0 else 0.0
+
+    def z_score(self) -> float:
+        # Z-Score de rachas: compara las rachas reales con las esperadas al azar
+        if self.count <= 2 or self.wins == 0 or self.losses == 0:
+            return 0.0
+        n = self.count
+        x = 2 * self.wins * self.losses
+        expected_runs = (x / n) + 1
+        std_deviation = ((expected_runs - 1) * (expected_runs - 2)) / (n - 1)
+        if std_deviation <= 0:
+            return 0.0
+        return round((self.runs - expected_runs) / (std_deviation ** 0.5), 2)
+
+
+def account_risk_metrics(
+    acc,
+    high_water_mark: float,
+    highest_daily_profit: float,
+    day_start_balance: Optional[float] = None
+) -> dict:
+    """
+    Drawdown, drawdown diario y consistencia de una cuenta de fondeo (campos de RiskMetrics).
+    day_start_balance: balance al inicio del día del broker (None = sin sincronizar hoy).
+    """
+    # --- CÁLCULO DRAWDOWN ---
+    # Límite máximo de pérdida
+    if acc.trailing_drawdown:
+        # Trailing: El límite sube con el High Water Mark
+        # Límite = Pico Máximo - (Pico Máximo * %MaxDD)
+        limit_price = high_water_mark - (high_water_mark * (acc.max_drawdown_limit / 100))
+    else:
+        # Estático: Basado en balance inicial
+        limit_price = acc.initial_balance - (acc.initial_balance * (acc.max_drawdown_limit / 100))
+    
+    # Distancia actual al límite
+    # Total espacio permitido = HWM - Límite (Trailing) o Inicial - Límite (Estático)
+    if acc.trailing_drawdown:
+        total_allowable_loss = high_water_mark * (acc.max_drawdown_limit / 100)
+        current_loss_from_peak = high_water_mark - acc.balance
+    else:
+        total_allowable_loss = acc.initial_balance * (acc.max_drawdown_limit / 100)
+        current_loss_from_peak = acc.initial_balance - acc.balance
+
+    # Porcentaje de la barra roja (0% = a salvo, 100% = cuenta quemada)
+    dd_progress = 0.0
+    if total_allowable_loss > 0:
+        dd_progress = (current_loss_from_peak / total_allowable_loss) * 100
+    
+    dd_progress = max(0.0, min(dd_progress, 100.0)) # Clampear entre 0 y 100
+
+    # --- CÁLCULO DRAWDOWN DIARIO ---
+    # Pérdida máxima del día: % del balance inicial, medida desde el balance de inicio del día
+    if day_start_balance is None:
+        day_start_balance = acc.balance # Sin sincronizar hoy: no hay pérdidas del día registradas
+    daily_percent = acc.daily_drawdown_limit or 0.0
+    daily_allowable_loss = acc.initial_balance * (daily_percent / 100)
+    daily_loss = max(0.0, day_start_balance - acc.balance)
+
+    daily_progress = 0.0
+    if daily_allowable_loss > 0:
+        daily_progress = max(0.0, min((daily_loss / daily_allowable_loss) * 100, 100.0))
+
+    # --- CÁLCULO CONSISTENCIA ---
+    consistency_progress = 0.0
+    target_profit = 0.0
+    is_in_dd = acc.balance < acc.initial_balance
+
+    if acc.consistency_rule > 0 and highest_daily_profit > 0 and not is_in_dd:
+        # Regla: Mejor Día / % = Objetivo Total
+        # Ej: 200 / 0.25 = 800 Objetivo
+        target_profit = highest_daily_profit / (acc.consistency_rule / 100)
+        
+        current_profit = acc.balance - acc.initial_balance
+        if target_profit > 0:
+            consistency_progress = (current_profit / target_profit) * 100
+        
+        consistency_progress = max(0.0, min(consistency_progress, 100.0))
+    
+    return {
+        "account_alias": acc.alias,
+        "current_balance": acc.balance,
+        "initial_balance": acc.initial_balance,
+        "is_trailing": acc.trailing_drawdown,
+        "max_drawdown_percent": acc.max_drawdown_limit,
+        "high_water_mark": high_water_mark,
+        "drawdown_limit_price": limit_price,
+        "current_drawdown_amount": current_loss_from_peak,
+        "drawdown_progress": dd_progress,
+        "daily_drawdown_percent": daily_percent,
+        "day_start_balance": day_start_balance,
+        "daily_drawdown_limit_price": day_start_balance - daily_allowable_loss,
+        "daily_loss_amount": daily_loss,
+        "daily_loss_remaining": max(0.0, daily_allowable_loss - daily_loss),
+        "daily_drawdown_progress": daily_progress,
+        "daily_drawdown_breached": daily_allowable_loss > 0 and daily_loss >= daily_allowable_loss,
+        "consistency_rule_percent": acc.consistency_rule,
+        "highest_daily_profit": highest_daily_profit,
+        "profit_target_for_consistency": target_profit,
+        "consistency_progress": consistency_progress,
+        "is_in_drawdown": is_in_dd
+    }
+
+
+def stats_summary(stats: StatsAccumulator, highest_profitable_day: float) -> dict:
+    """Campos de rendimiento de DashboardStats a partir del acumulador"""
+    return {
+        "win_rate": round(stats.win_rate(), 2),
+        "best_trade": round(stats.best or 0.0, 2),
+        "worst_trade": round(stats.worst or 0.0, 2),
+        "average_win": round(stats.average_win(), 2),
+        "average_loss": round(stats.average_loss(), 2),
+        "highest_profitable_day": round(highest_profitable_day, 2),
+        "total_trades_count": stats.count,
+        "profit_factor": stats.profit_factor(),
+        "average_rrr": stats.payoff_ratio(),
+        "sharpe_ratio": stats.sharpe_ratio(),
+        "z_score": stats.z_score(),
+    }
+
+
+def downsample_lttb(points: List[dict], max_points: int) -> List[dict]:
+    """
+    Largest-Triangle-Three-Buckets: reduce la curva {"date", "balance"} a max_points
+    conservando su forma (picos y valles). Siempre mantiene el primer y el último punto.
+    """
+    n = len(points)
+    if max_points >= n or max_points < 3:
+        return points
+
+    xs = [datetime.date.fromisoformat(p["date"]).toordinal() for p in points]
+    ys = [p["balance"] for p in points]
+
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (max_points - 2)
+    a = 0 # Índice del último punto elegido
+
+    for i in range(max_points - 2):
+        # Rango del bucket actual
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+
+        # Promedio del bucket siguiente (el último "bucket" es el punto final)
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+
+        # Elegimos el punto que forma el triángulo más grande con el anterior y el promedio
+        best_area = -1.0
+        best_index = start
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best_area = area
+                best_index = j
+
+        sampled.append(points[best_index])
+        a = best_index
+
+    sampled.append(points[-1])
+    return sampled
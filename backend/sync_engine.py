@@ -0,0 +1,273 @@
+# backend/sync_engine.py
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from datetime import timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import requests
+import datetime
+import json
+import os
+import time
+import models
+import database
+import ingest
+import account_stats
+import daily_drawdown
+import balance_snapshots
+import vps_client
+from response_cache import response_cache
+from security import security
+
+
+class SyncEngine:
+    """
+    Sincroniza las cuentas con la VPS de MT5 enviando UNA petición por cuenta,
+    en paralelo (con un límite de concurrencia) y con timeout por cuenta.
+    Una cuenta lenta o con error no bloquea ni invalida a las demás.
+    """
+
+    def __init__(
+        self,
+        vps_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        account_timeout: Optional[float] = None,
+        session_factory: Optional[Callable[[], Session]] = None,
+    ):
+        # Todo es configurable por variables de entorno (o por parámetro, ej: una VPS de prueba local)
+        self.vps_url = vps_url or os.getenv("VPS_MT5_URL")
+        self.api_key = api_key or os.getenv("VPS_API_KEY")
+        self.max_concurrency = max_concurrency or int(os.getenv("SYNC_MAX_CONCURRENCY", "4"))
+        self.account_timeout = account_timeout or float(os.getenv("SYNC_ACCOUNT_TIMEOUT", "60"))
+        self.overlap_minutes = int(os.getenv("SYNC_OVERLAP_MINUTES", "1"))
+        self.session_factory = session_factory or database.SessionLocal
+
+    def load_sync_states(self, db: Session, accounts: List[models.Account]) -> Dict[int, models.AccountSyncState]:
+        """
+        Trae la marca de agua de todas las cuentas en una sola consulta.
+        Las cuentas sin estado (nuevas o anteriores a esta tabla) se inicializan
+        una única vez a partir de sus trades.
+        """
+        ids = [acc.id for acc in accounts]
+        states = {
+            s.account_id: s
+            for s in db.query(models.AccountSyncState).filter(models.AccountSyncState.account_id.in_(ids))
+        }
+
+        missing = [acc_id for acc_id in ids if acc_id not in states]
+        if missing:
+            bootstrap = db.query(
+                models.Trade.account_id,
+                func.max(models.Trade.close_time),
+                func.max(models.Trade.ticket)
+            ).filter(models.Trade.account_id.in_(missing)).group_by(models.Trade.account_id).all()
+            found = {acc_id: (close_time, ticket) for acc_id, close_time, ticket in bootstrap}
+
+            for acc_id in missing:
+                close_time, ticket = found.get(acc_id, (None, None))
+                state = models.AccountSyncState(account_id=acc_id, last_close_time=close_time, last_ticket=ticket)
+                db.add(state)
+                states[acc_id] = state
+            # Se guardan ya, para que un rollback de otra cuenta no los descarte
+            db.commit()
+
+        return states
+
+    def build_account_payload(self, acc: models.Account, state: models.AccountSyncState) -> dict:
+        """Arma el payload de UNA cuenta a partir de su marca de agua (sin consultar trades)"""
+        if state.last_close_time:
+            # Pequeño margen hacia atrás; los repetidos los descarta el ON CONFLICT
+            since = state.last_close_time - timedelta(minutes=self.overlap_minutes)
+            sync_date_str = since.strftime("%Y-%m-%d %H:%M:%S")
+        else:
+            sync_date_str = f"{acc.start_date} 00:00:00"
+
+        return {
+            "login": acc.login_id,
+            "password": security.decrypt(acc.password),
+            "server": acc.server,
+            "last_sync_date": sync_date_str,
+            "last_ticket": state.last_ticket
+        }
+
+    def open_account_stream(self, account_payload: dict):
+        """
+        Llama a la VPS para una sola cuenta con el cliente compartido. La respuesta se lee en streaming.
+        Es idempotente (los trades repetidos se descartan al insertar), así que se puede reintentar.
+        """
+        return vps_client.get_client().stream_post(
+            self.vps_url,
+            {"accounts": [account_payload]},
+            headers={"X-API-KEY": self.api_key, "Accept": "application/x-ndjson, application/json"},
+            timeout=self.account_timeout,
+            idempotent=True
+        )
+
+    def iter_account_response(self, response: requests.Response, login: int) -> Iterator[Tuple[str, dict]]:
+        """
+        Recorre la respuesta de la VPS devolviendo ("trade", trade), ("meta", datos de la cuenta)
+        o ("invalid", línea).
+        - NDJSON: un objeto JSON por línea. Las líneas con "ticket" son trades, el resto
+          son datos de la cuenta (status, balance, message...). Se procesa a medida que llega.
+          Una línea que no es JSON se cuenta como inválida, igual que un trade mal formado.
+        - JSON clásico ({"data": [{"account", "status", "balance", "new_trades"}]}): se carga
+          completo (la VPS no soporta streaming) y se recorre igual.
+        """
+        content_type = response.headers.get("Content-Type", "")
+
+        if "ndjson" in content_type:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    yield "invalid", line
+                    continue
+                if not isinstance(item, dict):
+                    yield "invalid", line
+                elif "ticket" in item:
+                    yield "trade", item
+                else:
+                    yield "meta", item
+            return
+
+        data = response.json().get("data", [])
+        acc_json = next((d for d in data if d.get("account") == login), None)
+        if acc_json is None:
+            raise RuntimeError("La VPS no devolvió datos para esta cuenta")
+        new_trades = acc_json.pop("new_trades", None) or []
+        yield "meta", acc_json
+        for t in new_trades:
+            yield "trade", t
+
+    def sync_account(self, acc_id: int, account_payload: dict) -> dict:
+        """
+        Sincroniza UNA cuenta en su propia sesión de BD (corre en un hilo del pool).
+        Trades, balance y marca de agua se guardan en UNA transacción.
+        """
+        started = time.monotonic()
+        db = self.session_factory()
+        try:
+            acc = db.get(models.Account, acc_id)
+            state = db.get(models.AccountSyncState, acc_id)
+            ingestor = ingest.TradeIngestor(db, acc_id)
+            meta = {}
+
+            with self.open_account_stream(account_payload) as response:
+                if response.status_code != 200:
+                    raise RuntimeError(f"Error VPS ({response.status_code}): {response.text[:200]}")
+                for kind, item in self.iter_account_response(response, account_payload["login"]):
+                    if kind == "trade":
+                        ingestor.add(item)
+                    elif kind == "invalid":
+                        ingestor.add_invalid()
+                    else:
+                        meta.update(item)
+
+            result = ingestor.finish()
+            ok = meta.get("status") in (None, "success")
+
+            if ok and "balance" in meta:
+                acc.balance = meta["balance"]
+                state.last_balance = meta["balance"]
+                balance_snapshots.record(db, acc_id, meta["balance"], meta.get("equity"))
+
+            # Balance de inicio del día del broker (drawdown diario)
+            if ok:
+                daily_drawdown.update_day_start(db, acc)
+
+            # Avanzamos la marca de agua con el trade más reciente que acabamos de guardar
+            newest = ingestor.newest
+            if newest and (state.last_close_time is None or newest.close_time >= state.last_close_time):
+                state.last_close_time = newest.close_time
+                state.last_ticket = newest.ticket
+
+            duration = time.monotonic() - started
+            if ok:
+                state.last_sync_at = datetime.datetime.utcnow()
+                state.last_sync_duration = round(duration, 3)
+
+            # Rachas del portafolio al final: el bloqueo de sus filas dura solo hasta el commit
+            ingestor.apply_portfolios()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        # Dashboard y calendario de esta cuenta (y los globales) ya no son válidos
+        response_cache.invalidate([acc_id])
+
+        result["duration_seconds"] = round(duration, 3)
+        if ok:
+            result["status"] = "success"
+        else:
+            result["status"] = "error"
+            result["error"] = meta.get("message") or meta.get("error") or meta.get("status")
+        return result
+
+    def sync_accounts(
+        self,
+        db: Session,
+        accounts: List[models.Account],
+        on_result: Optional[Callable[[models.Account, dict], None]] = None,
+        on_start: Optional[Callable[[int], None]] = None,
+    ) -> List[dict]:
+        """
+        Reparte las cuentas entre hilos. Cada hilo descarga, inserta y hace commit de su cuenta
+        con su propia sesión, así cada resultado queda guardado en cuanto termina.
+        on_start(login_id) se llama desde el hilo de la cuenta; on_result(cuenta, reporte) desde este hilo.
+        """
+        if not self.vps_url:
+            raise RuntimeError("VPS_MT5_URL no está configurada")
+
+        # Los payloads se arman antes con la sesión de quien llama
+        states = self.load_sync_states(db, accounts)
+        payloads = {acc.id: self.build_account_payload(acc, states[acc.id]) for acc in accounts}
+        accounts_by_id = {acc.id: acc for acc in accounts}
+        labels = {acc.id: {"account": acc.login_id, "alias": acc.alias} for acc in accounts}
+        reports = []
+
+        def run_account(acc_id: int) -> dict:
+            if on_start:
+                on_start(labels[acc_id]["account"])
+            return self.sync_account(acc_id, payloads[acc_id])
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = {pool.submit(run_account, acc.id): acc.id for acc in accounts}
+
+            for future in as_completed(futures):
+                acc_id = futures[future]
+                report = dict(labels[acc_id])
+                try:
+                    report.update(future.result())
+                except requests.Timeout:
+                    report.update({"status": "timeout", "error": f"Sin respuesta en {self.account_timeout}s"})
+                except Exception as e:
+                    print(f"🔥 Error sincronizando cuenta {report['account']}: {e}")
+                    report.update({"status": "error", "error": str(e)})
+
+                reports.append(report)
+                if on_result:
+                    on_result(accounts_by_id[acc_id], report)
+
+        # Los balances se actualizaron en otras sesiones
+        db.expire_all()
+
+        # Compactamos el historial de balances viejo y guardamos las rachas del conjunto
+        # de cuentas activas si cambió (no afecta el resultado del sync)
+        try:
+            balance_snapshots.compact(db)
+            account_stats.refresh_portfolios(db)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"🔥 Error en el mantenimiento después del sync: {e}")
+        return reports
+
+
+# Instancia global
+sync_engine = SyncEngine()
@@ -0,0 +1,133 @@
+# backend/sync_jobs.py
+from typing import Dict, Optional, Tuple
+import datetime
+import threading
+import time
+import uuid
+import models
+import database
+from sync_engine import sync_engine
+
+# Cuántos trabajos terminados guardamos en memoria para consultar su resultado
+MAX_FINISHED_JOBS = 20
+
+
+class SyncJobManager:
+    """
+    Ejecuta la sincronización en segundo plano y guarda su progreso en memoria.
+    Solo hay UNA sincronización corriendo a la vez: si llega otro POST mientras
+    tanto, se une al trabajo existente en lugar de llamar otra vez a la VPS.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, dict] = {}
+        self._running_job_id: Optional[str] = None
+
+    def start_or_join(self) -> Tuple[dict, bool]:
+        """Devuelve (trabajo, se_unió_a_uno_existente)"""
+        with self._lock:
+            if self._running_job_id:
+                return self._snapshot(self._jobs[self._running_job_id]), True
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": "running",
+                "created_at": datetime.datetime.utcnow(),
+                "finished_at": None,
+                "duration_seconds": None,
+                "new_trades_added": 0,
+                "skipped_trades": 0,
+                "error": None,
+                "accounts": {},
+            }
+            self._running_job_id = job_id
+            self._prune()
+
+        threading.Thread(target=self._run, args=(job_id,), daemon=True).start()
+        return self.get(job_id), False
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    # --- Internos ---
+
+    def _snapshot(self, job: dict) -> dict:
+        """Copia del trabajo para responder sin exponer el dict que el hilo está modificando"""
+        data = dict(job)
+        data["accounts"] = [dict(a) for a in job["accounts"].values()]
+        return data
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j["status"] != "running"]
+        finished.sort(key=lambda j: j["created_at"])
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job["id"]]
+
+    def _update_account(self, job_id: str, login_id: int, **fields):
+        with self._lock:
+            self._jobs[job_id]["accounts"][login_id].update(fields)
+
+    def _run(self, job_id: str):
+        # El hilo tiene su propia sesión (la del request ya se cerró)
+        db = database.SessionLocal()
+        started = time.monotonic()
+        job = self._jobs[job_id]
+        try:
+            accounts = db.query(models.Account).filter(models.Account.active == True).all()
+            with self._lock:
+                for acc in accounts:
+                    job["accounts"][acc.login_id] = {
+                        "account": acc.login_id,
+                        "alias": acc.alias,
+                        "state": "pending",
+                        "inserted": 0,
+                        "skipped": 0,
+                        "invalid": 0,
+                        "duration_seconds": None,
+                        "error": None,
+                    }
+
+            def on_start(login_id: int):
+                self._update_account(job_id, login_id, state="running")
+
+            def on_result(acc: models.Account, report: dict):
+                ok = report["status"] == "success"
+                self._update_account(
+                    job_id,
+                    report["account"],
+                    state="done" if ok else "failed",
+                    inserted=report.get("inserted", 0),
+                    skipped=report.get("skipped", 0),
+                    invalid=report.get("invalid", 0),
+                    duration_seconds=report.get("duration_seconds"),
+                    error=report.get("error"),
+                )
+                with self._lock:
+                    job["new_trades_added"] += report.get("inserted", 0)
+                    job["skipped_trades"] += report.get("skipped", 0)
+
+            if accounts:
+                sync_engine.sync_accounts(db, accounts, on_result=on_result, on_start=on_start)
+
+            with self._lock:
+                failed = [a for a in job["accounts"].values() if a["state"] == "failed"]
+                job["status"] = "done" if not failed else ("partial" if len(failed) < len(accounts) else "failed")
+        except Exception as e:
+            print(f"🔥 Error en el trabajo de sincronización {job_id}: {e}")
+            with self._lock:
+                job["status"] = "failed"
+                job["error"] = str(e)
+        finally:
+            db.close()
+            with self._lock:
+                job["finished_at"] = datetime.datetime.utcnow()
+                job["duration_seconds"] = round(time.monotonic() - started, 3)
+                self._running_job_id = None
+
+
+# Instancia global
+sync_jobs = SyncJobManager()
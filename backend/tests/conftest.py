@@ -0,0 +1,87 @@
+# backend/tests/conftest.py
+"""
+Los tests usan SQLite en un directorio temporal, como el entorno local. Se configura
+antes de importar el backend, porque database.py crea el engine al importarse.
+Uso (desde backend/):  python -m pytest tests
+"""
+import datetime
+import os
+import sys
+import tempfile
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = tempfile.mkdtemp(prefix="trading-journal-tests-")
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(WORK_DIR, 'test.db')}")
+os.chdir(WORK_DIR) # uploads/ y secret.key fuera del repo
+os.makedirs("uploads", exist_ok=True)
+sys.path.insert(0, BACKEND_DIR)
+
+import database
+import models
+from response_cache import response_cache
+
+
+@pytest.fixture
+def db():
+    """Base de datos vacía para cada test"""
+    models.Base.metadata.drop_all(bind=database.engine)
+    models.Base.metadata.create_all(bind=database.engine)
+    response_cache.invalidate()
+    session = database.SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_account(db):
+    def _make(login_id: int, **fields) -> models.Account:
+        values = dict(
+            login_id=login_id, alias=f"Cuenta {login_id}", password="", server="Demo-Server",
+            prop_firm="FTMO", account_type="Phase 1", initial_balance=100000, balance=100000,
+            target_percent=8, trailing_drawdown=False, daily_drawdown_limit=5, max_drawdown_limit=10,
+            consistency_rule=0, active=True, start_date="2024-01-01",
+        )
+        values.update(fields)
+        account = models.Account(**values)
+        db.add(account)
+        db.commit()
+        return account
+    return _make
+
+
+@pytest.fixture
+def seed_trades(db):
+    """
+    Inserta count trades en bloque (sin pasar por los agregados) y devuelve sus ids.
+    Se reparten por turnos entre las cuentas, uno cada step desde start. Los campos
+    extra pueden ser un valor o una función del número de trade, ej: profit=lambda n: n * 10.0
+    """
+    def _seed(accounts, count: int, start=datetime.datetime(2024, 1, 1), step=datetime.timedelta(hours=1),
+              first_ticket: int = 0, **fields) -> list:
+        accounts = accounts if isinstance(accounts, (list, tuple)) else [accounts]
+        tickets = range(first_ticket, first_ticket + count)
+        rows = []
+        for n in tickets:
+            close_time = start + step * n
+            row = {
+                "account_id": accounts[n % len(accounts)].id, "ticket": n, "symbol": "EURUSD", "type": "BUY",
+                "open_time": close_time - datetime.timedelta(minutes=30), "close_time": close_time,
+                "profit": 10.0, "commission": 0.0, "swap": 0.0,
+            }
+            row.update({key: value(n) if callable(value) else value for key, value in fields.items()})
+            rows.append(row)
+        db.execute(models.Trade.__table__.insert(), rows)
+        db.commit()
+        return [trade_id for (trade_id,) in db.query(models.Trade.id)
+                .filter(models.Trade.ticket.in_(tickets)).order_by(models.Trade.ticket)]
+    return _seed
@@ -0,0 +1,95 @@
+# backend/tests/test_account_stats.py
+"""Los acumuladores que se suman al sincronizar deben coincidir con recalcularlos desde cero"""
+import random
+import account_stats
+import ingest
+import models
+
+
+def vps_trade(ticket, day, minute, profit):
+    return {
+        "ticket": ticket, "symbol": "EURUSD", "type": "BUY", "trade_date": f"2024-03-{day:02d}",
+        "entry_time": "09:00:00", "exit_time": f"10:{minute:02d}:00",
+        "profit": profit, "commission": -3.5, "swap": 0.0,
+    }
+
+
+def snapshot(db, account_id):
+    row = db.get(models.AccountStats, account_id)
+    return {field: getattr(row, field) for field in ("count", "wins", "losses", "runs", "last_sign", "peak_profit")}
+
+
+def test_incremental_stats_match_rebuild_with_equal_close_times(db, make_account):
+    account = make_account(1)
+    # Mismo close_time, tickets que llegan en distinto orden y en lotes separados
+    ingest.ingest_account_trades(db, account.id, [vps_trade(20, 4, 0, -50.0), vps_trade(10, 4, 0, 80.0)])
+    ingest.ingest_account_trades(db, account.id, [vps_trade(15, 4, 0, -20.0), vps_trade(30, 4, 5, 40.0)])
+    db.commit()
+    incremental = snapshot(db, account.id)
+
+    account_stats.rebuild(db, [account.id])
+    db.commit()
+    assert snapshot(db, account.id) == incremental
+
+
+def stored_runs(db, ids):
+    db.expire_all()
+    row = db.get(models.PortfolioRuns, account_stats._set_key(ids))
+    return row.runs if row is not None else None
+
+
+def test_portfolio_runs_merge_interleaved_syncs(db, make_account):
+    random.seed(7)
+    accounts = [make_account(login) for login in (1, 2, 3)]
+    ids = [acc.id for acc in accounts]
+    ticket = 0
+
+    for day in range(1, 15):
+        # Los trades de las cuentas se intercalan, y a veces llega uno de un día anterior
+        for acc in accounts:
+            batch = []
+            for _ in range(random.randint(1, 4)):
+                ticket += 1
+                trade_day = random.randint(1, day) if random.random() < 0.2 else day
+                batch.append(vps_trade(ticket, trade_day, random.randint(0, 59), round(random.gauss(0, 100), 2)))
+            ingest.ingest_account_trades(db, acc.id, batch)
+            db.commit()
+            if day > 1:
+                # Se suma la diferencia, sin borrar el conjunto ni recorrer todo
+                assert stored_runs(db, ids) == account_stats._count_portfolio_runs(db, ids)
+
+        # Paso del final del sync: el primer día crea el conjunto, después ya existe
+        account_stats.refresh_portfolios(db)
+        db.commit()
+        assert stored_runs(db, ids) == account_stats._count_portfolio_runs(db, ids)
+
+
+def test_reading_portfolio_runs_does_not_write(db, make_account):
+    accounts = [make_account(1), make_account(2)]
+    for index, acc in enumerate(accounts):
+        ingest.ingest_account_trades(db, acc.id, [vps_trade(index, 5, index, 10.0), vps_trade(10 + index, 5, 30 + index, -5.0)])
+        db.commit()
+
+    ids = [acc.id for acc in accounts]
+    assert account_stats.portfolio_stats(db, ids).runs == 2 # Intercalados: + + - -
+    assert db.query(models.PortfolioRuns).count() == 0
+
+
+def test_account_changes_refresh_the_active_set(db, client, make_account):
+    accounts = [make_account(login) for login in (1, 2, 3)]
+    for index, acc in enumerate(accounts):
+        ingest.ingest_account_trades(db, acc.id, [vps_trade(index, 5, index, 10.0 if index % 2 else -10.0)])
+        db.commit()
+    account_stats.refresh_portfolios(db)
+    db.commit()
+    ids = [acc.id for acc in accounts]
+    assert stored_runs(db, ids) == 3
+
+    client.patch(f"/accounts/{ids[1]}", json={"active": False})
+    assert stored_runs(db, [ids[0], ids[2]]) == 1
+    assert db.query(models.PortfolioRuns).count() == 1
+
+    client.patch(f"/accounts/{ids[1]}", json={"active": True})
+    client.delete(f"/accounts/{ids[0]}")
+    assert stored_runs(db, ids[1:]) == 2
+    assert db.query(models.PortfolioRuns).count() == 1
@@ -0,0 +1,30 @@
+# backend/tests/test_analytics.py
+"""Desglose por dimensiones: decodificación de GROUPING() de Postgres y subtotales en SQLite"""
+import analytics
+
+
+def test_grouping_id_decodes_to_its_set():
+    # GROUPING(a, b): a es el bit alto; un bit a 1 = dimensión agregada (fuera del conjunto)
+    assert analytics._sets_by_grouping_id(analytics._grouping_sets(2), 2) == {
+        0b00: (0, 1), # Cruce (a, b)
+        0b01: (0,),   # Subtotal de a (b agregada)
+        0b10: (1,),   # Subtotal de b (a agregada)
+        0b11: (),     # Total
+    }
+    assert analytics._sets_by_grouping_id(analytics._grouping_sets(1), 1) == {0: (0,), 1: ()}
+
+
+def test_breakdown_crosses_subtotals_and_total(db, make_account, seed_trades):
+    seed_trades(make_account(1), 6,
+                symbol=lambda n: "EURUSD" if n % 2 else "XAUUSD",
+                type=lambda n: "BUY" if n < 3 else "SELL",
+                profit=lambda n: 10.0 * n - 20.0)
+    result = analytics.breakdown(db, ["symbol", "type"], {})
+
+    assert result["total"]["trades"] == 6
+    assert result["total"]["profit"] == sum(10.0 * n - 20.0 for n in range(6))
+    assert [(g["keys"]["symbol"], g["keys"]["type"], g["trades"]) for g in result["groups"]] == [
+        ("EURUSD", "BUY", 1), ("EURUSD", "SELL", 2), ("XAUUSD", "BUY", 2), ("XAUUSD", "SELL", 1),
+    ]
+    assert [(g["keys"], g["trades"]) for g in result["subtotals"]["symbol"]] == [({"symbol": "EURUSD"}, 3), ({"symbol": "XAUUSD"}, 3)]
+    assert [(g["keys"], g["profit"]) for g in result["subtotals"]["type"]] == [({"type": "BUY"}, -30.0), ({"type": "SELL"}, 60.0)]
@@ -0,0 +1,38 @@
+# backend/tests/test_balance_snapshots.py
+"""Compactación del historial de balances"""
+import datetime
+from collections import Counter
+import balance_snapshots
+import models
+
+
+def test_compaction_leaves_one_row_per_period(db, make_account):
+    account = make_account(1)
+    start = datetime.datetime(2024, 3, 1, 0, 5)
+    balances = []
+    # Un snapshot cada 10 minutos durante 3 días
+    for n in range(3 * 24 * 6):
+        balance = 100000 + (n % 37) * 10 - (n % 11) * 25
+        balances.append(balance)
+        balance_snapshots.record(db, account.id, balance, now=start + datetime.timedelta(minutes=10 * n))
+    db.commit()
+
+    # Compactaciones sucesivas con cutoffs que caen a mitad de hora y de día
+    now = datetime.datetime(2024, 3, 3, 0, 0)
+    for step in range(12):
+        balance_snapshots.compact(db, now=now + datetime.timedelta(minutes=97 * step))
+        db.commit()
+
+    periods = Counter()
+    for row in db.query(models.BalanceSnapshot).filter(models.BalanceSnapshot.resolution != "raw"):
+        bucket = balance_snapshots._bucket(row.ts, row.resolution)
+        periods[(row.resolution, bucket)] += 1
+    assert periods and max(periods.values()) == 1
+    # Un periodo "hour" no puede estar también compactado como "day"
+    days = {bucket for resolution, bucket in periods if resolution == "day"}
+    assert not any(resolution == "hour" and bucket.replace(hour=0) in days for resolution, bucket in periods)
+
+    # El máximo y el mínimo sobreviven a la compactación
+    rows = db.query(models.BalanceSnapshot).all()
+    assert max(r.balance_high for r in rows) == max(balances)
+    assert min(r.balance_low for r in rows) == min(balances)
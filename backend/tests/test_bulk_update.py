@@ -0,0 +1,27 @@
+# backend/tests/test_bulk_update.py
+"""PATCH /trades/bulk: etiquetas inexistentes devuelven 404 sin tocar los trades"""
+import pytest
+import models
+
+
+@pytest.mark.parametrize("field, detail", [
+    ("emotion_id", "Emoción no encontrada"),
+    ("mistake_id", "Error no encontrado"),
+    ("strategy_id", "Estrategia no encontrada"),
+    ("trade_idea_id", "Trade Idea no encontrada"),
+])
+def test_unknown_label_is_404(db, client, make_account, seed_trades, field, detail):
+    trade_ids = seed_trades(make_account(1), 3)
+    response = client.patch("/trades/bulk", json={"trade_ids": trade_ids, field: 999999})
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == detail
+    db.expire_all()
+    assert db.query(models.Trade).filter(getattr(models.Trade, field).isnot(None)).count() == 0
+
+
+def test_existing_label_and_null_are_applied(db, client, make_account, seed_trades):
+    trade_ids = seed_trades(make_account(1), 3)
+    assert client.patch("/trades/bulk", json={"trade_ids": trade_ids, "emotion_id": 1}).json() == {"updated": 3}
+    # null explícito quita la etiqueta sin validar nada
+    assert client.patch("/trades/bulk", json={"trade_ids": trade_ids, "emotion_id": None}).json() == {"updated": 3}
@@ -0,0 +1,59 @@
+# backend/tests/test_daily_drawdown.py
+"""Día del broker (con horario de verano) y balance de inicio del día al cruzar la medianoche del servidor"""
+import datetime
+from zoneinfo import ZoneInfo
+import pytest
+import daily_drawdown
+import ingest
+import models
+from tests.test_account_stats import vps_trade
+
+UTC = datetime.datetime
+
+
+@pytest.fixture
+def athens(monkeypatch):
+    # Servidor típico de MT5: UTC+2 en invierno, UTC+3 en verano
+    monkeypatch.setattr(daily_drawdown, "BROKER_TZ", ZoneInfo("Europe/Athens"))
+
+
+def test_broker_day_follows_daylight_saving(athens):
+    assert daily_drawdown.broker_day(UTC(2024, 1, 15, 21, 59)) == datetime.date(2024, 1, 15)
+    assert daily_drawdown.broker_day(UTC(2024, 1, 15, 22, 0)) == datetime.date(2024, 1, 16)
+    # En verano la medianoche del servidor es una hora antes en UTC
+    assert daily_drawdown.broker_day(UTC(2024, 7, 1, 20, 59)) == datetime.date(2024, 7, 1)
+    assert daily_drawdown.broker_day(UTC(2024, 7, 1, 21, 0)) == datetime.date(2024, 7, 2)
+
+
+def test_fixed_offset_without_timezone(monkeypatch):
+    monkeypatch.setattr(daily_drawdown, "BROKER_TZ", datetime.timezone(datetime.timedelta(hours=2)))
+    assert daily_drawdown.broker_day(UTC(2024, 7, 1, 21, 30)) == datetime.date(2024, 7, 1)
+    assert daily_drawdown.broker_day(UTC(2024, 7, 1, 22, 0)) == datetime.date(2024, 7, 2)
+
+
+def test_day_start_resets_at_the_broker_rollover(db, make_account, athens):
+    account = make_account(1, balance=100000)
+    # 3 de marzo (hora del servidor): +250 y -100 cerrados en el día
+    ingest.ingest_account_trades(db, account.id, [vps_trade(1, 3, 0, 250.0), vps_trade(2, 3, 5, -100.0)])
+    account.balance = 100000 + 250 - 100 - 2 * 3.5
+    state = daily_drawdown.update_day_start(db, account, UTC(2024, 3, 3, 20, 0)) # 22:00 del servidor
+    db.commit()
+    assert state.day == datetime.date(2024, 3, 3)
+    assert state.start_balance == 100000
+
+    # Siguiente sync ya el 4 de marzo en el servidor (10:30), después de una pérdida a las 10:00:
+    # el inicio del día es el balance de cierre del 3
+    ingest.ingest_account_trades(db, account.id, [vps_trade(3, 4, 0, -300.0)])
+    account.balance -= 300 + 3.5
+    state = daily_drawdown.update_day_start(db, account, UTC(2024, 3, 4, 8, 30))
+    db.commit()
+    assert state.day == datetime.date(2024, 3, 4)
+    assert state.start_balance == 100000 + 250 - 100 - 7
+
+    # Más tarde el mismo día del broker: el inicio no se mueve aunque cambie el balance
+    account.balance -= 500
+    daily_drawdown.update_day_start(db, account, UTC(2024, 3, 4, 12, 0))
+    db.commit()
+    assert daily_drawdown.load_day_starts(db, [account.id], datetime.date(2024, 3, 4)) == {account.id: 100143.0}
+    assert daily_drawdown.load_day_starts(db, [account.id], datetime.date(2024, 3, 3)) == {}
+    assert db.get(models.AccountDayStart, account.id).updated_at == UTC(2024, 3, 4, 12, 0)
@@ -0,0 +1,46 @@
+# backend/tests/test_export.py
+"""Exportación en streaming: el Parquet que se envía se puede leer con pyarrow"""
+import io
+import pyarrow.parquet as pq
+import daily_pnl
+import export
+import main
+import models
+import trade_queries
+
+
+def test_parquet_endpoint_reads_back(db, client, make_account, seed_trades):
+    seed_trades(make_account(1), 250, profit=float, commission=-3.5)
+    response = client.get("/export/trades", params={"format": "parquet"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == export.MEDIA_TYPES["parquet"]
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.column_names == [key for key, _ in trade_queries.SUMMARY_COLUMNS]
+    assert table.num_rows == 250
+    assert table.column("profit").to_pylist() == [float(n) for n in range(250)]
+
+
+def test_parquet_stream_one_row_group_per_batch(db, make_account, seed_trades):
+    seed_trades(make_account(1), 250, profit=float, commission=-3.5)
+
+    def make_query(session):
+        return trade_queries.summary_query(session).order_by(models.Trade.close_time, models.Trade.id)
+
+    chunks = list(export.stream_parquet(make_query, trade_queries.SUMMARY_COLUMNS, batch_size=100))
+    parquet = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+
+    assert parquet.metadata.num_row_groups == 3
+    assert parquet.metadata.num_rows == 250
+    assert parquet.read().column("ticket").to_pylist() == list(range(250))
+
+
+def test_daily_pnl_parquet_reads_back(db, client, make_account, seed_trades):
+    seed_trades(make_account(1), 250, profit=float, commission=-3.5)
+    daily_pnl.rebuild(db)
+    db.commit()
+
+    response = client.get("/export/daily-pnl", params={"format": "parquet"})
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.column_names == [key for key, _ in main.DAILY_PNL_EXPORT_COLUMNS]
+    assert sum(table.column("trade_count").to_pylist()) == 250
@@ -0,0 +1,73 @@
+# backend/tests/test_indexes.py
+"""Las consultas por rango de fechas usan los índices compuestos (EXPLAIN QUERY PLAN de SQLite)"""
+import datetime
+from contextlib import contextmanager
+from sqlalchemy import event
+import database
+import models
+
+
+@contextmanager
+def captured_selects():
+    """Guarda los SELECT que ejecuta la app (sentencia y parámetros) para explicarlos después"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(database.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(database.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def query_plan(db, statement, parameters) -> str:
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return " | ".join(row[-1] for row in rows)
+
+
+def plans_for(db, statements, table):
+    return [query_plan(db, sql, params) for sql, params in statements if f"FROM {table}" in sql]
+
+
+def seed(db, make_account, seed_trades):
+    accounts = [make_account(1), make_account(2)]
+    seed_trades(accounts, 400, step=datetime.timedelta(hours=7))
+    db.execute(models.DailyPnL.__table__.insert(), [
+        {"account_id": acc.id, "day": datetime.date(2024, 1, 1) + datetime.timedelta(days=d), "profit": 5.0, "trade_count": 1}
+        for acc in accounts for d in range(300)
+    ])
+    db.commit()
+    return accounts
+
+
+def test_account_trade_listing_uses_account_close_time_index(db, client, make_account, seed_trades):
+    accounts = seed(db, make_account, seed_trades)
+    with captured_selects() as statements:
+        response = client.get("/trades/", params={"account_id": accounts[0].id, "from": "2024-02-01", "to": "2024-02-29"})
+    assert response.status_code == 200
+
+    plans = plans_for(db, statements, "trades")
+    assert any("USING INDEX ix_trades_account_close_time" in plan for plan in plans), plans
+
+
+def test_calendar_range_uses_daily_pnl_day_index(db, client, make_account, seed_trades):
+    seed(db, make_account, seed_trades)
+    with captured_selects() as statements:
+        response = client.get("/calendar-stats/range", params={"from": "2024-03-01", "to": "2024-05-31"})
+    assert response.status_code == 200
+
+    plans = plans_for(db, statements, "daily_pnl")
+    assert plans and all("ix_daily_pnl_day" in plan for plan in plans), plans
+
+
+def test_monthly_calendar_uses_daily_pnl_day_index(db, client, make_account, seed_trades):
+    seed(db, make_account, seed_trades)
+    with captured_selects() as statements:
+        response = client.get("/calendar-stats", params={"year": 2024, "month": 4})
+    assert response.status_code == 200
+
+    plans = plans_for(db, statements, "daily_pnl")
+    assert plans and all("ix_daily_pnl_day" in plan for plan in plans), plans
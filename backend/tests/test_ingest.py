@@ -0,0 +1,27 @@
+# backend/tests/test_ingest.py
+"""TradeIngestor: lotes de tamaño fijo, último lote parcial y trade más reciente"""
+import ingest
+import models
+from tests.test_account_stats import vps_trade
+
+
+def test_batches_and_newest(db, make_account):
+    account = make_account(1)
+    ingestor = ingest.TradeIngestor(db, account.id, batch_size=3)
+    trades = [vps_trade(n, 4, n, 10.0) for n in range(7)]
+    trades.insert(2, trades.pop()) # El más reciente llega tercero
+    trades.insert(4, dict(trades[0])) # Repetido dentro del stream
+    trades.insert(5, {"ticket": 99}) # Sin fechas
+
+    for t in trades:
+        ingestor.add(t)
+    # Dos lotes completos (uno con el repetido) y quedan dos pendientes
+    assert (ingestor.inserted, ingestor.skipped, len(ingestor.pending)) == (5, 1, 2)
+    assert ingestor.newest.ticket == 6
+
+    assert ingestor.finish() == {"received": 9, "inserted": 7, "skipped": 1, "invalid": 1}
+    assert ingestor.pending == []
+    assert (ingestor.oldest.ticket, ingestor.newest.ticket) == (0, 6)
+    assert ingestor.new_tickets == set(range(7))
+    assert db.query(models.Trade).count() == 7
+    assert db.get(models.AccountStats, account.id).count == 7
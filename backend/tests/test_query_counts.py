@@ -0,0 +1,81 @@
+# backend/tests/test_query_counts.py
+"""
+/trades/ y /dashboard-stats no deben hacer una consulta por trade (N+1): el número de
+consultas con 100 trades y con 1000 trades tiene que ser el mismo.
+"""
+import random
+from sqlalchemy import event
+import account_stats
+import daily_pnl
+import database
+import models
+from response_cache import response_cache
+
+
+def seed_catalog(db, make_account):
+    accounts = [make_account(1), make_account(2)]
+    strategy = models.Strategy(name="Breakout")
+    db.add(strategy)
+    db.flush()
+    item = models.StrategyItem(strategy_id=strategy.id, condition="Rompe el máximo", weight_percent=100)
+    db.add(item)
+    db.flush()
+
+    ideas = []
+    for _ in range(20):
+        idea = models.TradeIdea(asset="EURUSD", strategy_id=strategy.id, status="EXECUTED")
+        idea.checklist = [models.TradeIdeaItem(strategy_item_id=item.id, is_active=True, direction="BUY")]
+        idea.evidences = [models.TimeframeEvidence(timeframe="1H", note="Nota", image_url="/uploads/x.png")]
+        ideas.append(idea)
+    db.add_all(ideas)
+    db.commit()
+    return accounts, strategy, ideas
+
+
+def add_trades(db, seed_trades, accounts, strategy, ideas, first_ticket, count):
+    random.seed(first_ticket)
+    emotions = [e.id for e in db.query(models.Emotion)]
+    mistakes = [m.id for m in db.query(models.Mistake)]
+    seed_trades(
+        accounts, count, first_ticket=first_ticket,
+        profit=lambda n: round(random.gauss(5, 50), 2), commission=-3.5,
+        emotion_id=lambda n: random.choice(emotions), mistake_id=lambda n: random.choice(mistakes),
+        strategy_id=strategy.id, trade_idea_id=lambda n: random.choice(ideas).id,
+    )
+    daily_pnl.rebuild(db)
+    account_stats.rebuild(db)
+    db.commit()
+
+
+def count_queries(client, url, params) -> int:
+    # Primera llamada: calienta lo que se guarda una vez (ej: rachas del portafolio)
+    client.get(url, params=params)
+    response_cache.invalidate()
+
+    statements = []
+
+    def before_cursor_execute(*args):
+        statements.append(args[2])
+
+    event.listen(database.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(url, params=params)
+    finally:
+        event.remove(database.engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_query_count_does_not_grow_with_trades(db, client, make_account, seed_trades):
+    accounts, strategy, ideas = seed_catalog(db, make_account)
+    endpoints = [("/trades/", {"limit": 1000}), ("/dashboard-stats", {})]
+
+    add_trades(db, seed_trades, accounts, strategy, ideas, 0, 100)
+    with_100 = [count_queries(client, url, params) for url, params in endpoints]
+
+    add_trades(db, seed_trades, accounts, strategy, ideas, 100, 900)
+    with_1000 = [count_queries(client, url, params) for url, params in endpoints]
+
+    assert with_1000 == with_100
+    # Listado: trades + selectin de ideas, checklist y evidencias (+ conteo/cursor)
+    assert with_1000[0] <= 6
@@ -0,0 +1,94 @@
+# backend/tests/test_response_cache.py
+"""Caché de respuestas: 304 con ETag, invalidación por cuenta (y las globales) y descarte LRU"""
+from fastapi import Request
+from response_cache import ResponseCache, response_cache
+from tests import test_sync_engine
+
+# La VPS de prueba de test_sync_engine (servidor HTTP local)
+stub_vps = test_sync_engine.stub_vps
+
+MARCH = {"year": 2024, "month": 3}
+
+
+def calendar_params(account_id=None):
+    return dict(MARCH, account_id=account_id) if account_id else MARCH
+
+
+def calendar_key(account_id=None):
+    return ("calendar-stats",) + tuple(sorted(dict(MARCH, account_id=account_id).items()))
+
+
+def fake_request(headers=None) -> Request:
+    raw = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_matching_etag_returns_304(db, client, make_account):
+    make_account(1)
+    first = client.get("/calendar-stats", params=MARCH)
+    assert first.status_code == 200
+
+    again = client.get("/calendar-stats", params=MARCH, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+
+    stale = client.get("/calendar-stats", params=MARCH, headers={"If-None-Match": '"otro"'})
+    assert stale.status_code == 200 and stale.content == first.content
+
+
+def test_sync_invalidates_the_account_and_global_entries(db, client, make_account, stub_vps):
+    synced, other = make_account(1001), make_account(1002, active=False)
+    responses = {
+        account_id: client.get("/calendar-stats", params=calendar_params(account_id))
+        for account_id in (synced.id, other.id, None)
+    }
+    for account_id in (synced.id, other.id, None):
+        assert response_cache.get(calendar_key(account_id)) is not None
+
+    test_sync_engine.sync(db, stub_vps, [synced], max_concurrency=1)
+
+    assert response_cache.get(calendar_key(synced.id)) is None
+    assert response_cache.get(calendar_key(None)) is None # La global incluye la cuenta
+    assert response_cache.get(calendar_key(other.id)) is not None
+    # Y la siguiente petición ya trae los trades del sync
+    fresh = client.get("/calendar-stats", params=calendar_params(synced.id))
+    assert fresh.headers["ETag"] != responses[synced.id].headers["ETag"]
+    assert fresh.json()["total_trades"] == 2
+
+
+def test_response_built_during_an_invalidation_is_not_cached():
+    cache = ResponseCache()
+
+    def build():
+        cache.invalidate([1]) # Un sync termina mientras se calcula la respuesta
+        return '{"stale": true}'
+
+    response = cache.respond(fake_request(), "dashboard", {}, None, build)
+    assert response.status_code == 200
+    assert cache.get(("dashboard",)) is None
+
+    response = cache.respond(fake_request(), "dashboard", {}, None, lambda: '{"stale": false}')
+    assert cache.get(("dashboard",)) == (response.body, response.headers["ETag"])
+
+
+def test_invalidate_keeps_other_accounts_and_clears_all_without_ids():
+    cache = ResponseCache()
+    for key, account_id in ((("a",), 1), (("b",), 2), (("global",), None)):
+        cache.set(key, account_id, b"{}", cache._generation)
+
+    cache.invalidate([1])
+    assert [cache.get(key) is not None for key in (("a",), ("b",), ("global",))] == [False, True, False]
+    cache.invalidate()
+    assert cache.get(("b",)) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.set(("a",), 1, b"a", 0)
+    cache.set(("b",), 1, b"b", 0)
+    assert cache.get(("a",)) is not None # "a" pasa a ser la más reciente
+
+    cache.set(("c",), 1, b"c", 0)
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) is not None and cache.get(("c",)) is not None
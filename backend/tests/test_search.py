@@ -0,0 +1,100 @@
+# backend/tests/test_search.py
+"""GET /search: el fragmento es HTML seguro (el texto del usuario va escapado) y la búsqueda sin índices"""
+import datetime
+import html
+import logging
+import os
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+import models
+import search
+
+PAYLOAD = "entrada <img src=x onerror=\"alert('xss')\"> & salida"
+
+
+def test_trade_snippet_is_escaped(db, client, make_account):
+    account = make_account(1)
+    db.add(models.Trade(account_id=account.id, ticket=1, symbol="EURUSD", type="BUY",
+                        close_time=datetime.datetime(2024, 1, 1), profit=1.0, notes=PAYLOAD))
+    db.commit()
+
+    [hit] = client.get("/search", params={"q": "entrada"}).json()["results"]
+    assert "<img" not in hit["snippet"]
+    assert html.unescape(hit["snippet"]) == PAYLOAD
+
+
+def test_idea_snippet_is_escaped(db, client):
+    idea = models.TradeIdea(asset="XAUUSD")
+    idea.evidences.append(models.TimeframeEvidence(timeframe="1H", note=PAYLOAD))
+    db.add(idea)
+    db.commit()
+
+    [hit] = client.get("/search", params={"q": "salida", "kind": "ideas"}).json()["results"]
+    assert "<img" not in hit["snippet"]
+    assert html.unescape(hit["snippet"]) == PAYLOAD
+
+
+def test_failed_setup_is_logged_and_falls_back_to_like(monkeypatch, caplog):
+    class BrokenEngine:
+        dialect = type("Dialect", (), {"name": "postgresql"})()
+
+        def begin(self):
+            raise RuntimeError("permission denied to create extension pg_trgm")
+
+    monkeypatch.setattr(search, "_fulltext_ready", True)
+    with caplog.at_level(logging.ERROR, logger="search"):
+        assert search.setup(BrokenEngine()) is False
+    assert "pg_trgm" in caplog.text
+
+    # Postgres sin índices: LIKE (con string_agg en las ideas), no la consulta que fallaría
+    assert search._query_for("postgresql", "trades") == (search.TRADES_LIKE, False)
+    assert search._query_for("postgresql", "ideas") == (search.IDEAS_LIKE_PG, False)
+    monkeypatch.setattr(search, "_fulltext_ready", True)
+    assert search._query_for("postgresql", "trades") == (search.TRADES_PG, True)
+    assert search._query_for("sqlite", "ideas") == (search.IDEAS_LIKE, False)
+
+
+# --- Postgres (ts_headline, ranking y cursor): solo con TEST_POSTGRES_URL, ej: la BD de docker-compose ---
+
+@pytest.fixture
+def pg(monkeypatch):
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL no configurada")
+    engine = create_engine(url)
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(search, "_fulltext_ready", False)
+    assert search.setup(engine)
+    session = Session(bind=engine)
+    yield session
+    session.close()
+    models.Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+def test_postgres_ranking_snippet_and_cursor(pg):
+    account = models.Account(login_id=1, alias="Cuenta 1", active=True)
+    pg.add(account)
+    pg.flush()
+    notes = ["breakout en londres", "breakout breakout breakout", PAYLOAD + " breakout", "sin relación"]
+    pg.add_all([
+        models.Trade(account_id=account.id, ticket=n, symbol="EURUSD", type="BUY",
+                     close_time=datetime.datetime(2024, 1, 1 + n), profit=1.0, notes=note)
+        for n, note in enumerate(notes)
+    ])
+    pg.commit()
+
+    first = search.search(pg, "breakout", limit=2)
+    second = search.search(pg, "breakout", limit=2, cursor=first["next_cursor"])
+    hits = first["results"] + second["results"]
+
+    assert second["next_cursor"] is None
+    assert len({hit["id"] for hit in hits}) == 3 # Sin repetidos ni saltos entre páginas
+    ranks = [hit["rank"] for hit in hits]
+    assert ranks == sorted(ranks, reverse=True)
+    assert hits[0]["snippet"].count("<mark>") == 3 # El que más veces lo menciona, primero
+    payload_id = pg.query(models.Trade.id).filter(models.Trade.ticket == 2).scalar()
+    escaped = next(hit["snippet"] for hit in hits if hit["id"] == payload_id)
+    assert "<img" not in escaped and "<mark>breakout</mark>" in escaped
@@ -0,0 +1,34 @@
+# backend/tests/test_simulation.py
+"""GET /accounts/{id}/simulate: historial mínimo y resultados repetibles con semilla"""
+import datetime
+from simulation import MIN_HISTORY_DAYS
+
+
+def seed(make_account, seed_trades, days):
+    # Un trade por día operado
+    account = make_account(1)
+    seed_trades(account, days, start=datetime.datetime(2024, 1, 1, 10), step=datetime.timedelta(days=1),
+                profit=lambda n: 400.0 if n % 3 else -250.0, commission=-3.5)
+    return account
+
+
+def test_short_history_is_400(db, client, make_account, seed_trades):
+    account = seed(make_account, seed_trades, MIN_HISTORY_DAYS - 1)
+    response = client.get(f"/accounts/{account.id}/simulate")
+
+    assert response.status_code == 400
+    assert f"mínimo {MIN_HISTORY_DAYS} días operados" in response.json()["detail"]
+
+
+def test_unknown_account_is_404(db, client):
+    assert client.get("/accounts/999/simulate").status_code == 404
+
+
+def test_same_seed_same_result(db, client, make_account, seed_trades):
+    account = seed(make_account, seed_trades, 30)
+    params = {"paths": 2000, "days": 40, "seed": 3}
+    first = client.get(f"/accounts/{account.id}/simulate", params=params).json()
+
+    assert first == client.get(f"/accounts/{account.id}/simulate", params=params).json()
+    assert first["history_days"] == 30
+    assert abs(first["pass_probability"] + first["fail_probability"] + first["open_probability"] - 100) < 0.05
@@ -0,0 +1,170 @@
+# backend/tests/test_statement_import.py
+"""Importación de reportes de MT5: lectura HTML/CSV, emparejado FIFO de deals y carga sin repetidos"""
+import codecs
+import datetime
+import io
+import models
+import statement_import
+
+DEALS_HEADER = ["Time", "Deal", "Symbol", "Type", "Direction", "Volume", "Price", "Order",
+                "Commission", "Fee", "Swap", "Profit", "Balance", "Comment"]
+
+# Una compra de 1 lote cerrada en dos partes, y una venta de oro
+DEALS = [
+    ["2024.03.01 09:00:00", "100", "", "balance", "", "", "", "", "0", "0", "0", "100 000.00", "100 000.00", "Deposit"],
+    ["2024.03.04 10:00:00", "101", "EURUSD", "buy", "in", "1.00", "1.0850", "201", "-7.00", "0", "0", "0", "100 000.00", ""],
+    ["2024.03.04 11:00:00", "102", "EURUSD", "sell", "out", "0.40", "1.0870", "202", "-2.80", "0", "0", "80.00", "100 077.20", ""],
+    ["2024.03.04 12:00:00", "103", "XAUUSD", "sell", "in", "0.50", "2100.00", "203", "-3.00", "0", "0", "0", "100 077.20", ""],
+    ["2024.03.04 13:00:00", "104", "EURUSD", "sell", "out", "0.60", "1.0860", "204", "-4.20", "0", "-1.50", "60.00", "100 131.50", "tp"],
+    ["2024.03.04 14:00:00", "105", "XAUUSD", "buy", "out", "0.50", "2090.00", "205", "-3.00", "0", "0", "500.00", "100 628.50", ""],
+]
+
+
+def html_report(rows, header=DEALS_HEADER) -> bytes:
+    def tr(cells, tag="td"):
+        return "<tr>" + "".join(f"<{tag}>{cell}</{tag}>" for cell in cells) + "</tr>\n"
+    html = (
+        "<html><body><table>\n"
+        + tr(["Trade History Report"], "th")
+        + tr(["Deals"], "th")
+        + tr(header)
+        + "".join(tr(row) for row in rows)
+        + tr(["", "", "", "", "", "", "", "", "-20.00", "0", "-1.50", "640.00", "100 628.50", ""]) # Totales
+        + tr(["Open Positions"], "th")
+        + tr(["2024.03.05 09:00:00", "106", "EURUSD", "buy", "in", "1.00"])
+        + "</table></body></html>\n"
+    )
+    return codecs.BOM_UTF16_LE + html.encode("utf-16-le") # Así lo guarda MT5
+
+
+def csv_report(rows, header=DEALS_HEADER, delimiter=";") -> bytes:
+    return "\n".join(delimiter.join(cells) for cells in [header] + rows).encode("utf-8-sig")
+
+
+def import_report(db, account_id, data, filename):
+    return statement_import.import_statement(db, account_id, io.BytesIO(data), filename)
+
+
+def trades_by_ticket(db, account_id):
+    return {t.ticket: t for t in db.query(models.Trade).filter(models.Trade.account_id == account_id)}
+
+
+def test_utf16_html_with_partial_closes(db, make_account):
+    account = make_account(1)
+    result = import_report(db, account.id, html_report(DEALS), "ReportHistory.html")
+    db.commit()
+
+    assert result == {"format": "html", "received": 3, "inserted": 3, "skipped": 0, "invalid": 0}
+    trades = trades_by_ticket(db, account.id)
+    assert sorted(trades) == [102, 104, 105]
+
+    # Cierre parcial: cada salida se lleva su parte de la comisión de entrada
+    first, second, gold = trades[102], trades[104], trades[105]
+    assert (first.type, first.open_time, first.position_id) == ("BUY", datetime.datetime(2024, 3, 4, 10), 201)
+    assert first.commission == -2.8 - 7.0 * 0.4
+    assert (second.open_time, second.position_id, second.swap, second.comment) == (datetime.datetime(2024, 3, 4, 10), 201, -1.5, "tp")
+    assert second.commission == -4.2 - 7.0 * 0.6
+    assert (gold.type, gold.open_time, gold.profit, gold.commission) == ("SELL", datetime.datetime(2024, 3, 4, 12), 500.0, -6.0)
+    assert db.get(models.AccountStats, account.id).count == 3
+
+
+def test_csv_delimiter_is_detected(db, make_account):
+    account = make_account(1)
+    for delimiter in (";", "\t", ","):
+        result = import_report(db, account.id, csv_report(DEALS, delimiter=delimiter), "report.csv")
+        assert result["format"] == "csv"
+        assert result["received"] == 3
+    assert len(trades_by_ticket(db, account.id)) == 3
+
+
+def test_position_column_is_used_when_present(db, make_account):
+    account = make_account(1)
+    header = DEALS_HEADER[:8] + ["Position"] + DEALS_HEADER[8:]
+    # Dos posiciones abiertas del mismo símbolo: la salida cierra la suya, no la primera en la cola
+    rows = [
+        ["2024.03.04 10:00:00", "101", "EURUSD", "buy", "in", "1.00", "1.0850", "201", "5001", "0", "0", "0", "0", "0", ""],
+        ["2024.03.04 10:30:00", "102", "EURUSD", "buy", "in", "1.00", "1.0860", "202", "5002", "0", "0", "0", "0", "0", ""],
+        ["2024.03.04 11:00:00", "103", "EURUSD", "sell", "out", "1.00", "1.0870", "203", "5002", "0", "0", "0", "10.00", "0", ""],
+    ]
+    import_report(db, account.id, csv_report(rows, header=header), "report.csv")
+
+    trade = trades_by_ticket(db, account.id)[103]
+    assert (trade.position_id, trade.open_time) == (5002, datetime.datetime(2024, 3, 4, 10, 30))
+
+
+def test_reimport_skips_existing_trades(db, make_account):
+    account = make_account(1)
+    import_report(db, account.id, html_report(DEALS[:3]), "first.html")
+    db.commit()
+
+    result = import_report(db, account.id, html_report(DEALS), "full.html")
+    db.commit()
+    assert result == {"format": "html", "received": 3, "inserted": 2, "skipped": 1, "invalid": 0}
+    assert sorted(trades_by_ticket(db, account.id)) == [102, 104, 105]
+    assert db.get(models.AccountStats, account.id).count == 3
+
+
+def test_import_advances_the_sync_watermark(db, make_account):
+    account = make_account(1)
+    state = models.AccountSyncState(account_id=account.id, last_close_time=datetime.datetime(2024, 3, 4, 11), last_ticket=102)
+    db.add(state)
+    db.commit()
+
+    import_report(db, account.id, html_report(DEALS), "report.html")
+    db.commit()
+    assert (state.last_close_time, state.last_ticket) == (datetime.datetime(2024, 3, 4, 14), 105)
+
+    # Un reporte más viejo que lo sincronizado no la hace retroceder
+    state.last_close_time, state.last_ticket = datetime.datetime(2024, 4, 1), 999
+    db.commit()
+    import_report(db, account.id, html_report(DEALS), "report.html")
+    assert (state.last_close_time, state.last_ticket) == (datetime.datetime(2024, 4, 1), 999)
+
+
+class RecordingCursor:
+    """Cursor de psycopg2 que guarda el SQL y lo que llega por COPY"""
+
+    def __init__(self):
+        self.statements = []
+        self.copied = ""
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+        if sql.startswith("INSERT"):
+            self.rowcount = 2
+
+    def copy_expert(self, sql, buffer):
+        self.statements.append((sql, None))
+        self.copied += buffer.read()
+
+    def close(self):
+        pass
+
+
+def test_copy_stages_rows_and_merges_with_on_conflict():
+    cursor = RecordingCursor()
+
+    class FakeSession:
+        def connection(self):
+            return type("Connection", (), {"connection": type("DBAPI", (), {"cursor": lambda self: cursor})()})()
+
+    trades = [
+        {"ticket": 102, "position_id": 201, "symbol": "EURUSD", "type": "BUY", "open_time": datetime.datetime(2024, 3, 4, 10),
+         "close_time": datetime.datetime(2024, 3, 4, 11), "profit": 80.0, "commission": -5.6, "swap": 0.0, "comment": None},
+        {"ticket": 105, "position_id": None, "symbol": "XAUUSD", "type": "SELL", "open_time": None,
+         "close_time": datetime.datetime(2024, 3, 4, 14), "profit": 500.0, "commission": -6.0, "swap": 0.0, "comment": "a,b"},
+    ]
+    inserted = statement_import._load_with_copy(FakeSession(), 7, iter(trades), batch_size=1)
+
+    assert inserted == 2
+    copies = [sql for sql, _ in cursor.statements if sql.startswith("COPY")]
+    assert len(copies) == 2 # Un COPY por lote
+    # Los None van como campo vacío sin comillas (NULL en el COPY); las comas van entre comillas
+    assert cursor.copied.splitlines() == [
+        "102,201,EURUSD,BUY,2024-03-04 10:00:00,2024-03-04 11:00:00,80.0,-5.6,0.0,",
+        '105,,XAUUSD,SELL,,2024-03-04 14:00:00,500.0,-6.0,0.0,"a,b"',
+    ]
+    merge_sql, params = cursor.statements[-1]
+    assert "ON CONFLICT ON CONSTRAINT unique_trade_per_account DO NOTHING" in merge_sql
+    assert params == (7,)
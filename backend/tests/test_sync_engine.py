@@ -0,0 +1,233 @@
+# backend/tests/test_sync_engine.py
+"""SyncEngine contra una VPS de prueba local (servidor HTTP en un hilo)"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import datetime
+import gzip
+import json
+import threading
+import time
+import pytest
+import database
+import models
+import vps_client
+from sync_engine import SyncEngine
+
+SLOW_LOGIN = 9001 # Nunca responde a tiempo
+FLAKY_LOGIN = 9002 # Responde 503 la primera vez
+TRICKLE_LOGIN = 9003 # NDJSON que llega a goteo: nunca termina dentro del plazo
+NDJSON_LOGIN = 9004 # NDJSON de varios lotes, con líneas rotas y un repetido
+NDJSON_TRADES = 2500 # Dos lotes completos de INGEST_BATCH_SIZE (1000) y uno parcial
+NDJSON_START = datetime.datetime(2024, 3, 4, 10, 0)
+REQUEST_SECONDS = 0.3 # Lo que tarda la VPS en responder una cuenta normal
+
+
+def vps_trade(ticket, minute=0):
+    return {
+        "ticket": ticket, "symbol": "EURUSD", "type": "BUY",
+        "trade_date": "2024-03-04", "entry_time": "10:00:00", "exit_time": f"11:{minute:02d}:00",
+        "profit": 250.0, "commission": -3.5, "swap": 0.0,
+    }
+
+
+def ndjson_lines(login):
+    """Trades cada minuto; el más reciente llega en medio del stream, los datos de la cuenta al final"""
+    trades = []
+    for n in range(NDJSON_TRADES):
+        close_time = NDJSON_START + datetime.timedelta(minutes=n)
+        trades.append({
+            "ticket": login * 10000 + n, "symbol": "EURUSD", "type": "BUY",
+            "trade_date": close_time.strftime("%Y-%m-%d"), "entry_time": "00:00:00",
+            "exit_time": close_time.strftime("%H:%M:%S"), "profit": 10.0, "commission": -1.0, "swap": 0.0,
+        })
+    trades.insert(1200, trades.pop()) # El más reciente en medio
+    lines = [json.dumps(t) for t in trades]
+    lines.insert(10, json.dumps(trades[5])) # Repetido (lo descarta el ON CONFLICT)
+    lines.insert(500, '{"ticket": 1, "symbol": "EURU') # Línea cortada
+    lines.insert(1500, json.dumps({"ticket": 2, "symbol": "EURUSD"})) # Trade sin fechas
+    lines.append(json.dumps({"account": login, "status": "success", "balance": 124500.0, "equity": 124480.0}))
+    return lines
+
+
+class StubVPS:
+    """Imita el endpoint de sincronización de la VPS (JSON clásico o NDJSON, una cuenta por petición)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = {}
+        self.encodings = {} # Content-Encoding de la petición, por login
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers["Content-Length"]))
+                encoding = self.headers.get("Content-Encoding")
+                body = json.loads(gzip.decompress(raw) if encoding == "gzip" else raw)
+                login = body["accounts"][0]["login"]
+                stub.encodings[login] = encoding
+                with stub.lock:
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    stub.calls[login] = stub.calls.get(login, 0) + 1
+                    attempt = stub.calls[login]
+                try:
+                    if login == SLOW_LOGIN:
+                        time.sleep(2)
+                        return
+                    if login == FLAKY_LOGIN and attempt == 1:
+                        self._send(503, {"detail": "VPS ocupada"})
+                        return
+                    if login == NDJSON_LOGIN:
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/x-ndjson")
+                        self.end_headers()
+                        self.wfile.write("\n".join(ndjson_lines(login)).encode() + b"\n")
+                        return
+                    if login == TRICKLE_LOGIN:
+                        # Cada línea llega antes del timeout de lectura del socket, pero el total no
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/x-ndjson")
+                        self.end_headers()
+                        for n in range(40):
+                            self.wfile.write(json.dumps(vps_trade(login * 100 + n)).encode() + b"\n")
+                            self.wfile.flush()
+                            time.sleep(0.1)
+                        return
+                    time.sleep(REQUEST_SECONDS)
+                    self._send(200, {"data": [{
+                        "account": login,
+                        "status": "success",
+                        "balance": 100500.0,
+                        "new_trades": [vps_trade(login * 10 + n, n) for n in range(2)],
+                    }]})
+                finally:
+                    with stub.lock:
+                        stub.in_flight -= 1
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/sync"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_vps(monkeypatch):
+    # Cliente compartido con reintentos rápidos, para no esperar el backoff real
+    monkeypatch.setattr(vps_client, "_client", vps_client.VPSClient(max_retries=1, backoff_seconds=0.01))
+    with StubVPS() as stub:
+        yield stub
+    vps_client.close_client()
+
+
+def sync(db, stub, accounts, max_concurrency):
+    engine = SyncEngine(vps_url=stub.url, api_key="test", max_concurrency=max_concurrency,
+                        account_timeout=0.5, session_factory=database.SessionLocal)
+    return {report["account"]: report for report in engine.sync_accounts(db, accounts)}
+
+
+def test_slow_account_times_out_without_blocking_the_others(db, make_account, stub_vps):
+    accounts = [make_account(1001), make_account(SLOW_LOGIN)]
+    reports = sync(db, stub_vps, accounts, max_concurrency=2)
+
+    assert reports[SLOW_LOGIN]["status"] == "timeout"
+    assert reports[1001]["status"] == "success"
+    assert db.query(models.Trade).filter(models.Trade.account_id == accounts[0].id).count() == 2
+    assert db.query(models.Trade).filter(models.Trade.account_id == accounts[1].id).count() == 0
+
+
+def test_read_timeout_is_not_retried(db, make_account, stub_vps):
+    account = make_account(SLOW_LOGIN)
+    started = time.monotonic()
+    reports = sync(db, stub_vps, [account], max_concurrency=1)
+
+    assert reports[SLOW_LOGIN]["status"] == "timeout"
+    assert stub_vps.calls[SLOW_LOGIN] == 1
+    assert time.monotonic() - started < 1.0 # Un plazo de 0.5 s, no uno por intento
+
+
+def test_trickling_stream_respects_the_deadline(db, make_account, stub_vps):
+    accounts = [make_account(1001), make_account(TRICKLE_LOGIN)]
+    started = time.monotonic()
+    reports = sync(db, stub_vps, accounts, max_concurrency=2)
+
+    assert reports[TRICKLE_LOGIN]["status"] == "timeout"
+    assert reports[1001]["status"] == "success"
+    assert time.monotonic() - started < 1.5 # El stream completo tardaría 4 s
+    # La transacción de la cuenta cortada no deja nada a medias
+    assert db.query(models.Trade).filter(models.Trade.account_id == accounts[1].id).count() == 0
+
+
+def test_request_body_is_gzipped_only_when_enabled(db, make_account, stub_vps, monkeypatch):
+    account = make_account(1001)
+    sync(db, stub_vps, [account], max_concurrency=1)
+    assert stub_vps.encodings[1001] is None
+
+    monkeypatch.setattr(vps_client, "_client", vps_client.VPSClient(gzip_requests=True, gzip_min_bytes=0))
+    sync(db, stub_vps, [account], max_concurrency=1)
+    assert stub_vps.encodings[1001] == "gzip"
+
+
+def test_5xx_is_retried(db, make_account, stub_vps):
+    account = make_account(FLAKY_LOGIN)
+    reports = sync(db, stub_vps, [account], max_concurrency=1)
+
+    assert stub_vps.calls[FLAKY_LOGIN] == 2
+    assert reports[FLAKY_LOGIN]["status"] == "success"
+    assert db.get(models.Account, account.id).balance == 100500.0
+    assert vps_client.get_client().metrics()["retries"] == 1
+
+
+def test_accounts_run_concurrently_up_to_the_limit(db, make_account, stub_vps):
+    accounts = [make_account(2000 + n) for n in range(6)]
+    started = time.monotonic()
+    reports = sync(db, stub_vps, accounts, max_concurrency=3)
+    elapsed = time.monotonic() - started
+
+    assert all(report["status"] == "success" for report in reports.values())
+    assert stub_vps.max_in_flight == 3
+    # 6 cuentas de 3 en 3: dos tandas, no seis peticiones seguidas
+    assert elapsed < 6 * REQUEST_SECONDS
+    assert db.query(models.Trade).count() == 12
+
+
+def test_ndjson_stream_over_several_batches(db, make_account, stub_vps):
+    account = make_account(NDJSON_LOGIN)
+    engine = SyncEngine(vps_url=stub_vps.url, api_key="test", max_concurrency=1,
+                        account_timeout=5, session_factory=database.SessionLocal)
+    [report] = engine.sync_accounts(db, [account])
+
+    assert report["status"] == "success"
+    assert report["received"] == NDJSON_TRADES + 3
+    assert report["inserted"] == NDJSON_TRADES
+    assert report["skipped"] == 1
+    assert report["invalid"] == 2
+    assert db.query(models.Trade).filter(models.Trade.account_id == account.id).count() == NDJSON_TRADES
+
+    # Marca de agua: el trade más reciente, aunque llegó en medio del stream
+    db.expire_all()
+    state = db.get(models.AccountSyncState, account.id)
+    assert state.last_close_time == NDJSON_START + datetime.timedelta(minutes=NDJSON_TRADES - 1)
+    assert state.last_ticket == NDJSON_LOGIN * 10000 + NDJSON_TRADES - 1
+    assert state.last_balance == 124500.0
+    assert db.get(models.Account, account.id).balance == 124500.0
+    assert db.get(models.AccountStats, account.id).count == NDJSON_TRADES
@@ -0,0 +1,58 @@
+# backend/tests/test_trades_listing.py
+"""GET /trades/: vistas full y summary, y su esquema en OpenAPI"""
+import main
+import schemas
+import trade_queries
+
+
+def seed(make_account, seed_trades):
+    seed_trades(make_account(1), 5, profit=lambda n: 10.0 * n, commission=-3.5, emotion_id=1)
+
+
+def test_summary_rows_match_trade_summary_schema(db, client, make_account, seed_trades):
+    seed(make_account, seed_trades)
+    rows = client.get("/trades/", params={"view": "summary"}).json()
+
+    assert set(trade_queries.SUMMARY_KEYS) == set(schemas.TradeSummary.model_fields)
+    assert len(rows) == 5
+    for row in rows:
+        assert set(row) == set(trade_queries.SUMMARY_KEYS)
+        schemas.TradeSummary.model_validate(row)
+    assert rows[0]["emotion"] == "Neutral"
+
+
+def test_full_view_keeps_trade_response(db, client, make_account, seed_trades):
+    seed(make_account, seed_trades)
+    rows = client.get("/trades/").json()
+
+    assert len(rows) == 5
+    assert set(rows[0]) == set(schemas.TradeResponse.model_fields)
+    assert rows[0]["emotion"] == {"id": 1, "name": "Neutral"}
+    assert rows[0]["account_alias"] == "Cuenta 1"
+
+
+def test_openapi_documents_both_views(client):
+    schema = client.get("/openapi.json").json()
+    response = schema["paths"]["/trades/"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    refs = {variant["items"]["$ref"].rsplit("/", 1)[-1] for variant in response["anyOf"]}
+    assert refs == {"TradeResponse", "TradeSummary"}
+
+
+def test_without_limit_or_cursor_returns_every_trade(db, client, make_account, seed_trades, monkeypatch):
+    monkeypatch.setattr(main, "TRADES_PAGE_SIZE", 2)
+    seed(make_account, seed_trades)
+
+    # Como lo llama el frontend: un día entero, sin paginar
+    response = client.get("/trades/", params={"trade_date": "2024-01-01"})
+    assert len(response.json()) == 5
+    assert "X-Next-Cursor" not in response.headers
+
+    # Paginando: se sigue X-Next-Cursor hasta el final, sin repetidos
+    ids, params = [], {"limit": 2}
+    while True:
+        page = client.get("/trades/", params=params)
+        ids += [row["id"] for row in page.json()]
+        if "X-Next-Cursor" not in page.headers:
+            break
+        params = {"cursor": page.headers["X-Next-Cursor"]} # Sin limit: TRADES_PAGE_SIZE
+    assert len(ids) == len(set(ids)) == 5
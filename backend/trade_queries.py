@@ -0,0 +1,136 @@
+# backend/trade_queries.py
+"""
+Filtros y paginación compartidos por los listados de trades (/trades/, exportaciones...).
+Las fechas se filtran como rangos sobre close_time, así se usan los índices
+(account_id, close_time) y (close_time, id) en vez de calcular date() en cada fila.
+"""
+from fastapi import HTTPException, Query
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, joinedload, selectinload
+from datetime import date, timedelta
+from typing import Optional, Tuple
+import base64
+import datetime
+import models
+
+
+def trade_filter_params(
+    account_id: Optional[int] = None,
+    symbol: Optional[str] = None,
+    type: Optional[str] = None,                  # BUY / SELL
+    strategy_id: Optional[int] = None,
+    emotion_id: Optional[int] = None,
+    mistake_id: Optional[int] = None,
+    trade_date: Optional[date] = None,           # Un día (compatibilidad con la página de trades)
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),  # Incluido
+) -> dict:
+    """Dependencia de FastAPI: junta los filtros de la query string en un dict"""
+    if trade_date:
+        date_from = date_to = trade_date
+    if date_from and date_to and date_to < date_from:
+        raise HTTPException(status_code=400, detail="'to' debe ser posterior o igual a 'from'")
+    return {
+        "account_id": account_id,
+        "symbol": symbol,
+        "type": type,
+        "strategy_id": strategy_id,
+        "emotion_id": emotion_id,
+        "mistake_id": mistake_id,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+
+
+def apply_trade_filters(query, filters: dict):
+    """Aplica los filtros de trade_filter_params a una consulta sobre models.Trade"""
+    for field in ("account_id", "symbol", "type", "strategy_id", "emotion_id", "mistake_id"):
+        value = filters.get(field)
+        if value is not None:
+            query = query.filter(getattr(models.Trade, field) == value)
+
+    # Rango semiabierto [from, to + 1 día)
+    if filters.get("date_from"):
+        query = query.filter(models.Trade.close_time >= datetime.datetime.combine(filters["date_from"], datetime.time.min))
+    if filters.get("date_to"):
+        end = datetime.datetime.combine(filters["date_to"] + timedelta(days=1), datetime.time.min)
+        query = query.filter(models.Trade.close_time < end)
+    return query
+
+
+def with_response_relations(query):
+    """
+    Plan de carga de todo lo que lee schemas.TradeResponse (y el alias de la cuenta),
+    así serializar N trades cuesta un número fijo de consultas y no una por fila:
+    - Cuenta, emoción, error y estrategia (muchos-a-uno): JOIN en la misma consulta
+    - Trade idea con su checklist y evidencias: un SELECT ... IN por relación
+    """
+    return query.options(
+        joinedload(models.Trade.account),
+        joinedload(models.Trade.emotion),
+        joinedload(models.Trade.mistake),
+        joinedload(models.Trade.strategy),
+        selectinload(models.Trade.trade_idea).selectinload(models.TradeIdea.checklist),
+        selectinload(models.Trade.trade_idea).selectinload(models.TradeIdea.evidences),
+    )
+
+
+# Columnas de view=summary: lo que muestra un listado, sin trade idea, checklist ni evidencias.
+# Emoción, error y estrategia van por nombre (como en TradeBase)
+SUMMARY_COLUMNS = (
+    ("id", models.Trade.id),
+    ("account_id", models.Trade.account_id),
+    ("account_alias", models.Account.alias),
+    ("ticket", models.Trade.ticket),
+    ("symbol", models.Trade.symbol),
+    ("type", models.Trade.type),
+    ("open_time", models.Trade.open_time),
+    ("close_time", models.Trade.close_time),
+    ("profit", models.Trade.profit),
+    ("commission", models.Trade.commission),
+    ("swap", models.Trade.swap),
+    ("comment", models.Trade.comment),
+    ("notes", models.Trade.notes),
+    ("emotion_id", models.Trade.emotion_id),
+    ("emotion", models.Emotion.name),
+    ("mistake_id", models.Trade.mistake_id),
+    ("mistake", models.Mistake.name),
+    ("strategy_id", models.Trade.strategy_id),
+    ("strategy", models.Strategy.name),
+    ("trade_idea_id", models.Trade.trade_idea_id),
+)
+SUMMARY_KEYS = tuple(key for key, _ in SUMMARY_COLUMNS)
+
+
+def summary_query(db: Session):
+    """SELECT de solo las columnas de SUMMARY_COLUMNS: devuelve tuplas, no objetos del ORM"""
+    return db.query(*(column.label(key) for key, column in SUMMARY_COLUMNS))\
+             .select_from(models.Trade)\
+             .join(models.Account, models.Account.id == models.Trade.account_id)\
+             .outerjoin(models.Emotion, models.Emotion.id == models.Trade.emotion_id)\
+             .outerjoin(models.Mistake, models.Mistake.id == models.Trade.mistake_id)\
+             .outerjoin(models.Strategy, models.Strategy.id == models.Trade.strategy_id)
+
+
+# --- Paginación por cursor (keyset) sobre (close_time, id), del más reciente al más antiguo ---
+
+def encode_cursor(close_time: datetime.datetime, trade_id: int) -> str:
+    raw = f"{close_time.isoformat()}|{trade_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        close_time, trade_id = raw.split("|")
+        return datetime.datetime.fromisoformat(close_time), int(trade_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def apply_cursor(query, cursor: Optional[str]):
+    """Ordena del más reciente al más antiguo y, con cursor, sigue después del último trade recibido"""
+    if cursor:
+        close_time, trade_id = decode_cursor(cursor)
+        query = query.filter(tuple_(models.Trade.close_time, models.Trade.id) < tuple_(close_time, trade_id))
+    return query.order_by(models.Trade.close_time.desc(), models.Trade.id.desc())
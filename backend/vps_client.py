@@ -0,0 +1,233 @@
+# backend/vps_client.py
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from typing import Iterator, Optional
+import requests
+import gzip
+import json
+import os
+import socket
+import threading
+import time
+
+# Códigos que vale la pena reintentar (la VPS o el proxy están momentáneamente caídos)
+RETRY_STATUS_CODES = (502, 503, 504)
+
+
+def _body_socket(response: requests.Response):
+    """
+    Socket del que se está leyendo el cuerpo, o None si ya terminó. Con keep-alive está
+    en la conexión (que vuelve al pool al terminar); si la VPS cierra la conexión al
+    final (HTTP/1.0, sin Content-Length) solo lo tiene el archivo de la respuesta.
+    """
+    raw = response.raw
+    sock = getattr(getattr(raw, "connection", None), "sock", None)
+    if sock is None:
+        fp = getattr(getattr(raw, "_fp", None), "fp", None) # Se pone a None al leer el final
+        sock = getattr(getattr(fp, "raw", None), "_sock", None)
+    return sock
+
+
+class VPSClient:
+    """
+    Cliente HTTP compartido para todas las llamadas a la VPS de MT5:
+    - Pool de conexiones keep-alive (sin handshake TLS en cada sincronización)
+    - Respuestas comprimidas con gzip; la petición solo si la VPS lo acepta (VPS_GZIP_REQUESTS)
+    - Reintentos con backoff exponencial solo en llamadas idempotentes, y solo si no hubo
+      respuesta (error de conexión) o fue un 502/503/504. Un timeout de lectura no se reintenta
+    - timeout es un plazo total (reloj): cubre los reintentos y la lectura del cuerpo
+    - Métricas de latencia y bytes transferidos
+    """
+
+    def __init__(
+        self,
+        pool_size: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        backoff_seconds: Optional[float] = None,
+        gzip_min_bytes: Optional[int] = None,
+        gzip_requests: Optional[bool] = None,
+    ):
+        self.pool_size = pool_size or int(os.getenv("VPS_POOL_SIZE", os.getenv("SYNC_MAX_CONCURRENCY", "4")))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("VPS_MAX_RETRIES", "2"))
+        self.backoff_seconds = backoff_seconds or float(os.getenv("VPS_RETRY_BACKOFF", "0.5"))
+        self.gzip_min_bytes = gzip_min_bytes if gzip_min_bytes is not None else int(os.getenv("VPS_GZIP_MIN_BYTES", "1024"))
+        # Solo si la VPS acepta Content-Encoding: gzip en la petición (si no, respondería 400/415)
+        if gzip_requests is None:
+            gzip_requests = os.getenv("VPS_GZIP_REQUESTS", "false").lower() in ("1", "true", "yes")
+        self.gzip_requests = gzip_requests
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip"})
+
+        self._lock = threading.Lock()
+        self._metrics = {
+            "requests": 0,
+            "responses": 0,
+            "errors": 0,
+            "retries": 0,
+            "bytes_sent": 0,
+            "bytes_received": 0,
+            "total_latency_seconds": 0.0, # Hasta recibir las cabeceras
+            "max_latency_seconds": 0.0,
+            "total_duration_seconds": 0.0, # Hasta terminar de leer el cuerpo
+        }
+
+    def _encode_body(self, payload: dict, headers: dict) -> bytes:
+        body = json.dumps(payload).encode()
+        headers["Content-Type"] = "application/json"
+        if self.gzip_requests and len(body) >= self.gzip_min_bytes:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        return body
+
+    def _record(self, **values):
+        with self._lock:
+            for key, value in values.items():
+                if key == "max_latency_seconds":
+                    self._metrics[key] = max(self._metrics[key], value)
+                else:
+                    self._metrics[key] += value
+
+    @staticmethod
+    def _expire(response: requests.Response, expired: threading.Event):
+        """
+        Plazo vencido: si el cuerpo todavía se está leyendo se corta el socket para
+        desbloquear la lectura. Si ya se leyó entero, la conexión volvió al pool y no se toca.
+        """
+        sock = _body_socket(response)
+        if sock is None:
+            return
+        expired.set()
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass # Ya estaba cerrado
+
+    @contextmanager
+    def stream_post(
+        self,
+        url: str,
+        payload: dict,
+        headers: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        idempotent: bool = False,
+    ) -> Iterator[requests.Response]:
+        """
+        POST con la respuesta en streaming. Solo se reintenta si idempotent=True
+        (ej: la sincronización, porque los trades repetidos se descartan al insertar).
+        timeout es el plazo total en segundos, desde la llamada hasta terminar de leer
+        la respuesta (incluye reintentos y backoff). Si vence se lanza requests.Timeout.
+        """
+        headers = dict(headers or {})
+        body = self._encode_body(payload, headers)
+        attempts = 1 + (self.max_retries if idempotent else 0)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        def remaining() -> Optional[float]:
+            if deadline is None:
+                return None
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise requests.Timeout(f"Plazo de {timeout}s vencido")
+            return left
+
+        response = None
+        started = time.monotonic()
+        for attempt in range(attempts):
+            if attempt > 0:
+                self._record(retries=1)
+                backoff = self.backoff_seconds * (2 ** (attempt - 1))
+                left = remaining()
+                if left is not None and backoff >= left:
+                    raise requests.Timeout(f"Plazo de {timeout}s vencido antes del reintento")
+                time.sleep(backoff)
+            started = time.monotonic()
+            try:
+                # El timeout del socket (conexión y cada lectura) nunca pasa del plazo que queda
+                response = self.session.post(url, data=body, headers=headers, timeout=remaining(), stream=True)
+            except requests.ConnectionError:
+                # Incluye ConnectTimeout: la VPS no recibió nada, se puede reintentar
+                self._record(requests=1, errors=1, bytes_sent=len(body))
+                if attempt == attempts - 1:
+                    raise
+                continue
+            except requests.Timeout:
+                # La VPS recibió la petición y no respondió a tiempo: reintentar solo multiplica la espera
+                self._record(requests=1, errors=1, bytes_sent=len(body))
+                raise
+
+            latency = time.monotonic() - started
+            self._record(requests=1, responses=1, bytes_sent=len(body), total_latency_seconds=latency, max_latency_seconds=latency)
+            if response.status_code in RETRY_STATUS_CODES and attempt < attempts - 1:
+                self._record(errors=1)
+                response.close()
+                continue
+            break
+
+        # Plazo también mientras se lee el cuerpo: un stream que llega a goteo no lo alarga
+        expired = threading.Event()
+        watchdog = None
+        if deadline is not None:
+            watchdog = threading.Timer(max(0.0, deadline - time.monotonic()), self._expire, (response, expired))
+            watchdog.daemon = True
+            watchdog.start()
+        try:
+            yield response
+            # Sin Content-Length, cortar el socket parece un fin normal: el cuerpo quedó incompleto
+            if expired.is_set():
+                raise requests.Timeout(f"Plazo de {timeout}s vencido leyendo la respuesta")
+        except Exception as e:
+            if expired.is_set() and not isinstance(e, requests.Timeout):
+                raise requests.Timeout(f"Plazo de {timeout}s vencido leyendo la respuesta") from e
+            raise
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+            # tell() cuenta los bytes leídos del socket (comprimidos), no los descomprimidos
+            received = response.raw.tell() if response.raw is not None else 0
+            if response.status_code >= 400:
+                self._record(errors=1)
+            self._record(bytes_received=received, total_duration_seconds=time.monotonic() - started)
+            response.close()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            data = dict(self._metrics)
+        responses = data["responses"]
+        data["avg_latency_seconds"] = round(data["total_latency_seconds"] / responses, 4) if responses else 0.0
+        data["total_latency_seconds"] = round(data["total_latency_seconds"], 4)
+        data["max_latency_seconds"] = round(data["max_latency_seconds"], 4)
+        data["total_duration_seconds"] = round(data["total_duration_seconds"], 4)
+        return data
+
+    def close(self):
+        self.session.close()
+
+
+# Instancia compartida: se crea en el lifespan de la app y se cierra al apagar
+_client: Optional[VPSClient] = None
+_client_lock = threading.Lock()
+
+
+def init_client() -> VPSClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = VPSClient()
+        return _client
+
+
+def get_client() -> VPSClient:
+    """Devuelve el cliente compartido (lo crea si se usa fuera de la app, ej: un script)"""
+    return _client or init_client()
+
+
+def close_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
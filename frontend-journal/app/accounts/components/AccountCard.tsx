@@ -113,6 +113,9 @@ export default function AccountCard({ acc, onEdit, onDelete }: AccountCardProps)
             <span className="flex items-center gap-1">
                 <Target size={12} /> Obj: {acc.target_percent}%
             </span>
+            <span className="flex items-center gap-1">
+                Sync: {acc.last_sync ? new Date(acc.last_sync + 'Z').toLocaleString() : 'Nunca'}
+            </span>
         </div>
       </div>
     </div>
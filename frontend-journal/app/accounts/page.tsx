@@ -104,8 +104,18 @@ export default function AccountsPage() {
     setLoading(true);
     setSyncMsg('Contactando VPS...');
     try {
-      const res = await axios.post(`${API_URL}/sync-all`);
-      setSyncMsg(`✅ Éxito: ${res.data.new_trades_added} trades nuevos.`);
+      // La sincronización corre en segundo plano: consultamos el trabajo hasta que termine
+      let { data: job } = await axios.post(`${API_URL}/sync-all`);
+      while (job.status === 'running') {
+        const done = job.accounts.filter((a: { state: string }) => a.state === 'done' || a.state === 'failed').length;
+        setSyncMsg(`Sincronizando... ${done}/${job.accounts.length} cuentas`);
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        ({ data: job } = await axios.get(`${API_URL}/sync-jobs/${job.id}`));
+      }
+      const failed = job.accounts.filter((a: { state: string }) => a.state === 'failed').length;
+      setSyncMsg(failed === 0
+        ? `✅ Éxito: ${job.new_trades_added} trades nuevos.`
+        : `⚠️ ${job.new_trades_added} trades nuevos, ${failed} cuenta(s) con error.`);
       fetchAccounts();
     } catch (error) {
       setSyncMsg('❌ Error de conexión.');
@@ -19,6 +19,7 @@ export interface Account {
     current_percent?: number;
     loss_reason?: string | null;
     outcome?: string | null;
+    last_sync?: string | null;
 }
 
 export interface AccountCreate {
@@ -13,6 +13,11 @@ interface RiskMetric {
   highest_daily_profit: number;
   profit_target_for_consistency: number;
   is_in_drawdown: boolean;
+  daily_drawdown_percent: number;
+  daily_drawdown_limit_price: number;
+  daily_loss_remaining: number;
+  daily_drawdown_progress: number;
+  daily_drawdown_breached: boolean;
 }
 
 export default function RiskStatusCard({ metric }: { metric: RiskMetric }) {
@@ -81,6 +86,31 @@ export default function RiskStatusCard({ metric }: { metric: RiskMetric }) {
         )}
 
       </div>
+
+      {/* BARRA DE DRAWDOWN DIARIO (se reinicia con el día del broker) */}
+      {metric.daily_drawdown_percent > 0 && (
+        <div className="mt-4">
+            <div className="flex justify-between text-xs mb-1">
+                <span className="font-bold text-slate-600 flex items-center gap-1">
+                    <AlertTriangle size={12} className="text-amber-500" />
+                    Drawdown Diario ({metric.daily_drawdown_percent}%)
+                </span>
+                <span className={metric.daily_drawdown_breached ? "text-rose-600 font-bold" : "text-amber-600 font-bold"}>
+                    {metric.daily_drawdown_breached ? "Límite diario superado" : `${metric.daily_drawdown_progress.toFixed(1)}% Usado`}
+                </span>
+            </div>
+            <div className="w-full bg-slate-100 rounded-full h-2.5 overflow-hidden">
+                <div 
+                    className={`h-2.5 rounded-full transition-all duration-500 ${metric.daily_drawdown_breached ? 'bg-rose-500' : 'bg-amber-500'}`}
+                    style={{ width: `${metric.daily_drawdown_progress}%` }}
+                ></div>
+            </div>
+            <div className="flex justify-between text-[10px] text-slate-400 mt-1">
+                <span>Límite Hoy: ${metric.daily_drawdown_limit_price.toLocaleString()}</span>
+                <span>Disponible: ${metric.daily_loss_remaining.toLocaleString()}</span>
+            </div>
+        </div>
+      )}
     </div>
   );
 }
\ No newline at end of file
@@ -74,9 +74,10 @@ export default function Dashboard() {
     const fetchStats = async () => {
       setLoading(true); // Opcional: mostrar loading en las cards
       try {
-        let url = `${API_URL}/dashboard-stats`;
+        // La curva se reduce en el backend a un máximo de puntos que el gráfico puede dibujar
+        let url = `${API_URL}/dashboard-stats?max_points=500`;
         if (selectedAccount) {
-            url += `?account_id=${selectedAccount}`;
+            url += `&account_id=${selectedAccount}`;
         }
         
         const res = await axios.get<DashboardData>(url);